@@ -6,6 +6,7 @@ from modules.pdf_processor import PDFProcessor
 from modules.vector_store import VectorStore
 from modules.llm_wrapper import LLMWrapper
 from modules.rag_pipeline import RAGPipeline
+from modules.embeddings import warm_up_embedding_model
 
 
 st.set_page_config(page_title="📚 RAG Chatbot", layout="wide")
@@ -13,6 +14,9 @@ st.title("📚 RAG Chatbot hỏi đáp tài liệu PDF bằng tiếng Việt")
 
 st.markdown("1. **Tải file PDF**  →  2. **Đặt câu hỏi**  →  3. **Nhận câu trả lời** ��")
 
+# Tải trước embedding model dùng chung (chỉ chạy một lần mỗi process)
+warm_up_embedding_model(background=True)
+
 # Session states
 if "retriever" not in st.session_state:
     st.session_state.retriever = None
@@ -31,6 +31,8 @@ from modules.pdf_processor import PDFProcessor
 from modules.vector_store_fallback import SmartVectorStore
 from modules.llm_wrapper import LLMWrapper
 from modules.rag_pipeline import RAGPipeline
+from modules.embeddings import warm_up_embedding_model
+from modules.stream_renderer import StreamRenderer
 from config import app_config
 from utils.logger import get_logger
 from utils.metrics import get_metrics
@@ -145,6 +147,13 @@ st.markdown("""
         margin-right: 20%;
     }
     
+    /* Các đoạn của câu trả lời đang streaming nối liền nhau */
+    .bot-message-part {
+        margin-bottom: 0;
+        border-radius: 0;
+        box-shadow: none;
+    }
+    
     /* Sidebar styles */
     .sidebar .sidebar-content {
         background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
@@ -201,6 +210,9 @@ st.markdown("""
 logger = get_logger()
 metrics = get_metrics()
 
+# Tải trước embedding model dùng chung (chỉ chạy một lần mỗi process)
+warm_up_embedding_model(background=True)
+
 # Initialize session states
 def init_session_state():
     """Khởi tạo session state"""
@@ -218,9 +230,82 @@ def init_session_state():
         st.session_state.processing_status = ""
     if "selected_question" not in st.session_state:
         st.session_state.selected_question = None
+    if "processor" not in st.session_state:
+        st.session_state.processor = None
+    if "vector_store" not in st.session_state:
+        st.session_state.vector_store = None
+    if "documents" not in st.session_state:
+        st.session_state.documents = {}
+    if "retriever_filter" not in st.session_state:
+        st.session_state.retriever_filter = None
 
 init_session_state()
 
+def render_bot_message(placeholder, text: str):
+    """Vẽ câu trả lời của AI vào placeholder"""
+    placeholder.markdown(f"""
+    <div class="chat-message bot-message">
+        <strong>🤖 AI:</strong><br>
+        {text}
+    </div>
+    """, unsafe_allow_html=True)
+
+class StreamingBotMessage:
+    """
+    Câu trả lời đang streaming: mỗi đoạn văn đã xong được vẽ một lần thành phần tử riêng,
+    chỉ đoạn đang viết dở được vẽ lại (StreamRenderer gọi commit/render)
+    """
+    
+    def __init__(self):
+        self.container = st.container()
+        self.current = self.container.empty()
+        self.parts = 0
+    
+    def _draw(self, text: str):
+        header = "<strong>🤖 AI:</strong><br>" if self.parts == 0 else ""
+        self.current.markdown(f"""
+        <div class="chat-message bot-message bot-message-part">
+            {header}{text}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    def commit(self, text: str):
+        self._draw(text)
+        self.parts += 1
+        self.current = self.container.empty()
+    
+    def render(self, text: str):
+        self._draw(text)
+
+def answer_question(question: str, use_streaming: bool, use_memory: bool):
+    """Trả lời câu hỏi, lưu vào lịch sử chat và rerun để cập nhật UI"""
+    with st.spinner("🤔 Đang suy nghĩ..."):
+        try:
+            if use_streaming:
+                # Streaming response: gom các đoạn và chỉ vẽ lại mỗi stream_render_interval giây
+                message = StreamingBotMessage()
+                renderer = StreamRenderer(message.render, commit=message.commit)
+                answer = renderer.consume(
+                    st.session_state.rag_pipeline.ask_streaming(question, use_memory=use_memory)
+                )
+            else:
+                # Regular response
+                answer = st.session_state.rag_pipeline.ask(question, use_memory=use_memory)
+            
+            # Add to chat history
+            st.session_state.chat_history.append({
+                "question": question,
+                "answer": answer,
+                "timestamp": time.time()
+            })
+            
+            # Rerun để cập nhật UI
+            st.rerun()
+            
+        except Exception as e:
+            st.error(f"❌ Lỗi: {str(e)}")
+            logger.error(f"Chat error: {str(e)}")
+
 # Header
 st.markdown("""
 <div class="main-header fade-in">
@@ -299,6 +384,61 @@ with st.sidebar:
             avg_time = current_metrics.get("average_response_time", 0)
             st.metric("Thời gian TB", f"{avg_time:.2f}s")
             st.metric("Errors", current_metrics.get("errors", 0))
+        
+        query_cache = current_metrics.get("query_cache", {})
+        st.metric("Cache câu hỏi", f"{query_cache.get('hit_rate', 0):.0%}")
+        
+        streaming = current_metrics.get("streaming", {})
+        if streaming.get("responses"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("TTFT", f"{streaming.get('last_ttft', 0):.2f}s")
+            with col2:
+                st.metric("Tokens/s", f"{streaming.get('last_tokens_per_sec', 0):.0f}")
+    
+    # Bộ sưu tập tài liệu: lọc phạm vi tìm kiếm và xóa từng tài liệu
+    if st.session_state.vector_store is not None and st.session_state.documents:
+        st.markdown("---")
+        st.markdown("## 📚 Bộ sưu tập")
+        
+        doc_names = {doc_id: info["filename"] for doc_id, info in st.session_state.documents.items()}
+        selected_docs = st.multiselect(
+            "🔎 Tìm trong tài liệu:",
+            options=list(doc_names),
+            default=list(doc_names),
+            format_func=lambda doc_id: doc_names[doc_id],
+            help="Giới hạn câu trả lời trong các tài liệu được chọn"
+        )
+        
+        # Chỉ tạo lại retriever khi phạm vi tìm kiếm thay đổi
+        retriever_filter = selected_docs if 0 < len(selected_docs) < len(doc_names) else None
+        if retriever_filter != st.session_state.retriever_filter and st.session_state.rag_pipeline:
+            retriever = st.session_state.vector_store.get_retriever(retriever_filter)
+            st.session_state.retriever = retriever
+            st.session_state.rag_pipeline.retriever = retriever
+            st.session_state.retriever_filter = retriever_filter
+        
+        for doc_id, info in list(st.session_state.documents.items()):
+            doc_col, remove_col = st.columns([4, 1])
+            doc_col.caption(f"📄 {info['filename']} • {info['chunks']} chunks")
+            
+            if remove_col.button("🗑️", key=f"remove_{doc_id}", help="Xóa tài liệu khỏi bộ sưu tập"):
+                st.session_state.vector_store.remove_document(doc_id)
+                del st.session_state.documents[doc_id]
+                st.session_state.retriever_filter = None
+                
+                if st.session_state.documents:
+                    retriever = st.session_state.vector_store.get_retriever()
+                    st.session_state.retriever = retriever
+                    st.session_state.rag_pipeline.retriever = retriever
+                else:
+                    st.session_state.vector_store = None
+                    st.session_state.retriever = None
+                    st.session_state.rag_pipeline = None
+                    st.session_state.document_processed = False
+                    st.session_state.current_doc_info = {}
+                
+                st.rerun()
     
     st.markdown("---")
     
@@ -347,6 +487,15 @@ with col1:
         st.info(f"📄 **{uploaded_file.name}**")
         st.info(f"📏 Kích thước: {file_size / (1024*1024):.2f} MB")
         
+        # Cho phép gộp nhiều tài liệu vào cùng một collection thay vì thay thế
+        add_to_collection = False
+        if st.session_state.vector_store is not None:
+            add_to_collection = st.checkbox(
+                "➕ Thêm vào bộ sưu tập hiện tại",
+                value=True,
+                help="Bỏ chọn để bắt đầu bộ sưu tập mới chỉ với tài liệu này"
+            )
+        
         if st.button("⚙️ Xử lý tài liệu", type="primary"):
             if file_size > app_config.max_file_size:
                 st.error(f"File quá lớn! Kích thước tối đa: {app_config.max_file_size // (1024*1024)}MB")
@@ -363,40 +512,74 @@ with col1:
                     
                     # Xử lý từng bước với progress bar
                     status_text.text("🔄 Đang khởi tạo processor...")
-                    progress_bar.progress(20)
+                    progress_bar.progress(5)
                     
-                    processor = PDFProcessor()
+                    # Processor dùng lại trong session để collection và processor chung embedding wrapper
+                    if st.session_state.processor is None:
+                        st.session_state.processor = PDFProcessor()
+                    processor = st.session_state.processor
                     
-                    status_text.text("📖 Đang đọc và chia nhỏ tài liệu...")
-                    progress_bar.progress(40)
+                    if add_to_collection:
+                        vector = st.session_state.vector_store
+                    else:
+                        vector = SmartVectorStore(processor.embedding_model)
+                        st.session_state.documents = {}
                     
-                    chunks = processor.load_and_chunk(tmp_path)
+                    doc_id = processor.compute_file_hash(tmp_path)
+                    # Tài liệu đã từng xử lý thì mở lại index đã lưu, bỏ qua đọc/chunk/embed
+                    catalog_entry = None if add_to_collection else vector.open_document(doc_id)
                     
-                    status_text.text("🔍 Đang xây dựng vector store...")
-                    progress_bar.progress(60)
+                    if add_to_collection and doc_id in vector.documents:
+                        chunk_count = vector.documents[doc_id]
+                        status_text.text("ℹ️ Tài liệu đã có trong bộ sưu tập")
+                        progress_bar.progress(85)
+                    elif catalog_entry:
+                        chunk_count = catalog_entry.get("chunks", 0)
+                        status_text.text("⚡ Đã dùng lại index của tài liệu này")
+                        progress_bar.progress(85)
+                    else:
+                        # Đọc, chunk, embed và index theo từng batch; tiến độ phản ánh số trang đã xử lý
+                        status_text.text("📖 Đang đọc và chia nhỏ tài liệu...")
+                        chunk_count = 0
+                        for ingest_progress in vector.ingest(processor.iter_chunk_batches(tmp_path), doc_id=doc_id):
+                            chunk_count = ingest_progress.chunks_indexed
+                            if ingest_progress.total_pages:
+                                ratio = ingest_progress.pages_done / ingest_progress.total_pages
+                                progress_bar.progress(5 + int(ratio * 80))
+                            status_text.text(
+                                f"🔍 Đã xử lý {ingest_progress.pages_done}/{ingest_progress.total_pages} trang "
+                                f"• {chunk_count} chunks đã index"
+                            )
                     
-                    vector = SmartVectorStore(processor.embedding_model)
-                    retriever = vector.build_store(chunks)
+                    retriever = vector.get_retriever()
                     
                     status_text.text("🤖 Đang khởi tạo LLM...")
-                    progress_bar.progress(80)
+                    progress_bar.progress(90)
                     
                     llm = LLMWrapper(model_name=selected_model).get_llm()
                     
                     status_text.text("🔗 Đang tạo RAG pipeline...")
-                    progress_bar.progress(90)
+                    progress_bar.progress(95)
                     
-                    pipeline = RAGPipeline(retriever, llm)
+                    # Thêm vào collection thì giữ pipeline (và memory), chỉ đổi retriever
+                    if add_to_collection and st.session_state.rag_pipeline:
+                        pipeline = st.session_state.rag_pipeline
+                        pipeline.retriever = retriever
+                    else:
+                        pipeline = RAGPipeline(retriever, llm)
                     
                     # Lưu vào session
                     st.session_state.retriever = retriever
                     st.session_state.rag_pipeline = pipeline
+                    st.session_state.vector_store = vector
+                    st.session_state.retriever_filter = None
                     st.session_state.document_processed = True
                     st.session_state.current_doc_info = {
                         "filename": uploaded_file.name,
-                        "chunks": len(chunks),
+                        "chunks": chunk_count,
                         "size_mb": file_size / (1024*1024)
                     }
+                    st.session_state.documents[doc_id] = st.session_state.current_doc_info
                     
                     progress_bar.progress(100)
                     status_text.text("✅ Hoàn thành!")
@@ -404,7 +587,7 @@ with col1:
                     # Cleanup
                     os.unlink(tmp_path)
                     
-                    st.success(f"🎉 Đã xử lý thành công! Tạo được {len(chunks)} chunks từ tài liệu.")
+                    st.success(f"🎉 Đã xử lý thành công! Tạo được {chunk_count} chunks từ tài liệu.")
                     st.balloons()
                     
                     time.sleep(1)
@@ -530,41 +713,7 @@ if st.session_state.rag_pipeline:
     
     # Xử lý câu hỏi từ form
     if question and ask_button:
-        with st.spinner("🤔 Đang suy nghĩ..."):
-            try:
-                if use_streaming:
-                    # Streaming response
-                    response_placeholder = st.empty()
-                    full_response = ""
-                    
-                    for chunk in st.session_state.rag_pipeline.ask_streaming(question, use_memory=use_memory):
-                        full_response += chunk
-                        response_placeholder.markdown(f"""
-                        <div class="chat-message bot-message">
-                            <strong>🤖 AI:</strong><br>
-                            {full_response}
-                        </div>
-                        """, unsafe_allow_html=True)
-                        time.sleep(0.05)  # Smooth streaming effect
-                    
-                    answer = full_response
-                else:
-                    # Regular response
-                    answer = st.session_state.rag_pipeline.ask(question, use_memory=use_memory)
-                
-                # Add to chat history
-                st.session_state.chat_history.append({
-                    "question": question,
-                    "answer": answer,
-                    "timestamp": time.time()
-                })
-                
-                # Rerun để cập nhật UI
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"❌ Lỗi: {str(e)}")
-                logger.error(f"Chat error: {str(e)}")
+        answer_question(question, use_streaming, use_memory)
     
     # Quick questions - sử dụng session state để lưu câu hỏi được chọn
     st.markdown("### 💡 Câu hỏi gợi ý:")
@@ -588,39 +737,7 @@ if st.session_state.rag_pipeline:
         selected_q = st.session_state.selected_question
         st.session_state.selected_question = None  # Reset
         
-        with st.spinner("🤔 Đang suy nghĩ..."):
-            try:
-                if use_streaming:
-                    # Streaming response
-                    response_placeholder = st.empty()
-                    full_response = ""
-                    
-                    for chunk in st.session_state.rag_pipeline.ask_streaming(selected_q, use_memory=use_memory):
-                        full_response += chunk
-                        response_placeholder.markdown(f"""
-                        <div class="chat-message bot-message">
-                            <strong>🤖 AI:</strong><br>
-                            {full_response}
-                        </div>
-                        """, unsafe_allow_html=True)
-                        time.sleep(0.05)
-                    
-                    answer = full_response
-                else:
-                    answer = st.session_state.rag_pipeline.ask(selected_q, use_memory=use_memory)
-                
-                # Add to chat history
-                st.session_state.chat_history.append({
-                    "question": selected_q,
-                    "answer": answer,
-                    "timestamp": time.time()
-                })
-                
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"❌ Lỗi: {str(e)}")
-                logger.error(f"Chat error: {str(e)}")
+        answer_question(selected_q, use_streaming, use_memory)
 
 else:
     st.info("📋 Hãy tải lên và xử lý tài liệu trước khi bắt đầu trò chuyện!")
@@ -50,29 +50,97 @@ class AppConfig:
     default_model: str = get_env_or_secret("DEFAULT_MODEL", "mistralai/mistral-7b-instruct")
     temperature: float = float(get_env_or_secret("TEMPERATURE", "0.7"))
     max_tokens: int = int(get_env_or_secret("MAX_TOKENS", "1024"))
+    # Ngân sách prompt: cửa sổ ngữ cảnh của model (0 = tra theo tên model) trừ max_tokens cho câu trả lời
+    llm_context_window: int = int(get_env_or_secret("LLM_CONTEXT_WINDOW", "0"))
+    context_history_ratio: float = float(get_env_or_secret("CONTEXT_HISTORY_RATIO", "0.25"))  # phần ngân sách tối đa cho lịch sử
+    # HTTP client dùng chung tới OpenRouter (keep-alive, HTTP/2 nếu cài h2)
+    llm_request_timeout: float = float(get_env_or_secret("LLM_REQUEST_TIMEOUT", "60"))
+    llm_connect_timeout: float = float(get_env_or_secret("LLM_CONNECT_TIMEOUT", "10"))
+    llm_max_retries: int = int(get_env_or_secret("LLM_MAX_RETRIES", "2"))
+    llm_max_connections: int = int(get_env_or_secret("LLM_MAX_CONNECTIONS", "20"))
+    llm_max_keepalive_connections: int = int(get_env_or_secret("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    llm_keepalive_expiry: float = float(get_env_or_secret("LLM_KEEPALIVE_EXPIRY", "120"))  # giây
+    llm_http2: bool = get_env_or_secret("LLM_HTTP2", "true").lower() == "true"
+    # Hỏi đáp theo lô (RAGPipeline.ask_batch)
+    batch_max_concurrency: int = int(get_env_or_secret("BATCH_MAX_CONCURRENCY", "4"))
+    llm_requests_per_minute: int = int(get_env_or_secret("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 = không giới hạn
     
     # Embedding Settings
     embedding_model: str = get_env_or_secret("EMBEDDING_MODEL", "bkai-foundation-models/vietnamese-bi-encoder")
+    embedding_device: str = get_env_or_secret("EMBEDDING_DEVICE", "cpu")
+    embedding_batch_size: int = int(get_env_or_secret("EMBEDDING_BATCH_SIZE", "64"))
+    embedding_max_batch_tokens: int = int(get_env_or_secret("EMBEDDING_MAX_BATCH_TOKENS", "16384"))
+    enable_query_cache: bool = get_env_or_secret("ENABLE_QUERY_CACHE", "true").lower() == "true"
+    query_cache_size: int = int(get_env_or_secret("QUERY_CACHE_SIZE", "2048"))
+    query_cache_disk: bool = get_env_or_secret("QUERY_CACHE_DISK", "false").lower() == "true"
+    
+    # PDF Loading Settings
+    pdf_extract_workers: int = int(get_env_or_secret("PDF_EXTRACT_WORKERS", "0"))  # 0 = số CPU
+    pdf_parallel_min_pages: int = int(get_env_or_secret("PDF_PARALLEL_MIN_PAGES", "64"))
+    ingest_window_pages: int = int(get_env_or_secret("INGEST_WINDOW_PAGES", "16"))
     
     # Chunking Settings
     chunk_size: int = int(get_env_or_secret("CHUNK_SIZE", "1000"))
     chunk_overlap: int = int(get_env_or_secret("CHUNK_OVERLAP", "200"))
     min_chunk_size: int = int(get_env_or_secret("MIN_CHUNK_SIZE", "500"))
     breakpoint_threshold: int = int(get_env_or_secret("BREAKPOINT_THRESHOLD", "95"))
+    # Dùng lại vector câu của SemanticChunker để suy ra vector chunk khi index
+    reuse_sentence_embeddings: bool = get_env_or_secret("REUSE_SENTENCE_EMBEDDINGS", "true").lower() == "true"
     
     # Vector Store Settings
-    vector_store_type: str = get_env_or_secret("VECTOR_STORE_TYPE", "smart")
+    vector_store_type: str = get_env_or_secret("VECTOR_STORE_TYPE", "smart")  # smart | hybrid (BM25 + dense)
     collection_name: str = get_env_or_secret("COLLECTION_NAME", "rag_documents")
+    enable_index_catalog: bool = get_env_or_secret("ENABLE_INDEX_CATALOG", "true").lower() == "true"
+    index_dir: str = get_env_or_secret("INDEX_DIR", "cache/indexes")
+    index_orphan_max_age: int = int(get_env_or_secret("INDEX_ORPHAN_MAX_AGE", "86400"))  # 1 day
+    # Tài liệu/collection mới có tối đa số chunks này dùng NumPy tìm kiếm chính xác (0 = tắt)
+    numpy_max_chunks: int = int(get_env_or_secret("NUMPY_MAX_CHUNKS", "5000"))
+    # Index FAISS: auto = flat < faiss_ann_min_chunks <= hnsw < faiss_ivf_min_chunks <= ivf
+    faiss_index_type: str = get_env_or_secret("FAISS_INDEX_TYPE", "auto")  # auto | flat | hnsw | ivf
+    faiss_ann_min_chunks: int = int(get_env_or_secret("FAISS_ANN_MIN_CHUNKS", "20000"))
+    faiss_ivf_min_chunks: int = int(get_env_or_secret("FAISS_IVF_MIN_CHUNKS", "200000"))
+    faiss_hnsw_m: int = int(get_env_or_secret("FAISS_HNSW_M", "32"))
+    faiss_hnsw_ef_construction: int = int(get_env_or_secret("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+    faiss_hnsw_ef_search: int = int(get_env_or_secret("FAISS_HNSW_EF_SEARCH", "64"))
+    faiss_ivf_nlist: int = int(get_env_or_secret("FAISS_IVF_NLIST", "0"))  # 0 = ~4 * sqrt(số chunks)
+    faiss_ivf_nprobe: int = int(get_env_or_secret("FAISS_IVF_NPROBE", "16"))
+    # Lượng tử hóa index FAISS khi lưu (vector gốc giữ trên đĩa để tính lại điểm top ứng viên)
+    faiss_quantization: str = get_env_or_secret("FAISS_QUANTIZATION", "none")  # none | fp16 | sq8 | pq
+    faiss_pq_m: int = int(get_env_or_secret("FAISS_PQ_M", "96"))  # số sub-quantizer (768 chiều -> 96 byte/vector)
+    # Số ứng viên lấy từ ANN = k * hệ số này, sau đó tính lại cosine chính xác
+    ann_candidate_factor: int = int(get_env_or_secret("ANN_CANDIDATE_FACTOR", "4"))
+    # FAISS fallback lưu embeddings dạng .npy mở bằng memmap (dùng chung page cache giữa các process)
+    enable_memmap_store: bool = get_env_or_secret("ENABLE_MEMMAP_STORE", "true").lower() == "true"
+    embedding_store_dtype: str = get_env_or_secret("EMBEDDING_STORE_DTYPE", "float32")  # float32 | float16
+    
+    # Retrieval Settings
+    retrieval_k: int = int(get_env_or_secret("RETRIEVAL_K", "5"))
+    retrieval_search_type: str = get_env_or_secret("RETRIEVAL_SEARCH_TYPE", "mmr")  # mmr | similarity
+    retrieval_fetch_k: int = int(get_env_or_secret("RETRIEVAL_FETCH_K", "20"))  # số ứng viên để tính MMR
+    retrieval_lambda_mult: float = float(get_env_or_secret("RETRIEVAL_LAMBDA_MULT", "0.5"))  # 1 = chỉ relevance, 0 = đa dạng tối đa
+    hybrid_fetch_k: int = int(get_env_or_secret("HYBRID_FETCH_K", "20"))
+    rrf_k: int = int(get_env_or_secret("RRF_K", "60"))
     
     # App Settings
     app_title: str = get_env_or_secret("APP_TITLE", "📚 RAG Chatbot Pro")
     app_description: str = get_env_or_secret("APP_DESCRIPTION", "Chatbot RAG thông minh với khả năng hỏi đáp tài liệu PDF bằng tiếng Việt")
     max_file_size: int = int(get_env_or_secret("MAX_FILE_SIZE", "52428800"))  # 50MB
+    stream_render_interval: float = float(get_env_or_secret("STREAM_RENDER_INTERVAL", "0.05"))  # giây giữa hai lần vẽ lại câu trả lời streaming
     supported_formats: list = None
     
     # Cache Settings
     enable_cache: bool = get_env_or_secret("ENABLE_CACHE", "true").lower() == "true"
     cache_ttl: int = int(get_env_or_secret("CACHE_TTL", "3600"))  # 1 hour
+    cache_backend: str = get_env_or_secret("CACHE_BACKEND", "disk")  # disk | sqlite (an toàn khi nhiều process dùng chung)
+    cache_dir: str = get_env_or_secret("CACHE_DIR", "cache")
+    cache_max_bytes: int = int(get_env_or_secret("CACHE_MAX_BYTES", "536870912"))  # 512MB
+    cache_sweep_interval: int = int(get_env_or_secret("CACHE_SWEEP_INTERVAL", "300"))  # 5 minutes, 0 = off
+    chunk_cache_compression: str = get_env_or_secret("CHUNK_CACHE_COMPRESSION", "auto")  # auto | zstd | lz4 | zlib | none
+    memory_cache_max_bytes: int = int(get_env_or_secret("MEMORY_CACHE_MAX_BYTES", "67108864"))  # 64MB, 0 = off
+    enable_answer_cache: bool = get_env_or_secret("ENABLE_ANSWER_CACHE", "true").lower() == "true"
+    answer_cache_size: int = int(get_env_or_secret("ANSWER_CACHE_SIZE", "512"))
+    answer_cache_ttl: int = int(get_env_or_secret("ANSWER_CACHE_TTL", "3600"))  # 1 hour
+    answer_cache_similarity: float = float(get_env_or_secret("ANSWER_CACHE_SIMILARITY", "0.95"))  # >= 1 tắt khớp gần giống
     
     # Logging Settings
     log_level: str = get_env_or_secret("LOG_LEVEL", "INFO")
@@ -0,0 +1,175 @@
+# modules/ann_index.py
+
+"""
+Chọn và dựng index FAISS xấp xỉ (IVF, HNSW) theo kích thước collection,
+có thể lượng tử hóa vector (float16, int8, PQ) để giảm RAM
+"""
+
+from typing import Optional
+import math
+import os
+
+import numpy as np
+
+from config import app_config
+
+ANN_FILE = "ann.faiss"
+
+INDEX_FLAT = "flat"
+INDEX_HNSW = "hnsw"
+INDEX_IVF = "ivf"
+
+QUANT_NONE = "none"
+QUANT_FP16 = "fp16"
+QUANT_SQ8 = "sq8"
+QUANT_PQ = "pq"
+
+# PQ 8 bit cần khoảng 39 * 256 điểm để train codebook
+PQ_MIN_TRAIN = 39 * 256
+
+
+def choose_index_type(count: int) -> str:
+    """
+    "auto": flat (chính xác) cho collection nhỏ, HNSW cho collection vừa,
+    IVF cho collection lớn (HNSW tốn RAM cho đồ thị, IVF chỉ cần centroids).
+    """
+    index_type = app_config.faiss_index_type
+    if index_type != "auto":
+        return index_type
+    if count < app_config.faiss_ann_min_chunks:
+        return INDEX_FLAT
+    if count < app_config.faiss_ivf_min_chunks:
+        return INDEX_HNSW
+    return INDEX_IVF
+
+
+def index_type_of(index) -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return INDEX_HNSW
+    if isinstance(index, faiss.IndexIVF):
+        return INDEX_IVF
+    return INDEX_FLAT
+
+
+def quantization_of(index) -> str:
+    import faiss
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return QUANT_PQ
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return QUANT_FP16 if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else QUANT_SQ8
+    return QUANT_NONE
+
+
+def ivf_nlist(count: int) -> int:
+    """Số centroids: cấu hình, hoặc ~4 * sqrt(n) (cần >= 39 điểm train mỗi centroid)"""
+    if app_config.faiss_ivf_nlist > 0:
+        return app_config.faiss_ivf_nlist
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def pq_subquantizers(dimension: int) -> int:
+    """Số sub-quantizer PQ: faiss_pq_m, giảm dần tới ước số gần nhất của số chiều"""
+    m = max(1, min(app_config.faiss_pq_m, dimension))
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def resolve_quantization(quantization: str, count: int) -> str:
+    """PQ cần đủ dữ liệu train; collection nhỏ hơn dùng int8"""
+    if quantization == QUANT_PQ and count < PQ_MIN_TRAIN:
+        return QUANT_SQ8
+    return quantization
+
+
+def configure_search(index) -> None:
+    """Tham số lúc tìm kiếm: efSearch (HNSW), nprobe (IVF)"""
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = app_config.faiss_hnsw_ef_search
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(app_config.faiss_ivf_nprobe, index.nlist)
+
+
+def build_index(vectors: np.ndarray, index_type: str, quantization: str = QUANT_NONE):
+    """
+    Dựng index L2 (vector đã chuẩn hóa nên thứ hạng giống cosine) chứa toàn bộ vectors.
+    quantization != none: mã vector bằng float16/int8/PQ; điểm chỉ xấp xỉ nên cần tính lại
+    bằng vector gốc (xem EmbeddingMatrix._ann_search).
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    quantization = resolve_quantization(quantization, count)
+    scalar_types = {QUANT_FP16: faiss.ScalarQuantizer.QT_fp16, QUANT_SQ8: faiss.ScalarQuantizer.QT_8bit}
+
+    if index_type == INDEX_HNSW:
+        if quantization in scalar_types:
+            index = faiss.IndexHNSWSQ(dimension, scalar_types[quantization], app_config.faiss_hnsw_m)
+        elif quantization == QUANT_PQ:
+            index = faiss.IndexHNSWPQ(dimension, pq_subquantizers(dimension), app_config.faiss_hnsw_m)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, app_config.faiss_hnsw_m)
+        index.hnsw.efConstruction = app_config.faiss_hnsw_ef_construction
+    elif index_type == INDEX_IVF:
+        quantizer = faiss.IndexFlatL2(dimension)
+        nlist = ivf_nlist(count)
+        if quantization in scalar_types:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, scalar_types[quantization])
+        elif quantization == QUANT_PQ:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_subquantizers(dimension), 8)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+    else:
+        if quantization in scalar_types:
+            index = faiss.IndexScalarQuantizer(dimension, scalar_types[quantization])
+        elif quantization == QUANT_PQ:
+            index = faiss.IndexPQ(dimension, pq_subquantizers(dimension), 8)
+        else:
+            index = faiss.IndexFlatL2(dimension)
+
+    if not index.is_trained:
+        index.train(vectors)
+    if index_type == INDEX_IVF:
+        # Cho phép reconstruct() để lưu/xây lại index
+        index.make_direct_map()
+
+    index.add(vectors)
+    configure_search(index)
+    return index
+
+
+def index_memory_bytes(index) -> int:
+    """Kích thước index khi serialize (mã vector + đồ thị/centroids), xấp xỉ RAM sử dụng"""
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def write_index(index, directory: str) -> None:
+    import faiss
+
+    faiss.write_index(index, os.path.join(directory, ANN_FILE))
+
+
+def read_index(directory: str) -> Optional[object]:
+    """Đọc index ANN đã lưu (mmap nếu được), None nếu thư mục không có"""
+    import faiss
+
+    path = os.path.join(directory, ANN_FILE)
+    if not os.path.isfile(path):
+        return None
+    try:
+        index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(path)
+    configure_search(index)
+    return index
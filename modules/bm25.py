@@ -0,0 +1,176 @@
+# modules/bm25.py
+
+"""
+Inverted index BM25 trong bộ nhớ, tokenize tiếng Việt có bỏ dấu
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import math
+import re
+import unicodedata
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+# Từ/số thông thường và mã có ký tự nối (ví dụ "10/2023/nd-cp", "4.2")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CODE_PATTERN = re.compile(r"[a-z0-9]+(?:[./-][a-z0-9]+)+")
+
+
+def fold_diacritics(text: str) -> str:
+    """Chữ thường và bỏ dấu tiếng Việt: "Điều khoản" -> "dieu khoan" """
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+
+def tokenize_vietnamese(text: str) -> List[str]:
+    """
+    Tách token theo âm tiết sau khi bỏ dấu, cộng thêm nguyên mã số/ký hiệu
+    để khớp chính xác số hiệu văn bản, điều khoản.
+    """
+    folded = fold_diacritics(text)
+    return _WORD_PATTERN.findall(folded) + _CODE_PATTERN.findall(folded)
+
+
+class BM25Index:
+    """
+    BM25 (Okapi) với posting list dạng mảng NumPy. Mỗi chunk giữ một slot cố định: xóa chunk để lại
+    slot trống (dồn lại khi quá nửa số slot trống), nên thêm/xóa chỉ xây lại mảng của các token thay đổi.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._slots: List[Optional[Document]] = []
+        self._slot_counts: List[Dict[str, int]] = []  # token -> tần suất, để xóa posting khi xóa chunk
+        self._doc_lengths: List[int] = []
+        self._live = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # Cache mảng NumPy: token thay đổi nằm trong _dirty, mảng độ dài/doc_id là None khi cần xây lại
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._dirty: Set[str] = set()
+        self._lengths_array: Optional[np.ndarray] = None
+        self._doc_id_array: Optional[np.ndarray] = None
+
+    @property
+    def documents(self) -> List[Document]:
+        return [document for document in self._slots if document is not None]
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _insert(self, document: Document, counts: Dict[str, int], length: int) -> None:
+        slot = len(self._slots)
+        self._slots.append(document)
+        self._slot_counts.append(counts)
+        self._doc_lengths.append(length)
+        for token, count in counts.items():
+            self._postings.setdefault(token, {})[slot] = count
+        self._dirty.update(counts)
+        self._live += 1
+
+    def add_documents(self, documents: List[Document]) -> None:
+        """Thêm chunks vào index"""
+        for document in documents:
+            tokens = tokenize_vietnamese(document.page_content)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            self._insert(document, counts, len(tokens))
+
+        self._lengths_array = None
+
+    def remove_document(self, doc_id: str) -> int:
+        """Xóa chunks của một tài liệu: bỏ posting của các chunk đó, slot để trống"""
+        removed = 0
+        for slot, document in enumerate(self._slots):
+            if document is None or document.metadata.get("doc_id") != doc_id:
+                continue
+            for token in self._slot_counts[slot]:
+                postings = self._postings[token]
+                del postings[slot]
+                if not postings:
+                    del self._postings[token]
+            self._dirty.update(self._slot_counts[slot])
+            self._slots[slot] = None
+            self._slot_counts[slot] = {}
+            self._doc_lengths[slot] = 0
+            removed += 1
+
+        if removed:
+            self._live -= removed
+            self._lengths_array = None
+            if self._live < len(self._slots) // 2:
+                self._compact()
+        return removed
+
+    def _compact(self) -> None:
+        """Dồn các slot trống (dùng lại tần suất token đã tính, không tokenize lại)"""
+        live = [
+            (document, counts, length)
+            for document, counts, length in zip(self._slots, self._slot_counts, self._doc_lengths)
+            if document is not None
+        ]
+        self.clear()
+        for document, counts, length in live:
+            self._insert(document, counts, length)
+
+    def clear(self) -> None:
+        self._slots = []
+        self._slot_counts = []
+        self._doc_lengths = []
+        self._live = 0
+        self._postings = {}
+        self._arrays = {}
+        self._dirty = set()
+        self._lengths_array = None
+
+    def _finalize(self) -> None:
+        for token in self._dirty:
+            postings = self._postings.get(token)
+            if postings is None:
+                self._arrays.pop(token, None)
+            else:
+                self._arrays[token] = (
+                    np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                    np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+                )
+        self._dirty = set()
+
+        if self._lengths_array is None:
+            self._lengths_array = np.asarray(self._doc_lengths, dtype=np.float32)
+            self._doc_id_array = np.asarray(
+                [d.metadata.get("doc_id", "") if d is not None else None for d in self._slots], dtype=object
+            )
+
+    def search(self, query: str, k: int = 20, doc_ids: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Trả về tối đa k chunks có điểm BM25 > 0, điểm giảm dần"""
+        if not self._live:
+            return []
+        if self._dirty or self._lengths_array is None:
+            self._finalize()
+
+        total = self._live
+        avg_length = max(float(self._lengths_array.sum()) / total, 1.0)
+        length_norm = self.k1 * (1 - self.b + self.b * self._lengths_array / avg_length)
+
+        scores = np.zeros(len(self._slots), dtype=np.float32)
+        for token in set(tokenize_vietnamese(query)):
+            posting = self._arrays.get(token)
+            if posting is None:
+                continue
+            indices, tfs = posting
+            idf = math.log(1 + (total - len(indices) + 0.5) / (len(indices) + 0.5))
+            scores[indices] += idf * tfs * (self.k1 + 1) / (tfs + length_norm[indices])
+
+        if doc_ids:
+            scores[~np.isin(self._doc_id_array, list(doc_ids))] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        return [(self._slots[i], float(scores[i])) for i in candidates]
@@ -0,0 +1,215 @@
+# modules/chunk_codec.py
+
+"""
+Định dạng nhị phân gọn cho danh sách chunks (không dùng pickle)
+
+Layout: MAGIC | version | codec | payload (có thể nén)
+Payload: header | offsets (uint64, n + 1) | bảng metadata (JSON theo cột) | text blob (UTF-8)
+"""
+
+from typing import Any, Dict, List, Optional
+import json
+import struct
+import zlib
+
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+MAGIC = b"RCHK"
+FORMAT_VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_LZ4 = 3
+
+_CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD, "lz4": CODEC_LZ4}
+
+_PREAMBLE = struct.Struct(">4sBB")
+# Số chunks, độ dài bảng metadata, độ dài text blob
+_HEADER = struct.Struct(">IQQ")
+
+
+def available_codecs() -> List[str]:
+    """Các codec nén dùng được trong môi trường hiện tại"""
+    codecs = ["none", "zlib"]
+    if zstandard is not None:
+        codecs.append("zstd")
+    if lz4_frame is not None:
+        codecs.append("lz4")
+    return codecs
+
+
+def _resolve_codec(compression: str) -> int:
+    """"auto" chọn zstd > lz4 > zlib; codec chưa cài thì lùi về zlib"""
+    if compression == "auto":
+        if zstandard is not None:
+            return CODEC_ZSTD
+        if lz4_frame is not None:
+            return CODEC_LZ4
+        return CODEC_ZLIB
+
+    codec = _CODEC_NAMES.get(compression)
+    if codec is None:
+        raise ValueError(f"Codec không hỗ trợ: {compression}")
+    if (codec == CODEC_ZSTD and zstandard is None) or (codec == CODEC_LZ4 and lz4_frame is None):
+        return CODEC_ZLIB
+    return codec
+
+
+def _compress(codec: int, payload: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(payload)
+    if codec == CODEC_LZ4:
+        return lz4_frame.compress(payload)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(payload, 6)
+    return payload
+
+
+def _decompress(codec: int, data: memoryview) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Cần cài zstandard để đọc chunk cache này")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_LZ4:
+        if lz4_frame is None:
+            raise ValueError("Cần cài lz4 để đọc chunk cache này")
+        return lz4_frame.decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_NONE:
+        # Không copy: dữ liệu có thể là vùng mmap dùng chung giữa các process
+        return data
+    raise ValueError(f"Codec không hợp lệ: {codec}")
+
+
+def _encode_metadata(metadatas: List[Dict[str, Any]]) -> bytes:
+    """
+    Metadata theo cột: key có ở mọi chunk lưu thành mảng đầy đủ,
+    key chỉ có ở một số chunk lưu thành các cặp [vị trí, giá trị].
+    """
+    keys: Dict[str, None] = {}
+    for metadata in metadatas:
+        keys.update(dict.fromkeys(metadata))
+
+    dense, sparse = {}, {}
+    for key in keys:
+        if all(key in metadata for metadata in metadatas):
+            dense[key] = [metadata[key] for metadata in metadatas]
+        else:
+            sparse[key] = [[i, metadata[key]] for i, metadata in enumerate(metadatas) if key in metadata]
+
+    return json.dumps({"dense": dense, "sparse": sparse}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_chunks(chunks: List[Document], compression: str = "auto") -> bytes:
+    """Mã hóa danh sách chunks thành bytes"""
+    codec = _resolve_codec(compression)
+
+    encoded_texts = [chunk.page_content.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(chunks) + 1, dtype=">u8")
+    if encoded_texts:
+        offsets[1:] = np.cumsum([len(text) for text in encoded_texts])
+    text_blob = b"".join(encoded_texts)
+    metadata_table = _encode_metadata([chunk.metadata or {} for chunk in chunks])
+
+    payload = b"".join([
+        _HEADER.pack(len(chunks), len(metadata_table), len(text_blob)),
+        offsets.tobytes(),
+        metadata_table,
+        text_blob,
+    ])
+    return _PREAMBLE.pack(MAGIC, FORMAT_VERSION, codec) + _compress(codec, payload)
+
+
+class ChunkArchive:
+    """
+    Chunks đã giải mã nhưng chưa tạo Document: text và metadata
+    chỉ được dựng khi truy cập tới từng chunk.
+    """
+
+    def __init__(self, data):
+        """data: bytes hoặc buffer (ví dụ mmap) - dữ liệu không nén được đọc trực tiếp, không copy"""
+        view = memoryview(data)
+        if len(view) < _PREAMBLE.size:
+            raise ValueError("Dữ liệu chunk cache không hợp lệ")
+
+        magic, version, codec = _PREAMBLE.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Dữ liệu chunk cache không hợp lệ")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Phiên bản chunk cache không hỗ trợ: {version}")
+
+        payload = memoryview(_decompress(codec, view[_PREAMBLE.size:]))
+        count, metadata_length, text_length = _HEADER.unpack_from(payload)
+
+        position = _HEADER.size
+        self._offsets = np.frombuffer(payload, dtype=">u8", count=count + 1, offset=position).astype(np.int64)
+        position += (count + 1) * 8
+
+        table = json.loads(bytes(payload[position:position + metadata_length]).decode("utf-8"))
+        position += metadata_length
+
+        self._text_blob = payload[position:position + text_length]
+        self._dense: Dict[str, List[Any]] = table["dense"]
+        self._sparse: Dict[str, Dict[int, Any]] = {
+            key: {index: value for index, value in pairs} for key, pairs in table["sparse"].items()
+        }
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def text(self, index: int) -> str:
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return str(self._text_blob[start:end], "utf-8")
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        metadata = {key: values[index] for key, values in self._dense.items()}
+        for key, values in self._sparse.items():
+            if index in values:
+                metadata[key] = values[index]
+        return metadata
+
+    def __getitem__(self, index: int) -> Document:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return Document(page_content=self.text(index), metadata=self.metadata(index))
+
+    def to_documents(self) -> List[Document]:
+        """Dựng toàn bộ Document một lượt (nhanh hơn truy cập từng chunk)"""
+        blob = bytes(self._text_blob)
+        offsets = self._offsets.tolist()
+        texts = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self._count)]
+
+        keys = list(self._dense)
+        rows = zip(*self._dense.values()) if keys else ((),) * self._count
+        metadatas = [dict(zip(keys, values)) for values in rows]
+        for key, values in self._sparse.items():
+            for index, value in values.items():
+                metadatas[index][key] = value
+
+        return [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+
+
+def decode_chunks(data: bytes) -> List[Document]:
+    """Giải mã bytes thành danh sách Document"""
+    return ChunkArchive(data).to_documents()
+
+
+def is_chunk_archive(data: Optional[Any]) -> bool:
+    return isinstance(data, (bytes, bytearray)) and bytes(data[:len(MAGIC)]) == MAGIC
@@ -0,0 +1,185 @@
+# modules/context_packer.py
+
+"""
+Đóng gói ngữ cảnh gửi LLM theo ngân sách token: cửa sổ ngữ cảnh của model trừ phần
+dành cho câu trả lời (max_tokens, tối đa nửa cửa sổ), system prompt và câu hỏi;
+phần còn lại chia cho lịch sử hội thoại và các chunks truy xuất được
+"""
+
+from collections import OrderedDict
+from typing import List, Optional
+import math
+import threading
+
+from langchain_core.documents import Document
+
+from config import app_config
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Không có tiktoken: tiếng Việt có dấu khoảng 2-3 ký tự mỗi token, ước lượng thiên về dư
+CHARS_PER_TOKEN = 2.5
+
+# Token cho tiêu đề "Tài liệu i (Trang p):" và dòng trống giữa các chunks
+DOCUMENT_HEADER_TOKENS = 12
+
+# Dự phòng sai số giữa tokenizer ước lượng và tokenizer thật của model
+SAFETY_MARGIN_TOKENS = 64
+
+DEFAULT_CONTEXT_WINDOW = 8192
+MODEL_CONTEXT_WINDOWS = {
+    "mistralai/mistral-7b-instruct": 32768,
+    "meta-llama/llama-2-7b-chat": 4096,
+    "google/gemma-7b-it": 8192,
+    "microsoft/DialoGPT-medium": 1024,
+}
+
+
+class TokenCounter:
+    """Đếm token bằng tiktoken nếu cài, nếu không thì ước lượng theo số ký tự; kết quả cache theo text"""
+
+    def __init__(self, encoding_name: str = "cl100k_base", cache_size: int = 4096):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding_name)
+            except Exception:
+                self._encoding = None
+        self.cache_size = max(1, cache_size)
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+
+        with self._lock:
+            tokens = self._counts.get(text)
+            if tokens is not None:
+                self._counts.move_to_end(text)
+                return tokens
+
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+        else:
+            tokens = math.ceil(len(text) / CHARS_PER_TOKEN)
+
+        with self._lock:
+            self._counts[text] = tokens
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cắt text còn tối đa max_tokens token"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+        return text[:int(max_tokens * CHARS_PER_TOKEN)]
+
+
+# Singleton token counter
+_token_counter_instance = None
+
+def get_token_counter() -> TokenCounter:
+    global _token_counter_instance
+    if _token_counter_instance is None:
+        _token_counter_instance = TokenCounter()
+    return _token_counter_instance
+
+
+def context_window_for(model_name: Optional[str]) -> int:
+    """Cửa sổ ngữ cảnh: llm_context_window nếu cấu hình, nếu không tra theo tên model"""
+    if app_config.llm_context_window > 0:
+        return app_config.llm_context_window
+    return MODEL_CONTEXT_WINDOWS.get(model_name or "", DEFAULT_CONTEXT_WINDOW)
+
+
+def deduplicate_chunks(docs: List[Document]) -> List[Document]:
+    """
+    Bỏ chunk rỗng, trùng nội dung hoặc nằm trọn trong chunk xếp trước (vd. cùng chunk
+    được nhiều retriever trả về). SemanticChunker không tạo chunks chồng lấn nên không
+    cần cắt phần chồng nhau theo start_index.
+    """
+    kept: List[Document] = []
+    for doc in docs:
+        text = doc.page_content
+        if not text.strip() or any(text in other.page_content for other in kept):
+            continue
+        kept.append(doc)
+    return kept
+
+
+class ContextPacker:
+    """Chia ngân sách token của prompt cho lịch sử và chunks, loại chunk điểm thấp trước khi vượt ngân sách"""
+
+    def __init__(self, model_name: Optional[str] = None, max_tokens: Optional[int] = None,
+                 counter: Optional[TokenCounter] = None):
+        self.counter = counter or get_token_counter()
+        self.context_window = context_window_for(model_name or app_config.default_model)
+        self.max_tokens = app_config.max_tokens if max_tokens is None else max_tokens
+        self.reserved_tokens = 0
+
+    def reserve(self, text: str) -> None:
+        """Token cố định của mọi prompt (system prompt)"""
+        self.reserved_tokens = self.counter.count(text)
+
+    @property
+    def answer_reserve(self) -> int:
+        """
+        Token dành cho câu trả lời: max_tokens nhưng không quá nửa cửa sổ, để model cửa sổ
+        nhỏ (vd. DialoGPT 1024 với MAX_TOKENS=1024) vẫn còn chỗ cho tài liệu
+        """
+        return min(self.max_tokens, self.context_window // 2)
+
+    @property
+    def prompt_budget(self) -> int:
+        """Token còn lại cho ngữ cảnh, lịch sử và câu hỏi"""
+        return max(0, self.context_window - self.answer_reserve - self.reserved_tokens - SAFETY_MARGIN_TOKENS)
+
+    def history_budget(self) -> int:
+        return int(self.prompt_budget * app_config.context_history_ratio)
+
+    def document_budget(self, question: str, chat_history: str = "") -> int:
+        return max(0, self.prompt_budget - self.counter.count(question) - self.counter.count(chat_history))
+
+    def pack(self, docs: List[Document], budget: int) -> List[Document]:
+        """
+        Chọn chunks theo điểm giảm dần (metadata["score"], không có thì theo thứ hạng truy xuất)
+        tới khi hết ngân sách; giữ nguyên thứ tự truy xuất trong kết quả.
+        Chunk tốt nhất không vừa ngân sách thì được cắt ngắn.
+        """
+        docs = deduplicate_chunks(docs)
+        if not docs:
+            return []
+
+        costs = [self.counter.count(doc.page_content) + DOCUMENT_HEADER_TOKENS for doc in docs]
+        ranking = sorted(
+            range(len(docs)),
+            key=lambda i: ((docs[i].metadata or {}).get("score", 0.0), -i),
+            reverse=True
+        )
+
+        selected, used = [], 0
+        for i in ranking:
+            if used + costs[i] <= budget:
+                selected.append(i)
+                used += costs[i]
+
+        if not selected:
+            best = docs[ranking[0]]
+            text = self.counter.truncate(best.page_content, budget - DOCUMENT_HEADER_TOKENS)
+            return [Document(page_content=text, metadata=dict(best.metadata or {}))] if text else []
+
+        return [docs[i] for i in sorted(selected)]
@@ -0,0 +1,328 @@
+# modules/embedding_store.py
+
+"""
+Ma trận embeddings cho tìm kiếm chính xác bằng NumPy: bản trong RAM, và bản lưu
+dạng .npy mở bằng memmap kèm file chunks đánh offset để nhiều session/process
+dùng chung trang nhớ qua page cache của hệ điều hành
+"""
+
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+import abc
+import mmap
+import os
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from config import app_config
+from .chunk_codec import ChunkArchive, encode_chunks
+from .mmr import maximal_marginal_relevance
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.bin"
+
+# Số dòng tính điểm mỗi lần (float16 được đổi sang float32 theo từng khối)
+SEARCH_BLOCK_ROWS = 65536
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Chuẩn hóa L2 từng dòng để tích vô hướng = cosine"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Chỉ số k điểm cao nhất, giảm dần (argpartition rồi chỉ sắp k phần tử)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def write_embedding_store(directory: str, vectors: np.ndarray, documents: List[Document], dtype: str = "float32") -> None:
+    """Ghi ma trận embeddings (đã chuẩn hóa) và chunks tương ứng theo cùng thứ tự"""
+    if len(vectors) != len(documents):
+        raise ValueError("Số vector và số chunks không khớp")
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, EMBEDDINGS_FILE), normalize_rows(vectors).astype(dtype))
+    with open(os.path.join(directory, CHUNKS_FILE), 'wb') as f:
+        f.write(encode_chunks(documents, compression="none"))
+
+
+class EmbeddingMatrix(abc.ABC):
+    """
+    Tìm kiếm chính xác trên ma trận embeddings đã chuẩn hóa.
+    Lớp con cung cấp self.vectors, self._doc_id_array và get_document().
+    Nếu có ann_index (FAISS, cùng thứ tự dòng), ứng viên lấy từ ANN rồi tính lại cosine chính xác.
+    """
+
+    vectors: np.ndarray
+    _doc_id_array: np.ndarray
+    ann_index: Any = None
+
+    def __len__(self) -> int:
+        return len(self._doc_id_array)
+
+    @property
+    def dtype(self) -> str:
+        return str(self.vectors.dtype)
+
+    @abc.abstractmethod
+    def get_document(self, index: int) -> Document:
+        """Chunk ở dòng index"""
+
+    def get_all_documents(self) -> List[Document]:
+        return [self.get_document(i) for i in range(len(self))]
+
+    def doc_id_mask(self, doc_ids: Optional[List[str]]) -> Optional[np.ndarray]:
+        if not doc_ids:
+            return None
+        return np.isin(self._doc_id_array, list(doc_ids))
+
+    def scores(self, query_vector: List[float]) -> np.ndarray:
+        """Cosine giữa câu hỏi và mọi chunk"""
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        vectors = self.vectors[:len(self)]
+        if vectors.dtype == np.float32:
+            return np.asarray(vectors @ query)
+
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        return scores
+
+    def search(self, query_vector: List[float], k: int, doc_ids: Optional[List[str]] = None) -> List[Tuple[int, float]]:
+        """Tìm chính xác top-k, trả về (vị trí chunk, cosine)"""
+        if len(self) == 0:
+            return []
+
+        if self.ann_index is not None:
+            hits = self._ann_search(query_vector, k, doc_ids)
+            if hits is not None:
+                return hits
+
+        scores = self.scores(query_vector)
+        mask = self.doc_id_mask(doc_ids)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        indices = top_k_indices(scores, k)
+        return [(int(i), float(scores[i])) for i in indices if np.isfinite(scores[i])]
+
+    def search_many(self, query_vectors: np.ndarray, k: int, doc_ids: Optional[List[str]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        search() cho nhiều câu hỏi: tìm chính xác bằng một phép nhân ma trận
+        (câu hỏi x chunks) theo từng khối dòng; có index ANN thì tìm từng câu
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if len(self) == 0 or len(query_vectors) == 0:
+            return [[] for _ in range(len(query_vectors))]
+        if self.ann_index is not None:
+            return [self.search(query_vector, k, doc_ids) for query_vector in query_vectors]
+
+        queries = normalize_rows(query_vectors)
+        vectors = self.vectors[:len(self)]
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+
+        mask = self.doc_id_mask(doc_ids)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+
+        results = []
+        for row in scores:
+            indices = top_k_indices(row, k)
+            results.append([(int(i), float(row[i])) for i in indices if np.isfinite(row[i])])
+        return results
+
+    def _ann_search(self, query_vector: List[float], k: int, doc_ids: Optional[List[str]] = None) -> Optional[List[Tuple[int, float]]]:
+        """
+        Lấy k * ann_candidate_factor ứng viên từ ANN rồi xếp lại bằng cosine chính xác.
+        Trả về None (tìm chính xác) nếu sau khi lọc doc_ids không đủ k ứng viên.
+        """
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        mask = self.doc_id_mask(doc_ids)
+
+        candidate_count = k * max(1, app_config.ann_candidate_factor)
+        if mask is not None:
+            # Lọc sau khi tìm: lấy thêm ứng viên theo tỉ lệ chunks thuộc các tài liệu được chọn
+            candidate_count = int(candidate_count * len(mask) / max(int(mask.sum()), 1))
+        candidate_count = min(candidate_count, len(self))
+
+        _, ids = self.ann_index.search(query[None, :], candidate_count)
+        ids = ids[0][ids[0] >= 0]
+        if mask is not None:
+            ids = ids[mask[ids]]
+        if len(ids) < k and (mask is None or int(mask.sum()) > len(ids)):
+            return None
+
+        ids = np.sort(ids)
+        scores = np.asarray(self.vectors[ids], dtype=np.float32) @ query
+        order = top_k_indices(scores, k)
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def mmr_search(self, query_vector: List[float], k: int, fetch_k: int = 20, lambda_mult: float = 0.5,
+                   doc_ids: Optional[List[str]] = None) -> List[Tuple[int, float]]:
+        """Lấy fetch_k ứng viên gần nhất rồi chọn k chunk đa dạng bằng MMR"""
+        hits = self.search(query_vector, max(k, fetch_k), doc_ids)
+        return self._mmr_rerank(query_vector, hits, k, lambda_mult)
+
+    def mmr_search_many(self, query_vectors: np.ndarray, k: int, fetch_k: int = 20, lambda_mult: float = 0.5,
+                        doc_ids: Optional[List[str]] = None) -> List[List[Tuple[int, float]]]:
+        """mmr_search() cho nhiều câu hỏi, ứng viên lấy bằng search_many()"""
+        all_hits = self.search_many(query_vectors, max(k, fetch_k), doc_ids)
+        return [
+            self._mmr_rerank(query_vector, hits, k, lambda_mult)
+            for query_vector, hits in zip(query_vectors, all_hits)
+        ]
+
+    def _mmr_rerank(self, query_vector: List[float], hits: List[Tuple[int, float]], k: int,
+                    lambda_mult: float) -> List[Tuple[int, float]]:
+        if not hits:
+            return []
+
+        candidates = np.asarray(self.vectors[[i for i, _ in hits]], dtype=np.float32)
+        selected = maximal_marginal_relevance(np.asarray(query_vector, dtype=np.float32), candidates, k, lambda_mult)
+        return [hits[i] for i in selected]
+
+
+class EmbeddingMatrixStore(EmbeddingMatrix):
+    """Store chỉ đọc: embeddings memmap + chunks đọc lười qua mmap"""
+
+    def __init__(self, vectors: np.ndarray, archive: ChunkArchive):
+        self.vectors = vectors
+        self.archive = archive
+        self._doc_id_array = np.asarray(
+            [archive.metadata(i).get("doc_id", "") for i in range(len(archive))], dtype=object
+        )
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return (Path(directory) / EMBEDDINGS_FILE).is_file() and (Path(directory) / CHUNKS_FILE).is_file()
+
+    @classmethod
+    def open(cls, directory: str) -> "EmbeddingMatrixStore":
+        """Mở store đã lưu: không đọc dữ liệu vào RAM, trang nhớ được nạp khi truy cập"""
+        vectors = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, CHUNKS_FILE), 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        archive = ChunkArchive(buffer)
+
+        if len(vectors) != len(archive):
+            raise ValueError("Embedding store bị hỏng: số vector và số chunks không khớp")
+        return cls(vectors, archive)
+
+    def get_document(self, index: int) -> Document:
+        return self.archive[index]
+
+    def get_all_documents(self) -> List[Document]:
+        return self.archive.to_documents()
+
+
+class InMemoryEmbeddingMatrix(EmbeddingMatrix):
+    """Ma trận float32 liên tục trong RAM, tăng dung lượng theo cấp số nhân khi thêm chunks"""
+
+    def __init__(self, dimension: Optional[int] = None):
+        self.vectors = np.empty((0, dimension or 0), dtype=np.float32)
+        self.documents: List[Document] = []
+        self._doc_id_array = np.empty(0, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def from_matrix(cls, matrix: EmbeddingMatrix) -> "InMemoryEmbeddingMatrix":
+        """Copy một ma trận (ví dụ store memmap chỉ đọc) vào RAM để có thể sửa"""
+        copy = cls()
+        copy.add(np.asarray(matrix.vectors[:len(matrix)], dtype=np.float32), matrix.get_all_documents())
+        return copy
+
+    def add(self, vectors: np.ndarray, documents: List[Document]) -> None:
+        if len(vectors) != len(documents):
+            raise ValueError("Số vector và số chunks không khớp")
+        if not documents:
+            return
+
+        vectors = normalize_rows(vectors)
+        count, needed = len(self.documents), len(self.documents) + len(documents)
+        if self.vectors.shape[1] != vectors.shape[1]:
+            if count:
+                raise ValueError("Số chiều embedding không khớp với store")
+            self.vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+
+        if needed > len(self.vectors):
+            grown = np.empty((max(needed, 2 * len(self.vectors)), vectors.shape[1]), dtype=np.float32)
+            grown[:count] = self.vectors[:count]
+            self.vectors = grown
+
+        self.vectors[count:needed] = vectors
+        self.documents.extend(documents)
+        self._doc_id_array = np.concatenate([
+            self._doc_id_array,
+            np.asarray([d.metadata.get("doc_id", "") for d in documents], dtype=object)
+        ])
+
+    def remove(self, doc_id: str) -> int:
+        keep = self._doc_id_array != doc_id
+        removed = int((~keep).sum())
+        if removed:
+            self.vectors = np.ascontiguousarray(self.vectors[:len(self)][keep])
+            self.documents = [d for d, kept in zip(self.documents, keep) if kept]
+            self._doc_id_array = self._doc_id_array[keep]
+        return removed
+
+    def get_document(self, index: int) -> Document:
+        return self.documents[index]
+
+    def get_all_documents(self) -> List[Document]:
+        return list(self.documents)
+
+
+class MatrixRetriever(BaseRetriever):
+    """
+    Retriever tìm kiếm chính xác (similarity hoặc mmr) trên EmbeddingMatrix.
+    store là EmbeddingMatrix hoặc store có thuộc tính matrix (NumpyVectorStore),
+    đọc lại mỗi lần truy vấn để thấy chunks thêm/xóa sau khi tạo retriever.
+    """
+
+    store: Any
+    embedding_model: Any
+    k: int = 5
+    doc_ids: Optional[List[str]] = None
+    search_type: str = "similarity"
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    @property
+    def matrix(self) -> EmbeddingMatrix:
+        return getattr(self.store, "matrix", self.store)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        matrix = self.matrix
+        query_vector = self.embedding_model.embed_query(query)
+        if self.search_type == "mmr":
+            hits = matrix.mmr_search(query_vector, self.k, self.fetch_k, self.lambda_mult, self.doc_ids)
+        else:
+            hits = matrix.search(query_vector, self.k, self.doc_ids)
+        return [matrix.get_document(i) for i, _ in hits]
+
+    def retrieve_batch(self, queries: List[str], query_vectors: np.ndarray) -> List[List[Document]]:
+        """Truy xuất cho nhiều câu hỏi đã embed sẵn trong một lượt tính điểm"""
+        matrix = self.matrix
+        if self.search_type == "mmr":
+            all_hits = matrix.mmr_search_many(query_vectors, self.k, self.fetch_k, self.lambda_mult, self.doc_ids)
+        else:
+            all_hits = matrix.search_many(query_vectors, self.k, self.doc_ids)
+        return [[matrix.get_document(i) for i, _ in hits] for hits in all_hits]
@@ -0,0 +1,354 @@
+# modules/embeddings.py
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import threading
+import time
+import unicodedata
+
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+from config import app_config
+from utils.cache import get_cache
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+
+
+# Registry model embedding dùng chung trong process: (model_name, device, normalize) -> model
+_models: Dict[Tuple[str, str, bool], Embeddings] = {}
+_warmed_up = set()
+_registry_lock = threading.Lock()
+
+
+def get_embedding_model(
+    model_name: Optional[str] = None,
+    device: Optional[str] = None,
+    normalize: bool = True
+) -> Embeddings:
+    """
+    Lấy embedding model dùng chung, chỉ tải trọng số một lần mỗi process.
+    An toàn khi nhiều session gọi đồng thời.
+    """
+    key = (model_name or app_config.embedding_model, device or app_config.embedding_device, normalize)
+
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        model = _models.get(key)
+        if model is None:
+            get_logger().info(f"Đang tải embedding model: {key[0]} ({key[1]})")
+            model = BatchedEmbeddings(HuggingFaceEmbeddings(
+                model_name=key[0],
+                model_kwargs={'device': key[1]},
+                encode_kwargs={'normalize_embeddings': key[2]}
+            ))
+            _models[key] = model
+    return model
+
+
+def warm_up_embedding_model(
+    model_name: Optional[str] = None,
+    device: Optional[str] = None,
+    normalize: bool = True,
+    background: bool = False
+) -> None:
+    """
+    Tải trước model và chạy thử một lần encode để lần upload đầu tiên không phải chờ.
+    background=True chạy trong thread riêng; get_embedding_model sẽ chờ nếu model đang tải.
+    """
+    key = (model_name or app_config.embedding_model, device or app_config.embedding_device, normalize)
+    if key in _warmed_up:
+        return
+
+    def _warm_up():
+        try:
+            get_embedding_model(*key).embed_query("khởi động")
+            _warmed_up.add(key)
+        except Exception as e:
+            get_logger().warning(f"Không thể warm-up embedding model: {str(e)}")
+
+    if background:
+        threading.Thread(target=_warm_up, name="embedding-warmup", daemon=True).start()
+    else:
+        _warm_up()
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache vector câu hỏi trong bộ nhớ (tùy chọn thêm tầng đĩa qua utils.cache),
+    key theo model và câu hỏi đã chuẩn hóa, dùng chung cho mọi session trong process.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, use_disk: Optional[bool] = None):
+        self.max_size = max(1, max_size or app_config.query_cache_size)
+        self.use_disk = app_config.query_cache_disk if use_disk is None else use_disk
+        self.metrics = get_metrics()
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Chuẩn hóa Unicode, chữ thường và gộp khoảng trắng"""
+        return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+    @staticmethod
+    def _disk_key(key: Tuple[str, str]) -> str:
+        return f"query_embedding_{hashlib.blake2b('|'.join(key).encode(), digest_size=20).hexdigest()}"
+
+    def get_or_compute(self, namespace: str, text: str, compute: Callable[[], List[float]]) -> List[float]:
+        key = (namespace, self.normalize(text))
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+
+        if vector is None and self.use_disk:
+            vector = get_cache().get(self._disk_key(key))
+            if vector is not None:
+                self._store(key, vector)
+
+        if vector is not None:
+            self.metrics.log_query_cache(hit=True)
+            return vector
+
+        self.metrics.log_query_cache(hit=False)
+        vector = compute()
+        self._store(key, vector)
+        if self.use_disk:
+            get_cache().set(self._disk_key(key), vector)
+        return vector
+
+    def get_or_compute_many(
+        self, namespace: str, texts: List[str], compute_many: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """Như get_or_compute cho nhiều câu hỏi: các câu chưa có trong cache được tính chung một lần"""
+        vectors: List[Optional[List[float]]] = []
+        missing: Dict[Tuple[str, str], List[int]] = {}
+
+        for i, text in enumerate(texts):
+            key = (namespace, self.normalize(text))
+            with self._lock:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+            if vector is None and self.use_disk:
+                vector = get_cache().get(self._disk_key(key))
+                if vector is not None:
+                    self._store(key, vector)
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+            self.metrics.log_query_cache(hit=vector is not None)
+            vectors.append(vector)
+
+        if missing:
+            keys = list(missing)
+            computed = compute_many([texts[missing[key][0]] for key in keys])
+            for key, vector in zip(keys, computed):
+                self._store(key, vector)
+                if self.use_disk:
+                    get_cache().set(self._disk_key(key), vector)
+                for i in missing[key]:
+                    vectors[i] = vector
+        return vectors
+
+    def _store(self, key: Tuple[str, str], vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryEmbeddingCache()
+    return _query_cache
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embed theo batch đã sắp xếp theo độ dài token để giảm padding.
+    Batch bị giới hạn bởi số text (max_batch_size) và tổng token sau padding
+    (max_batch_tokens); kết quả trả về đúng thứ tự ban đầu.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None
+    ):
+        self.base = base
+        self.max_batch_size = max(1, max_batch_size or app_config.embedding_batch_size)
+        self.max_batch_tokens = max(1, max_batch_tokens or app_config.embedding_max_batch_tokens)
+        self.metrics = get_metrics()
+
+        # SentenceTransformer nằm trong _client (bản mới) hoặc client (bản cũ)
+        client = getattr(base, "_client", None) or getattr(base, "client", None)
+        self._tokenizer = getattr(client, "tokenizer", None)
+        self._max_seq_length = getattr(client, "max_seq_length", None) or 512
+
+        # Vector phụ thuộc cả model lẫn việc chuẩn hóa, nên cả hai nằm trong key cache câu hỏi
+        normalize = getattr(base, "encode_kwargs", {}).get("normalize_embeddings", False)
+        self._query_namespace = f"{self.model_name}|normalize={normalize}"
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.base, "model_name", type(self.base).__name__)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Đếm số token mỗi text (ước lượng theo khoảng trắng nếu không có tokenizer)"""
+        if self._tokenizer is not None:
+            try:
+                encoded = self._tokenizer(
+                    texts,
+                    add_special_tokens=True,
+                    truncation=True,
+                    max_length=self._max_seq_length
+                )
+                return [len(ids) for ids in encoded["input_ids"]]
+            except Exception:
+                pass
+        return [min(len(text.split()) + 2, self._max_seq_length) for text in texts]
+
+    def _schedule(self, lengths: List[int]) -> List[List[int]]:
+        """Chia chỉ số text thành các batch, text dài nhất đứng đầu mỗi batch"""
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+        batches, current = [], []
+        for i in order:
+            # Sau padding, mỗi text trong batch dài bằng text đầu tiên
+            padded = lengths[current[0]] * (len(current) + 1) if current else lengths[i]
+            if current and (len(current) >= self.max_batch_size or padded > self.max_batch_tokens):
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        start_time = time.perf_counter()
+        lengths = self.count_tokens(texts)
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in self._schedule(lengths):
+            vectors = self.base.embed_documents([texts[i] for i in batch])
+            for i, vector in zip(batch, vectors):
+                results[i] = vector
+
+        self.metrics.log_embedding(len(texts), sum(lengths), time.perf_counter() - start_time)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        if not app_config.enable_query_cache:
+            return self.base.embed_query(text)
+        return get_query_cache().get_or_compute(
+            self._query_namespace, text, lambda: self.base.embed_query(text)
+        )
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed nhiều câu hỏi một lượt (theo batch như embed_documents) và nạp vào query cache,
+        các lần embed_query sau với cùng câu hỏi không phải tính lại.
+        Model có cấu hình riêng cho câu hỏi (query_encode_kwargs) thì embed từng câu.
+        """
+        if getattr(self.base, "query_encode_kwargs", None):
+            return [self.embed_query(text) for text in texts]
+        if not app_config.enable_query_cache:
+            return self.embed_documents(texts)
+        return get_query_cache().get_or_compute_many(self._query_namespace, texts, self.embed_documents)
+
+
+class ReusableEmbeddings(Embeddings):
+    """
+    Bọc embedding model để tái sử dụng vector đã tính.
+    - recording(): ghi lại các vector mà model tính ra (ví dụ câu trong SemanticChunker)
+    - prime(): nạp sẵn vector cho các đoạn text, các lần embed_documents sau sẽ dùng lại
+    """
+
+    def __init__(self, base: Embeddings):
+        self.base = base
+        self._primed: Dict[str, List[float]] = {}
+        self._recorded: Dict[str, List[float]] = {}
+        self._recording = False
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.base, "model_name", type(self.base).__name__)
+
+    @contextmanager
+    def recording(self) -> Iterator[None]:
+        """Ghi lại vector của mọi lần embed_documents trong khối with"""
+        self._recording = True
+        try:
+            yield
+        finally:
+            self._recording = False
+
+    def take_recorded(self) -> Dict[str, List[float]]:
+        """Lấy và xóa các vector đã ghi lại"""
+        with self._lock:
+            recorded, self._recorded = self._recorded, {}
+        return recorded
+
+    def prime(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Nạp sẵn vector cho các text (thay thế lần nạp trước)"""
+        with self._lock:
+            self._primed = dict(zip(texts, vectors))
+
+    def clear_primed(self) -> None:
+        with self._lock:
+            self._primed.clear()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing = []
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                vector = self._primed.get(text)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    results[i] = vector
+
+        if missing:
+            computed = self.base.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                results[i] = vector
+
+            if self._recording:
+                with self._lock:
+                    for i in missing:
+                        self._recorded[texts[i]] = results[i]
+
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed nhiều câu hỏi qua base (BatchedEmbeddings: một lượt, có query cache)"""
+        embed_queries = getattr(self.base, "embed_queries", None)
+        if embed_queries is None:
+            return [self.embed_query(text) for text in texts]
+        return embed_queries(texts)
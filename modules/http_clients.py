@@ -0,0 +1,99 @@
+# modules/http_clients.py
+
+"""
+HTTP client và OpenAI clients dùng chung tới OpenRouter. Tách khỏi llm_wrapper để không
+phụ thuộc ChatOpenAI: pool kết nối được dùng và kiểm thử độc lập với langchain.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Optional, Dict, Any, Tuple
+
+from config import app_config
+
+try:
+    import h2  # noqa: F401 - httpx cần h2 để dùng HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+def _http_client_options() -> Dict[str, Any]:
+    """Giới hạn pool, keep-alive và timeout cho HTTP client tới OpenRouter"""
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=app_config.llm_max_connections,
+            max_keepalive_connections=app_config.llm_max_keepalive_connections,
+            keepalive_expiry=app_config.llm_keepalive_expiry
+        ),
+        "timeout": httpx.Timeout(app_config.llm_request_timeout, connect=app_config.llm_connect_timeout),
+        "http2": app_config.llm_http2 and HTTP2_AVAILABLE
+    }
+
+
+class LoopLocalAsyncCompletions:
+    """
+    Thay cho AsyncOpenAI().chat.completions: mỗi event loop có AsyncOpenAI/httpx.AsyncClient riêng.
+    Kết nối của AsyncClient gắn với loop tạo ra nó, dùng lại ở loop khác (mỗi lần asyncio.run)
+    sẽ lỗi "Event loop is closed"; client của loop đã bị thu hồi được bỏ theo.
+    """
+
+    def __init__(self, client_kwargs: Dict[str, Any]):
+        self._client_kwargs = client_kwargs
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def for_running_loop(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            completions = self._clients.get(loop)
+            if completions is None:
+                import httpx
+                import openai
+
+                client = openai.AsyncOpenAI(http_client=httpx.AsyncClient(**_http_client_options()), **self._client_kwargs)
+                completions = client.chat.completions
+                self._clients[loop] = completions
+        return completions
+
+    async def create(self, **kwargs):
+        return await self.for_running_loop().create(**kwargs)
+
+
+# Singleton HTTP client và OpenAI clients (dùng chung toàn process)
+_http_client_instance = None
+_openai_clients: Optional[Tuple[Any, LoopLocalAsyncCompletions]] = None
+
+
+def get_http_client():
+    """
+    httpx.Client dùng chung cho mọi model và session: kết nối (và TLS) tới
+    OpenRouter được giữ keep-alive và dùng lại thay vì bắt tay lại mỗi lần
+    """
+    global _http_client_instance
+    if _http_client_instance is None:
+        import httpx
+
+        _http_client_instance = httpx.Client(**_http_client_options())
+    return _http_client_instance
+
+
+def _get_openai_clients() -> Tuple[Any, LoopLocalAsyncCompletions]:
+    """chat.completions sync (qua get_http_client()) và async (theo event loop), dùng chung mọi model"""
+    global _openai_clients
+    if _openai_clients is None:
+        import openai
+
+        client_kwargs = {
+            "api_key": app_config.openrouter_api_key,
+            "base_url": OPENROUTER_BASE_URL,
+            "max_retries": app_config.llm_max_retries
+        }
+        sync_client = openai.OpenAI(http_client=get_http_client(), **client_kwargs)
+        _openai_clients = (sync_client.chat.completions, LoopLocalAsyncCompletions(client_kwargs))
+    return _openai_clients
@@ -0,0 +1,85 @@
+# modules/hybrid_retriever.py
+
+"""
+Retriever kết hợp BM25 và dense retrieval bằng Reciprocal Rank Fusion
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from config import app_config
+
+
+def _document_key(document: Document) -> Tuple[Any, ...]:
+    """Định danh chunk để gộp kết quả từ hai nguồn"""
+    metadata = document.metadata or {}
+    return (
+        metadata.get("doc_id"),
+        metadata.get("page"),
+        metadata.get("start_index"),
+        document.page_content,
+    )
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], rrf_k: int = 60) -> List[Tuple[Document, float]]:
+    """Gộp nhiều bảng xếp hạng: score = tổng 1 / (rrf_k + rank)"""
+    scores: Dict[Tuple[Any, ...], float] = {}
+    documents: Dict[Tuple[Any, ...], Document] = {}
+
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(documents[key], score) for key, score in fused]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense retriever + BM25, kết quả gộp bằng RRF (điểm lưu trong metadata["score"])"""
+
+    dense_retriever: BaseRetriever
+    keyword_index: Any
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    doc_ids: Optional[List[str]] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._fuse(query, self.dense_retriever.invoke(query))
+
+    def retrieve_batch(self, queries: List[str], query_vectors: Any) -> List[List[Document]]:
+        """Truy xuất cho nhiều câu hỏi: nhánh dense dùng retrieve_batch nếu dense retriever hỗ trợ"""
+        if hasattr(self.dense_retriever, "retrieve_batch"):
+            dense_results = self.dense_retriever.retrieve_batch(queries, query_vectors)
+        else:
+            dense_results = [self.dense_retriever.invoke(query) for query in queries]
+        return [self._fuse(query, dense) for query, dense in zip(queries, dense_results)]
+
+    def _fuse(self, query: str, dense_results: List[Document]) -> List[Document]:
+        keyword_results = [doc for doc, _ in self.keyword_index.search(query, self.fetch_k, self.doc_ids)]
+        fused = reciprocal_rank_fusion([dense_results, keyword_results], self.rrf_k)
+
+        # Trả bản sao để không sửa metadata của document nằm trong store
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "score": score})
+            for doc, score in fused[:self.k]
+        ]
+
+
+def create_hybrid_retriever(dense_retriever: BaseRetriever, keyword_index, doc_ids: Optional[List[str]] = None) -> HybridRetriever:
+    """Tạo HybridRetriever với tham số từ AppConfig"""
+    return HybridRetriever(
+        dense_retriever=dense_retriever,
+        keyword_index=keyword_index,
+        k=app_config.retrieval_k,
+        fetch_k=app_config.hybrid_fetch_k,
+        rrf_k=app_config.rrf_k,
+        doc_ids=doc_ids
+    )
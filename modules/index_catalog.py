@@ -0,0 +1,201 @@
+# modules/index_catalog.py
+
+"""
+Danh mục các vector index đã persist, đánh key theo hash nội dung tài liệu
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from config import app_config
+from utils.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, liveness dựa vào mtime của file đánh dấu
+    fcntl = None
+
+
+# File đánh dấu thư mục index đang được một store mở (giữ shared lock suốt đời store)
+IN_USE_FILE = ".in_use"
+
+
+def claim_directory(path: str) -> Optional[IO]:
+    """
+    Đánh dấu thư mục index đang được dùng: cleanup_orphans của mọi process bỏ qua thư mục
+    còn file handle này mở. Giữ giá trị trả về cùng vòng đời store (đóng là nhả).
+    """
+    try:
+        handle = open(os.path.join(path, IN_USE_FILE), 'a')
+    except OSError:
+        return None
+
+    os.utime(handle.name)
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_SH)
+    return handle
+
+
+def _in_use(path: Path, cutoff: float) -> bool:
+    """Thư mục có store đang giữ claim (không có flock: file đánh dấu được chạm sau cutoff)"""
+    marker = path / IN_USE_FILE
+    if not marker.exists():
+        return False
+    if fcntl is None:
+        return marker.stat().st_mtime >= cutoff
+
+    with open(marker, 'a') as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(handle, fcntl.LOCK_UN)
+    return False
+
+
+class IndexCatalog:
+    """Ánh xạ tài liệu (hash nội dung) -> index Chroma/FAISS đã lưu trên đĩa"""
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir = Path(root_dir or app_config.index_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.catalog_file = self.root_dir / "catalog.json"
+        self.lock_file = self.root_dir / "catalog.lock"
+        self.logger = get_logger()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(doc_id: str) -> str:
+        """Key của index: hash tài liệu + model embedding + tham số chunking"""
+        params = "|".join([
+            doc_id,
+            app_config.embedding_model,
+            str(app_config.breakpoint_threshold),
+            str(app_config.min_chunk_size),
+        ])
+        return hashlib.blake2b(params.encode(), digest_size=16).hexdigest()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Khóa đọc-sửa-ghi catalog.json giữa các thread và giữa các process"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+
+            with open(self.lock_file, 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        # Ghi file tạm rồi rename để các process khác không đọc phải file dở dang
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, prefix=".catalog_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.catalog_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lấy entry của index; entry có thư mục đã mất sẽ bị xóa khỏi catalog"""
+        with self._locked():
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+
+            if not os.path.isdir(entry.get("path", "")):
+                del entries[key]
+                self._save(entries)
+                return None
+
+        return entry
+
+    def new_path(self, key: str) -> str:
+        """Tạo thư mục mới cho index (tên duy nhất để các session build song song không ghi đè nhau)"""
+        path = self.root_dir / f"{key}_{uuid.uuid4().hex[:8]}"
+        path.mkdir(parents=True, exist_ok=True)
+        return str(path)
+
+    def register(self, key: str, store_type: str, path: str, chunk_count: int) -> None:
+        """Ghi nhận index vừa build vào catalog"""
+        with self._locked():
+            entries = self._load()
+            entries[key] = {
+                "store_type": store_type,
+                "path": path,
+                "chunks": chunk_count,
+                "embedding_model": app_config.embedding_model,
+                "created": time.time()
+            }
+            self._save(entries)
+
+    def remove(self, key: str) -> None:
+        """Xóa index khỏi catalog và đĩa"""
+        with self._locked():
+            entries = self._load()
+            entry = entries.pop(key, None)
+            self._save(entries)
+
+        if entry:
+            shutil.rmtree(entry.get("path", ""), ignore_errors=True)
+
+    def cleanup_orphans(self, max_age: Optional[int] = None) -> int:
+        """
+        Dọn các thư mục index không còn được tham chiếu và thư mục chroma_db_* tạm
+        cũ hơn max_age giây mà không store nào đang giữ claim. Trả về số thư mục đã xóa.
+        """
+        max_age = app_config.index_orphan_max_age if max_age is None else max_age
+        cutoff = time.time() - max_age
+
+        with self._locked():
+            referenced = {os.path.realpath(entry.get("path", "")) for entry in self._load().values()}
+
+        candidates = [p for p in self.root_dir.iterdir() if p.is_dir() and os.path.realpath(p) not in referenced]
+        candidates += list(Path(tempfile.gettempdir()).glob("chroma_db_*"))
+
+        removed = 0
+        for path in candidates:
+            try:
+                if path.is_dir() and path.stat().st_mtime < cutoff and not _in_use(path, cutoff):
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                pass
+
+        if removed:
+            self.logger.info(f"Đã dọn {removed} thư mục index mồ côi")
+        return removed
+
+
+# Singleton catalog
+_catalog_instance = None
+
+def get_index_catalog() -> IndexCatalog:
+    global _catalog_instance
+    if _catalog_instance is None:
+        _catalog_instance = IndexCatalog()
+        _catalog_instance.cleanup_orphans()
+    return _catalog_instance
@@ -1,13 +1,49 @@
 # modules/llm_wrapper.py
 
 import os
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, Tuple
 from langchain_community.chat_models import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from config import app_config
 from utils.logger import get_logger
 
+from .http_clients import OPENROUTER_BASE_URL, get_http_client, _get_openai_clients  # noqa: F401
+
+# Các ChatOpenAI đã tạo (dùng chung toàn process)
+_chat_models: Dict[Tuple[str, float, int], ChatOpenAI] = {}
+_chat_models_lock = threading.Lock()
+
+
+def get_chat_model(model_name: Optional[str] = None, temperature: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> ChatOpenAI:
+    """ChatOpenAI dùng chung theo (model, temperature, max_tokens), cùng HTTP client"""
+    key = (
+        model_name or app_config.default_model,
+        app_config.temperature if temperature is None else temperature,
+        app_config.max_tokens if max_tokens is None else max_tokens
+    )
+    
+    with _chat_models_lock:
+        llm = _chat_models.get(key)
+        if llm is None:
+            sync_completions, async_completions = _get_openai_clients()
+            llm = ChatOpenAI(
+                openai_api_base=OPENROUTER_BASE_URL,
+                openai_api_key=app_config.openrouter_api_key,
+                model=key[0],
+                temperature=key[1],
+                max_tokens=key[2],
+                request_timeout=app_config.llm_request_timeout,
+                max_retries=app_config.llm_max_retries,
+                client=sync_completions,
+                async_client=async_completions,
+                streaming=True  # Enable streaming for better UX
+            )
+            _chat_models[key] = llm
+        return llm
+
 
 class LLMWrapper:
     def __init__(self, model_name: Optional[str] = None):
@@ -22,14 +58,8 @@ class LLMWrapper:
         if not app_config.openrouter_api_key:
             raise ValueError("⚠️ Không tìm thấy OPENROUTER_API_KEY trong file .env")
 
-        self.llm = ChatOpenAI(
-            openai_api_base="https://openrouter.ai/api/v1",
-            openai_api_key=app_config.openrouter_api_key,
-            model=self.model_name,
-            temperature=app_config.temperature,
-            max_tokens=app_config.max_tokens,
-            streaming=True  # Enable streaming for better UX
-        )
+        # Dùng lại client đã tạo cho cùng model/temperature/max_tokens (giữ kết nối HTTP)
+        self.llm = get_chat_model(self.model_name)
         
         self.logger.success("LLM đã khởi tạo thành công")
 
@@ -0,0 +1,82 @@
+# modules/mmr.py
+
+"""
+Maximal Marginal Relevance vector hóa bằng NumPy, dùng chung cho mọi backend
+(Chroma, FAISS, NumPy/memmap): backend chỉ cần trả về fetch_k ứng viên kèm vector
+"""
+
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def maximal_marginal_relevance(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Mỗi bước chọn ứng viên có lambda * sim(query) - (1 - lambda) * max sim(đã chọn) lớn nhất.
+    max sim được cập nhật dần bằng độ tương đồng với ứng viên vừa chọn (k phép nhân
+    ma trận-vector thay vì ma trận fetch_k x fetch_k). Trả về vị trí trong candidates.
+    """
+    count = len(candidates)
+    k = min(k, count)
+    if k <= 0:
+        return []
+
+    candidates = _normalize(candidates)
+    relevance = candidates @ _normalize(query).reshape(-1)
+    weighted_relevance = lambda_mult * relevance
+
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected = [int(np.argmax(relevance))]
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        np.maximum(redundancy, candidates @ candidates[selected[-1]], out=redundancy)
+        mmr_scores = weighted_relevance - (1 - lambda_mult) * redundancy
+        mmr_scores[~available] = -np.inf
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        available[best] = False
+
+    return selected
+
+
+class MMRRetriever(BaseRetriever):
+    """
+    Retriever MMR trên store có mmr_candidates(query_vector, fetch_k, doc_ids)
+    trả về (danh sách Document, ma trận vector cùng thứ tự)
+    """
+
+    store: Any
+    embedding_model: Any
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    doc_ids: Optional[List[str]] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._select(self.embedding_model.embed_query(query))
+
+    def retrieve_batch(self, queries: List[str], query_vectors: np.ndarray) -> List[List[Document]]:
+        """Truy xuất cho nhiều câu hỏi đã embed sẵn (không embed lại)"""
+        return [self._select(query_vector) for query_vector in query_vectors]
+
+    def _select(self, query_vector) -> List[Document]:
+        documents, vectors = self.store.mmr_candidates(query_vector, max(self.k, self.fetch_k), self.doc_ids)
+        if not documents:
+            return []
+
+        selected = maximal_marginal_relevance(np.asarray(query_vector, dtype=np.float32), vectors, self.k, self.lambda_mult)
+        return [documents[i] for i in selected]
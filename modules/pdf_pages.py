@@ -0,0 +1,46 @@
+# modules/pdf_pages.py
+
+"""
+Trích text theo dải trang cho các process con đọc PDF song song. Module chỉ phụ thuộc
+pypdf để process con (spawn) khởi động nhanh, không phải import langchain/model embedding.
+Text và metadata giống PyPDFLoader để kết quả (và cache) không phụ thuộc cách đọc.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+
+def pdf_metadata(reader: PdfReader, source: str) -> Dict[str, Any]:
+    """Metadata chung của các trang như PyPDFLoader: thông tin PDF (producer, creator, ngày tạo...) + source, total_pages"""
+    raw = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    raw.update(reader.metadata or {})
+    raw.update({"source": source, "total_pages": len(reader.pages)})
+
+    metadata: Dict[str, Any] = {}
+    for key, value in raw.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = key.lstrip("/").lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                value = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                pass
+        elif isinstance(value, str):
+            value = value.strip()
+        metadata[key] = value
+    return metadata
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str, Optional[str]]]:
+    """Trích text các trang [start, end) - chạy trong process con"""
+    reader = PdfReader(file_path)
+    labels = reader.page_labels
+    pages = []
+    for page_number in range(start, end):
+        text = reader.pages[page_number].extract_text() or ""
+        label = labels[page_number] if page_number < len(labels) else None
+        pages.append((page_number, text, label))
+    return pages
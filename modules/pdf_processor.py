@@ -1,22 +1,39 @@
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+from langchain_experimental.text_splitter import SemanticChunker, combine_sentences
 from langchain_core.documents import Document
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from pypdf import PdfReader
+from typing import Dict, Iterator, List, NamedTuple, Optional
+import numpy as np
 import hashlib
 import os
+import re
 
 from config import app_config
 from utils.logger import get_logger
 from utils.cache import get_cache
 from utils.metrics import get_metrics
+from .embeddings import ReusableEmbeddings, get_embedding_model
+from .pdf_pages import extract_page_range, pdf_metadata
+from .chunk_codec import FORMAT_VERSION, decode_chunks, encode_chunks, is_chunk_archive
+
+# Kích thước mỗi khối đọc khi băm nội dung file (1MB)
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ChunkBatch(NamedTuple):
+    """Chunks của một cửa sổ trang cùng tiến độ đọc file"""
+    chunks: List[Document]
+    pages_done: int
+    total_pages: int
 
 
 class PDFProcessor:
     def __init__(self, embedding_model=None):
         """
         Khởi tạo PDFProcessor với mô hình embedding.
-        Nếu không truyền vào, dùng mô hình tiếng Việt từ BKAI.
+        Nếu không truyền vào, dùng mô hình dùng chung từ registry (mặc định BKAI tiếng Việt).
         """
         self.logger = get_logger()
         self.cache = get_cache()
@@ -24,11 +41,12 @@ class PDFProcessor:
         
         self.logger.info("Khởi tạo PDFProcessor...")
         
-        self.embedding_model = embedding_model or HuggingFaceEmbeddings(
-            model_name=app_config.embedding_model,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        base_model = embedding_model or get_embedding_model()
+        # Bọc model để vector store dùng lại vector tính trong lúc chunking
+        if isinstance(base_model, ReusableEmbeddings):
+            self.embedding_model = base_model
+        else:
+            self.embedding_model = ReusableEmbeddings(base_model)
 
         self.semantic_splitter = SemanticChunker(
             embeddings=self.embedding_model,
@@ -41,28 +59,67 @@ class PDFProcessor:
         
         self.logger.success("PDFProcessor đã khởi tạo thành công")
 
+    @staticmethod
+    def compute_file_hash(file_path: str) -> str:
+        """
+        Băm nội dung file bằng BLAKE2b (đọc theo từng khối).
+        Cùng một tài liệu luôn cho cùng một hash, bất kể đường dẫn hay mtime.
+        """
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def _get_chunk_cache_key(self, file_hash: str) -> str:
+        """Tạo cache key từ hash nội dung và các tham số chunking"""
+        params = "|".join([
+            file_hash,
+            app_config.embedding_model,
+            str(app_config.breakpoint_threshold),
+            str(app_config.min_chunk_size),
+            f"format={FORMAT_VERSION}",
+        ])
+        return f"pdf_chunks_{hashlib.blake2b(params.encode(), digest_size=20).hexdigest()}"
+
+    def _get_cached_chunks(self, cache_key: str) -> Optional[List[Document]]:
+        """Đọc chunks từ cache (định dạng chunk_codec), dữ liệu hỏng coi như miss"""
+        data = self.cache.get(cache_key)
+        if not is_chunk_archive(data):
+            return None
+        try:
+            return decode_chunks(data)
+        except Exception as e:
+            self.logger.warning(f"Bỏ qua chunk cache không đọc được: {str(e)}")
+            return None
+
+    def _set_cached_chunks(self, cache_key: str, chunks: List[Document]) -> None:
+        try:
+            self.cache.set(cache_key, encode_chunks(chunks, app_config.chunk_cache_compression))
+        except Exception as e:
+            self.logger.warning(f"Không cache được chunks: {str(e)}")
+
     def load_and_chunk(self, file_path: str) -> List[Document]:
         """
         Đọc file PDF và chia thành các đoạn (chunk) ngữ nghĩa.
         Trả về danh sách chunks với caching.
         """
         try:
-            # Tạo cache key từ file path và modification time
-            file_stat = os.stat(file_path)
-            cache_key = f"pdf_chunks_{hashlib.md5(file_path.encode()).hexdigest()}_{file_stat.st_mtime}"
+            # Tạo cache key từ nội dung file, không phụ thuộc đường dẫn tạm
+            doc_id = self.compute_file_hash(file_path)
+            cache_key = self._get_chunk_cache_key(doc_id)
             
             # Kiểm tra cache
             if app_config.enable_cache:
-                cached_chunks = self.cache.get(cache_key)
+                cached_chunks = self._get_cached_chunks(cache_key)
                 if cached_chunks:
                     self.logger.info(f"Sử dụng cache cho file: {os.path.basename(file_path)}")
-                    return cached_chunks
+                    return self._tag_chunks(cached_chunks, doc_id, file_path)
             
             self.logger.info(f"Đang xử lý file: {os.path.basename(file_path)}")
             
             # Load PDF
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
+            documents = self._load_pages(file_path)
             
             if not documents:
                 raise ValueError("Không thể đọc được nội dung từ file PDF")
@@ -70,11 +127,11 @@ class PDFProcessor:
             self.logger.info(f"Đã tải {len(documents)} trang từ PDF")
             
             # Chunk documents
-            chunks = self.semantic_splitter.split_documents(documents)
+            chunks = self._tag_chunks(self._split_documents(documents), doc_id, file_path)
             
             # Cache kết quả
             if app_config.enable_cache:
-                self.cache.set(cache_key, chunks)
+                self._set_cached_chunks(cache_key, chunks)
             
             # Log metrics
             self.metrics.log_document_processed(os.path.basename(file_path), len(chunks))
@@ -86,6 +143,200 @@ class PDFProcessor:
             self.logger.error(f"Lỗi khi xử lý PDF: {str(e)}")
             raise
     
+    def iter_chunk_batches(self, file_path: str, window_size: Optional[int] = None) -> Iterator[ChunkBatch]:
+        """
+        Đọc và chunk PDF theo từng cửa sổ trang, yield chunks của mỗi cửa sổ.
+        Vector chunk của cửa sổ hiện tại được nạp sẵn vào embedding model,
+        nên cần index batch trước khi lấy batch tiếp theo.
+        """
+        try:
+            window_size = window_size or app_config.ingest_window_pages
+            doc_id = self.compute_file_hash(file_path)
+            cache_key = self._get_chunk_cache_key(doc_id)
+            total_pages = self._count_pages(file_path)
+
+            if app_config.enable_cache:
+                cached_chunks = self._get_cached_chunks(cache_key)
+                if cached_chunks:
+                    self.logger.info(f"Sử dụng cache cho file: {os.path.basename(file_path)}")
+                    yield ChunkBatch(self._tag_chunks(cached_chunks, doc_id, file_path), total_pages, total_pages)
+                    return
+
+            self.logger.info(f"Đang xử lý file theo cửa sổ {window_size} trang: {os.path.basename(file_path)}")
+
+            all_chunks = []
+            window = []
+            pages_done = 0
+
+            for page in self._iter_pages(file_path, total_pages):
+                window.append(page)
+                if len(window) >= window_size:
+                    pages_done += len(window)
+                    chunks = self._tag_chunks(self._split_documents(window), doc_id, file_path)
+                    all_chunks.extend(chunks)
+                    window = []
+                    yield ChunkBatch(chunks, pages_done, max(total_pages, pages_done))
+
+            if window:
+                pages_done += len(window)
+                chunks = self._tag_chunks(self._split_documents(window), doc_id, file_path)
+                all_chunks.extend(chunks)
+                yield ChunkBatch(chunks, pages_done, max(total_pages, pages_done))
+
+            if not pages_done:
+                raise ValueError("Không thể đọc được nội dung từ file PDF")
+
+            if app_config.enable_cache:
+                self._set_cached_chunks(cache_key, all_chunks)
+
+            self.metrics.log_document_processed(os.path.basename(file_path), len(all_chunks))
+            self.logger.success(f"Đã chia {pages_done} trang thành {len(all_chunks)} chunks semantic")
+
+        except Exception as e:
+            self.logger.error(f"Lỗi khi xử lý PDF: {str(e)}")
+            raise
+
+    @staticmethod
+    def _tag_chunks(chunks: List[Document], doc_id: str, source: str) -> List[Document]:
+        """
+        Gắn doc_id (hash nội dung file) và đường dẫn hiện tại vào metadata của từng chunk.
+        Chunk lấy từ cache theo hash nội dung mang source của lần xử lý trước nên phải ghi đè.
+        """
+        for chunk in chunks:
+            chunk.metadata["doc_id"] = doc_id
+            chunk.metadata["source"] = source
+        return chunks
+
+    def _count_pages(self, file_path: str) -> int:
+        """Đếm số trang (chỉ đọc cấu trúc PDF, không trích text)"""
+        try:
+            return len(PdfReader(file_path).pages)
+        except Exception as e:
+            self.logger.warning(f"Không thể đếm số trang PDF: {str(e)}")
+            return 0
+
+    def _load_pages(self, file_path: str) -> List[Document]:
+        """Đọc toàn bộ các trang PDF"""
+        return list(self._iter_pages(file_path, self._count_pages(file_path)))
+
+    def _iter_pages(self, file_path: str, total_pages: int) -> Iterator[Document]:
+        """
+        Đọc lần lượt các trang PDF. File lớn được chia dải trang cho nhiều process,
+        file nhỏ (hoặc khi chạy song song lỗi) đọc tuần tự bằng PyPDFLoader.
+        """
+        workers = app_config.pdf_extract_workers or os.cpu_count() or 1
+
+        if workers > 1 and total_pages >= app_config.pdf_parallel_min_pages:
+            pages_read = 0
+            try:
+                for page in self._iter_pages_parallel(file_path, total_pages, workers):
+                    pages_read += 1
+                    yield page
+                return
+            except Exception as e:
+                # Đã trả về một phần trang thì không thể đọc lại từ đầu
+                if pages_read:
+                    raise
+                self.logger.warning(f"Không thể đọc song song, chuyển sang đọc tuần tự: {str(e)}")
+
+        yield from PyPDFLoader(file_path).lazy_load()
+
+    def _iter_pages_parallel(self, file_path: str, total_pages: int, workers: int) -> Iterator[Document]:
+        """Trích text song song theo dải trang, giữ nguyên thứ tự trang"""
+        # Chia nhỏ hơn số worker để cân bằng tải giữa các dải trang nặng/nhẹ
+        range_size = max(1, -(-total_pages // (workers * 4)))
+        starts = list(range(0, total_pages, range_size))
+        ends = [min(start + range_size, total_pages) for start in starts]
+
+        self.logger.info(f"Đọc song song {total_pages} trang với {workers} process")
+
+        doc_metadata = pdf_metadata(PdfReader(file_path), file_path)
+
+        # spawn: process con không kế thừa lock/thread của process cha (Streamlit, tokenizer, torch)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # executor.map trả kết quả theo đúng thứ tự dải trang
+            for pages in executor.map(extract_page_range, [file_path] * len(starts), starts, ends):
+                for page_number, text, label in pages:
+                    metadata = {**doc_metadata, "page": page_number}
+                    if label is not None:
+                        metadata["page_label"] = label
+                    yield Document(page_content=text, metadata=metadata)
+
+    def _split_documents(self, documents: List[Document]) -> List[Document]:
+        """Chunk documents, giữ lại vector câu để suy ra vector chunk nếu được bật"""
+        if not app_config.reuse_sentence_embeddings:
+            return self.semantic_splitter.split_documents(documents)
+
+        with self.embedding_model.recording():
+            chunks = self.semantic_splitter.split_documents(documents)
+
+        sentence_vectors = self.embedding_model.take_recorded()
+        primed = self._prime_chunk_vectors(documents, chunks, sentence_vectors)
+        self.logger.info(f"Tái sử dụng vector câu cho {primed}/{len(chunks)} chunks")
+        return chunks
+
+    def _prime_chunk_vectors(
+        self,
+        documents: List[Document],
+        chunks: List[Document],
+        sentence_vectors: Dict[str, List[float]]
+    ) -> int:
+        """
+        Suy ra vector của mỗi chunk bằng trung bình (đã chuẩn hóa) vector các câu
+        tạo nên chunk đó, rồi nạp sẵn vào embedding model.
+        SemanticChunker ghép câu liên tiếp bằng " ", nên có thể dò lại ranh giới câu.
+        Trả về số chunk đã có vector.
+        """
+        split_regex = getattr(self.semantic_splitter, "sentence_split_regex", r"(?<=[.?!])\s+")
+        buffer_size = getattr(self.semantic_splitter, "buffer_size", 1)
+
+        texts, vectors = [], []
+        chunk_index = 0
+
+        for document in documents:
+            sentences = re.split(split_regex, document.page_content)
+
+            # Trang chỉ có một câu không được embed khi chunking
+            if len(sentences) == 1:
+                chunk_index += 1
+                continue
+
+            combined = combine_sentences(
+                [{"sentence": x, "index": i} for i, x in enumerate(sentences)],
+                buffer_size
+            )
+            page_vectors = [sentence_vectors.get(x["combined_sentence"]) for x in combined]
+
+            position = 0
+            while position < len(sentences):
+                if chunk_index >= len(chunks):
+                    return self._finish_priming(texts, vectors)
+
+                chunk_text = chunks[chunk_index].page_content
+                count = len(re.split(split_regex, chunk_text))
+
+                # Ranh giới không khớp: dừng lại, phần còn lại sẽ được embed bình thường
+                if " ".join(sentences[position:position + count]) != chunk_text:
+                    return self._finish_priming(texts, vectors)
+
+                group = page_vectors[position:position + count]
+                if all(vector is not None for vector in group):
+                    mean = np.mean(np.asarray(group, dtype=np.float32), axis=0)
+                    norm = np.linalg.norm(mean)
+                    if norm > 0:
+                        mean /= norm
+                    texts.append(chunk_text)
+                    vectors.append(mean.tolist())
+
+                position += count
+                chunk_index += 1
+
+        return self._finish_priming(texts, vectors)
+
+    def _finish_priming(self, texts: List[str], vectors: List[List[float]]) -> int:
+        self.embedding_model.prime(texts, vectors)
+        return len(texts)
+
     def get_document_info(self, file_path: str) -> dict:
         """Lấy thông tin cơ bản về document"""
         try:
@@ -1,7 +1,13 @@
 # modules/rag_pipeline.py
 
 import time
-from typing import List, Dict, Any, Optional, Iterator
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
+import numpy as np
 from langchain import hub
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
@@ -11,6 +17,9 @@ from langchain_core.prompts import ChatPromptTemplate
 from config import app_config
 from utils.logger import get_logger
 from utils.metrics import get_metrics
+from .embeddings import QueryEmbeddingCache, get_embedding_model
+from .context_packer import ContextPacker, TokenCounter, get_token_counter
+from .stream_renderer import ReplayedChunk
 
 
 class ConversationMemory:
@@ -32,33 +41,236 @@ class ConversationMemory:
         if len(self.history) > self.max_history:
             self.history = self.history[-self.max_history:]
     
-    def get_context(self) -> str:
-        """Lấy context từ lịch sử cuộc trò chuyện"""
+    def get_context(self, max_tokens: Optional[int] = None, counter: Optional[TokenCounter] = None) -> str:
+        """
+        Lấy context từ lịch sử cuộc trò chuyện.
+        max_tokens: giữ các exchange gần nhất vừa ngân sách (exchange mới nhất bị cắt bớt nếu quá dài)
+        """
         if not self.history:
             return ""
         
-        context_parts = []
-        for exchange in self.history[-3:]:  # Lấy 3 exchanges gần nhất
-            context_parts.append(f"Câu hỏi: {exchange['question']}")
-            context_parts.append(f"Trả lời: {exchange['answer']}")
+        exchanges = [
+            f"Câu hỏi: {exchange['question']}\nTrả lời: {exchange['answer']}"
+            for exchange in self.history[-3:]  # Lấy 3 exchanges gần nhất
+        ]
+        if max_tokens is None:
+            return "\n".join(exchanges)
+        
+        counter = counter or get_token_counter()
+        kept, used = [], 0
+        for text in reversed(exchanges):
+            tokens = counter.count(text)
+            if used + tokens > max_tokens:
+                if not kept:
+                    kept.append(counter.truncate(text, max_tokens))
+                break
+            kept.append(text)
+            used += tokens
         
-        return "\n".join(context_parts)
+        return "\n".join(reversed([text for text in kept if text]))
     
     def clear(self):
         """Xóa lịch sử cuộc trò chuyện"""
         self.history = []
 
 
+class _QuestionVectors:
+    """Vector câu hỏi (đã chuẩn hóa) của một ngữ cảnh, xếp thành ma trận để so khớp bằng một phép nhân"""
+    
+    def __init__(self, dimension: int):
+        self.matrix = np.empty((4, dimension), dtype=np.float32)
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+    
+    @property
+    def dimension(self) -> int:
+        return self.matrix.shape[1]
+    
+    def add(self, key: str, vector: np.ndarray):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+            self.rows[key] = row
+            self.keys.append(key)
+        self.matrix[row] = vector
+    
+    def remove(self, key: str):
+        """Bỏ một dòng: dòng cuối được chuyển vào chỗ trống"""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        last_key = self.keys.pop()
+        if last_key != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last_key
+            self.rows[last_key] = row
+    
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        return self.matrix[:len(self.keys)] @ query
+
+
+class AnswerCache:
+    """
+    Cache câu trả lời dùng chung giữa các session, key theo ngữ cảnh
+    (tài liệu + chunks truy xuất được + model + temperature + lịch sử) và câu hỏi.
+    Có thể khớp câu hỏi gần giống trong cùng ngữ cảnh bằng cosine của vector câu hỏi:
+    vector được giữ thành một ma trận cho mỗi ngữ cảnh, tra cứu là một phép nhân ma trận-vector.
+    """
+    
+    def __init__(self, max_size: int = 512, ttl: int = 3600, similarity_threshold: float = 0.95):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._vectors: Dict[str, _QuestionVectors] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def near_duplicate_enabled(self) -> bool:
+        return 0 < self.similarity_threshold < 1
+    
+    @staticmethod
+    def make_context_key(parts: List[str]) -> str:
+        return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=20).hexdigest()
+    
+    @staticmethod
+    def _entry_key(context_key: str, question: str) -> str:
+        return f"{context_key}:{QueryEmbeddingCache.normalize(question)}"
+    
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["created"] > self.ttl
+    
+    def _remove(self, key: str):
+        """Xóa entry và vector của nó (gọi khi đang giữ lock)"""
+        entry = self._entries.pop(key)
+        vectors = self._vectors.get(entry["context_key"])
+        if vectors is not None:
+            vectors.remove(key)
+            if not vectors.keys:
+                del self._vectors[entry["context_key"]]
+    
+    def get(self, context_key: str, question: str) -> Optional[str]:
+        """Tìm câu trả lời trùng khớp chính xác (sau chuẩn hóa câu hỏi)"""
+        key = self._entry_key(context_key, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry["answer"]
+    
+    def get_similar(self, context_key: str, question_vector: List[float]) -> Optional[str]:
+        """Tìm câu trả lời của câu hỏi gần giống nhất trong cùng ngữ cảnh"""
+        query = self._normalize_vector(question_vector)
+        
+        with self._lock:
+            vectors = self._vectors.get(context_key)
+            if vectors is None or vectors.dimension != len(query):
+                return None
+            
+            scores = vectors.scores(query)
+            candidates = np.flatnonzero(scores >= self.similarity_threshold)
+            answer, expired = None, []
+            for row in candidates[np.argsort(-scores[candidates], kind="stable")]:
+                key = vectors.keys[row]
+                if self._is_expired(self._entries[key]):
+                    expired.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                answer = self._entries[key]["answer"]
+                break
+            
+            # Xóa sau vòng lặp để không làm lệch chỉ số dòng của ma trận
+            for key in expired:
+                self._remove(key)
+            return answer
+    
+    def set(self, context_key: str, question: str, answer: str, question_vector: Optional[List[float]] = None):
+        """Lưu câu trả lời, loại bỏ entry ít dùng nhất khi vượt max_size"""
+        key = self._entry_key(context_key, question)
+        vector = self._normalize_vector(question_vector) if question_vector is not None else None
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "context_key": context_key,
+                "answer": answer,
+                "created": time.time()
+            }
+            if vector is not None:
+                vectors = self._vectors.get(context_key)
+                if vectors is None or vectors.dimension != len(vector):
+                    # Đổi embedding model: bỏ vector cũ (các entry vẫn khớp chính xác được)
+                    vectors = self._vectors[context_key] = _QuestionVectors(len(vector))
+                vectors.add(key, vector)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+    
+    @staticmethod
+    def _normalize_vector(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+
+# Singleton answer cache
+_answer_cache_instance = None
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache_instance
+    if _answer_cache_instance is None:
+        _answer_cache_instance = AnswerCache(
+            max_size=app_config.answer_cache_size,
+            ttl=app_config.answer_cache_ttl,
+            similarity_threshold=app_config.answer_cache_similarity
+        )
+    return _answer_cache_instance
+
+
+class RateLimiter:
+    """Giới hạn số request mỗi phút: các lần acquire() cách nhau ít nhất 60 / requests_per_minute giây"""
+    
+    def __init__(self, requests_per_minute: int = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        if self.interval <= 0:
+            return
+        
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
 class RAGPipeline:
-    def __init__(self, retriever, llm):
+    def __init__(self, retriever, llm, embedding_model=None):
         """
         Kết nối retriever + LLM thành một pipeline hoàn chỉnh.
+        embedding_model dùng để so khớp câu hỏi gần giống trong answer cache.
         """
         self.retriever = retriever
         self.llm = llm
         self.logger = get_logger()
         self.metrics = get_metrics()
         self.memory = ConversationMemory()
+        self.answer_cache = get_answer_cache() if app_config.enable_answer_cache else None
+        self._embedding_model = embedding_model
         
         self.logger.info("Khởi tạo RAG Pipeline...")
         
@@ -68,6 +280,13 @@ class RAGPipeline:
             ("human", "{question}")
         ])
         
+        # Ngân sách token cho ngữ cảnh và lịch sử theo model đang dùng
+        self.context_packer = ContextPacker(
+            model_name=getattr(llm, 'model_name', None),
+            max_tokens=getattr(llm, 'max_tokens', None)
+        )
+        self.context_packer.reserve(self._create_system_prompt())
+        
         self.logger.success("RAG Pipeline đã khởi tạo thành công")
 
     def _create_system_prompt(self) -> str:
@@ -108,6 +327,108 @@ Hãy trả lời câu hỏi sau:"""
         
         return "\n\n".join(formatted_docs)
 
+    def _answer_context_key(self, docs, chat_history: str) -> str:
+        """
+        Ngữ cảnh của câu trả lời: tài liệu, chunks truy xuất được, model,
+        temperature và lịch sử hội thoại. Chỉ cùng ngữ cảnh mới dùng lại câu trả lời.
+        """
+        doc_ids = sorted({str(doc.metadata.get("doc_id", "")) for doc in docs})
+        chunk_ids = [
+            "{}:{}:{}:{}".format(
+                doc.metadata.get("doc_id", ""),
+                doc.metadata.get("page", ""),
+                doc.metadata.get("start_index", ""),
+                hashlib.blake2b(doc.page_content.encode(), digest_size=8).hexdigest()
+            )
+            for doc in docs
+        ]
+        return AnswerCache.make_context_key([
+            ",".join(doc_ids),
+            ",".join(chunk_ids),
+            str(getattr(self.llm, 'model_name', 'unknown')),
+            str(getattr(self.llm, 'temperature', '')),
+            hashlib.blake2b(chat_history.encode(), digest_size=16).hexdigest()
+        ])
+
+    def _get_cached_answer(self, context_key: str, question: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Tra answer cache: khớp chính xác trước, sau đó câu hỏi gần giống"""
+        if self.answer_cache is None:
+            return None, None
+        
+        answer = self.answer_cache.get(context_key, question)
+        question_vector = None
+        
+        if answer is None and self.answer_cache.near_duplicate_enabled:
+            try:
+                if self._embedding_model is None:
+                    self._embedding_model = get_embedding_model()
+                # Retriever vừa embed câu hỏi nên thường lấy được từ query cache
+                question_vector = self._embedding_model.embed_query(question)
+                answer = self.answer_cache.get_similar(context_key, question_vector)
+            except Exception as e:
+                self.logger.warning(f"Không so khớp được câu hỏi gần giống: {str(e)}")
+        
+        self.metrics.log_answer_cache(hit=answer is not None)
+        return answer, question_vector
+
+    def _cache_answer(self, context_key: str, question: str, answer: str, question_vector: Optional[List[float]]):
+        if self.answer_cache is not None and answer:
+            self.answer_cache.set(context_key, question, answer, question_vector)
+
+    @staticmethod
+    def _replay_answer(answer: str, words_per_chunk: int = 4) -> Iterator[str]:
+        """
+        Chia câu trả lời đã cache thành từng đoạn nhỏ để UI streaming hiển thị như bình thường.
+        Đoạn là ReplayedChunk để StreamRenderer không ghi TTFT/tokens/giây của lần phát lại.
+        """
+        words = answer.split(" ")
+        for i in range(0, len(words), words_per_chunk):
+            piece = " ".join(words[i:i + words_per_chunk])
+            yield ReplayedChunk(piece if i + words_per_chunk >= len(words) else piece + " ")
+
+    def _chat_history(self, use_memory: bool) -> str:
+        if not use_memory:
+            return ""
+        return self.memory.get_context(self.context_packer.history_budget(), self.context_packer.counter)
+
+    def _prepare_answer(self, question: str, docs, chat_history: str) -> Tuple[str, Optional[str], Optional[List[float]], Any]:
+        """
+        Sau bước truy xuất: đóng gói chunks theo ngân sách token, tra answer cache,
+        nếu không có thì tạo prompt.
+        Trả về (context_key, câu trả lời đã cache, vector câu hỏi, prompt).
+        """
+        docs = self.context_packer.pack(docs, self.context_packer.document_budget(question, chat_history))
+        context_key = self._answer_context_key(docs, chat_history)
+        answer, question_vector = self._get_cached_answer(context_key, question)
+        
+        prompt = None
+        if answer is None:
+            prompt = self.prompt_template.format(
+                context=self._format_docs(docs),
+                chat_history=chat_history,
+                question=question
+            )
+        return context_key, answer, question_vector, prompt
+
+    def _finish_answer(self, question: str, answer: str, use_memory: bool, start_time: float) -> float:
+        """Lưu memory và log metrics, trả về thời gian trả lời"""
+        if use_memory:
+            self.memory.add_exchange(question, answer)
+        
+        response_time = time.time() - start_time
+        self.metrics.log_question(question, response_time, success=True)
+        return response_time
+
+    def _fail_answer(self, question: str, error: Exception, start_time: float, mode: str = "") -> str:
+        response_time = time.time() - start_time
+        self.metrics.log_question(question, response_time, success=False)
+        self.logger.error(f"Lỗi khi xử lý câu hỏi{mode}: {str(error)}")
+        return f"Xin lỗi, đã có lỗi xảy ra khi xử lý câu hỏi của bạn: {str(error)}"
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        return chunk.content if hasattr(chunk, 'content') else str(chunk)
+
     def ask(self, question: str, use_memory: bool = True) -> str:
         """
         Gửi câu hỏi qua pipeline và trả về câu trả lời.
@@ -117,40 +438,25 @@ Hãy trả lời câu hỏi sau:"""
         try:
             self.logger.info(f"Đang xử lý câu hỏi: {question[:100]}...")
             
-            # Lấy documents liên quan
-            docs = self.retriever.invoke(question)
-            context = self._format_docs(docs)
-            
             # Lấy chat history nếu sử dụng memory
-            chat_history = self.memory.get_context() if use_memory else ""
+            chat_history = self._chat_history(use_memory)
             
-            # Tạo prompt
-            prompt = self.prompt_template.format(
-                context=context,
-                chat_history=chat_history,
-                question=question
-            )
-            
-            # Gọi LLM
-            response = self.llm.invoke(prompt)
-            answer = response.content if hasattr(response, 'content') else str(response)
-            
-            # Lưu vào memory
-            if use_memory:
-                self.memory.add_exchange(question, answer)
+            # Lấy documents liên quan, tra answer cache trước khi gọi LLM
+            docs = self.retriever.invoke(question)
+            context_key, answer, question_vector, prompt = self._prepare_answer(question, docs, chat_history)
             
-            # Log metrics
-            response_time = time.time() - start_time
-            self.metrics.log_question(question, response_time, success=True)
+            if answer is not None:
+                self.logger.info("Dùng câu trả lời từ answer cache")
+            else:
+                answer = self._chunk_text(self.llm.invoke(prompt))
+                self._cache_answer(context_key, question, answer, question_vector)
             
+            response_time = self._finish_answer(question, answer, use_memory, start_time)
             self.logger.success(f"Đã trả lời câu hỏi trong {response_time:.2f}s")
             return answer
             
         except Exception as e:
-            response_time = time.time() - start_time
-            self.metrics.log_question(question, response_time, success=False)
-            self.logger.error(f"Lỗi khi xử lý câu hỏi: {str(e)}")
-            return f"Xin lỗi, đã có lỗi xảy ra khi xử lý câu hỏi của bạn: {str(e)}"
+            return self._fail_answer(question, e, start_time)
     
     def ask_streaming(self, question: str, use_memory: bool = True) -> Iterator[str]:
         """
@@ -161,43 +467,208 @@ Hãy trả lời câu hỏi sau:"""
         try:
             self.logger.info(f"Đang xử lý câu hỏi (streaming): {question[:100]}...")
             
-            # Lấy documents liên quan
+            chat_history = self._chat_history(use_memory)
             docs = self.retriever.invoke(question)
-            context = self._format_docs(docs)
+            context_key, cached_answer, question_vector, prompt = self._prepare_answer(question, docs, chat_history)
             
-            # Lấy chat history nếu sử dụng memory
-            chat_history = self.memory.get_context() if use_memory else ""
-            
-            # Tạo prompt
-            prompt = self.prompt_template.format(
-                context=context,
-                chat_history=chat_history,
-                question=question
-            )
-            
-            # Stream response
             full_response = ""
-            for chunk in self.llm.stream(prompt):
-                if hasattr(chunk, 'content'):
-                    content = chunk.content
+            if cached_answer is not None:
+                self.logger.info("Dùng câu trả lời từ answer cache (streaming)")
+                for content in self._replay_answer(cached_answer):
                     full_response += content
                     yield content
+            else:
+                # Stream response
+                for chunk in self.llm.stream(prompt):
+                    if hasattr(chunk, 'content'):
+                        content = chunk.content
+                        full_response += content
+                        yield content
+                self._cache_answer(context_key, question, full_response, question_vector)
             
-            # Lưu vào memory
-            if use_memory:
-                self.memory.add_exchange(question, full_response)
+            response_time = self._finish_answer(question, full_response, use_memory, start_time)
+            self.logger.success(f"Đã trả lời câu hỏi (streaming) trong {response_time:.2f}s")
             
-            # Log metrics
-            response_time = time.time() - start_time
-            self.metrics.log_question(question, response_time, success=True)
+        except Exception as e:
+            yield self._fail_answer(question, e, start_time, " (streaming)")
+    
+    async def _aprepare(self, question: str, use_memory: bool) -> Tuple[str, Optional[str], Optional[List[float]], Any]:
+        """
+        Bản async của bước chuẩn bị: lịch sử được chốt trước khi chờ retriever
+        (các câu hỏi chạy đồng thời không đọc lẫn memory của nhau), còn tra cache/tạo prompt
+        (có thể phải embed câu hỏi) chạy trong thread để không chặn event loop.
+        """
+        chat_history = self._chat_history(use_memory)
+        docs = await self.retriever.ainvoke(question)
+        return await asyncio.to_thread(self._prepare_answer, question, docs, chat_history)
+
+    async def aask(self, question: str, use_memory: bool = True) -> str:
+        """
+        Bản async của ask(): retriever.ainvoke + llm.ainvoke, một event loop
+        phục vụ được nhiều cuộc trò chuyện đồng thời
+        """
+        start_time = time.time()
+        
+        try:
+            self.logger.info(f"Đang xử lý câu hỏi (async): {question[:100]}...")
             
-            self.logger.success(f"Đã trả lời câu hỏi (streaming) trong {response_time:.2f}s")
+            context_key, answer, question_vector, prompt = await self._aprepare(question, use_memory)
+            
+            if answer is not None:
+                self.logger.info("Dùng câu trả lời từ answer cache (async)")
+            else:
+                answer = self._chunk_text(await self.llm.ainvoke(prompt))
+                self._cache_answer(context_key, question, answer, question_vector)
+            
+            response_time = self._finish_answer(question, answer, use_memory, start_time)
+            self.logger.success(f"Đã trả lời câu hỏi (async) trong {response_time:.2f}s")
+            return answer
+            
+        except Exception as e:
+            return self._fail_answer(question, e, start_time, " (async)")
+    
+    async def astream(self, question: str, use_memory: bool = True) -> AsyncIterator[str]:
+        """
+        Bản async của ask_streaming(): yield từng đoạn từ llm.astream
+        """
+        start_time = time.time()
+        
+        try:
+            self.logger.info(f"Đang xử lý câu hỏi (async streaming): {question[:100]}...")
+            
+            context_key, cached_answer, question_vector, prompt = await self._aprepare(question, use_memory)
+            
+            full_response = ""
+            if cached_answer is not None:
+                self.logger.info("Dùng câu trả lời từ answer cache (async streaming)")
+                for content in self._replay_answer(cached_answer):
+                    full_response += content
+                    yield content
+            else:
+                async for chunk in self.llm.astream(prompt):
+                    if hasattr(chunk, 'content'):
+                        content = chunk.content
+                        full_response += content
+                        yield content
+                self._cache_answer(context_key, question, full_response, question_vector)
+            
+            response_time = self._finish_answer(question, full_response, use_memory, start_time)
+            self.logger.success(f"Đã trả lời câu hỏi (async streaming) trong {response_time:.2f}s")
             
         except Exception as e:
-            response_time = time.time() - start_time
-            self.metrics.log_question(question, response_time, success=False)
-            self.logger.error(f"Lỗi khi xử lý câu hỏi (streaming): {str(e)}")
-            yield f"Xin lỗi, đã có lỗi xảy ra khi xử lý câu hỏi của bạn: {str(e)}"
+            yield self._fail_answer(question, e, start_time, " (async streaming)")
+    
+    def _retriever_embedding_model(self):
+        """Embedding model của retriever (nhánh dense nếu là hybrid), None nếu không biết"""
+        retriever = getattr(self.retriever, "dense_retriever", self.retriever)
+        return getattr(retriever, "embedding_model", None)
+
+    def _retrieve_batch(self, questions: List[str]) -> List[List[Any]]:
+        """
+        Embed mọi câu hỏi một lượt rồi truy xuất theo lô nếu retriever hỗ trợ (retrieve_batch).
+        Retriever khác gọi invoke() từng câu, vector câu hỏi đã nằm sẵn trong query cache.
+        """
+        embedding_model = self._retriever_embedding_model()
+        if embedding_model is not None and hasattr(self.retriever, "retrieve_batch"):
+            embed_queries = getattr(embedding_model, "embed_queries", None)
+            if embed_queries is None:
+                query_vectors = [embedding_model.embed_query(question) for question in questions]
+            else:
+                query_vectors = embed_queries(questions)
+            query_vectors = np.asarray(query_vectors, dtype=np.float32)
+            return self.retriever.retrieve_batch(questions, query_vectors)
+        
+        if self._embedding_model is None:
+            self._embedding_model = get_embedding_model()
+        if hasattr(self._embedding_model, "embed_queries"):
+            self._embedding_model.embed_queries(questions)
+        return [self.retriever.invoke(question) for question in questions]
+
+    def ask_batch(self, questions: List[str], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Trả lời nhiều câu hỏi độc lập (không dùng memory), ví dụ để đánh giá hoặc sinh FAQ:
+        embed và truy xuất theo lô, sau đó gọi LLM song song (tối đa max_concurrency request,
+        giới hạn theo llm_requests_per_minute).
+        
+        Trả về theo thứ tự câu hỏi, mỗi phần tử gồm question, answer, success, cached,
+        retrieval_time (thời gian truy xuất cả lô chia đều), llm_time và total_time
+        (từ lúc bắt đầu lô tới khi có câu trả lời), đơn vị giây.
+        """
+        if not questions:
+            return []
+        
+        max_concurrency = max(1, max_concurrency or app_config.batch_max_concurrency)
+        batch_start = time.time()
+        self.logger.info(f"Đang xử lý {len(questions)} câu hỏi theo lô (tối đa {max_concurrency} request song song)...")
+        
+        results = [
+            {"question": question, "answer": "", "success": False, "cached": False,
+             "retrieval_time": 0.0, "llm_time": 0.0, "total_time": 0.0}
+            for question in questions
+        ]
+        
+        def fail(index: int, error: Exception):
+            result = results[index]
+            result["answer"] = f"Xin lỗi, đã có lỗi xảy ra khi xử lý câu hỏi của bạn: {str(error)}"
+            result["total_time"] = time.time() - batch_start
+            self.metrics.log_question(result["question"], result["retrieval_time"] + result["llm_time"], success=False)
+        
+        try:
+            all_docs = self._retrieve_batch(questions)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi truy xuất theo lô: {str(e)}")
+            for i in range(len(questions)):
+                fail(i, e)
+            return results
+        
+        retrieval_time = (time.time() - batch_start) / len(questions)
+        self.logger.info(f"Đã truy xuất {len(questions)} câu hỏi trong {retrieval_time * len(questions):.2f}s")
+        
+        pending = {}
+        for i, (question, docs) in enumerate(zip(questions, all_docs)):
+            results[i]["retrieval_time"] = retrieval_time
+            try:
+                context_key, answer, question_vector, prompt = self._prepare_answer(question, docs, "")
+            except Exception as e:
+                fail(i, e)
+                continue
+            
+            if answer is not None:
+                results[i].update(answer=answer, success=True, cached=True, total_time=time.time() - batch_start)
+                self.metrics.log_question(question, retrieval_time, success=True)
+            else:
+                pending[i] = (context_key, question_vector, prompt)
+        
+        limiter = RateLimiter(app_config.llm_requests_per_minute)
+        
+        def generate(prompt) -> Tuple[str, float]:
+            limiter.acquire()
+            start = time.time()
+            answer = self._chunk_text(self.llm.invoke(prompt))
+            return answer, time.time() - start
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rag-batch") as executor:
+            futures = {executor.submit(generate, prompt): i for i, (_, _, prompt) in pending.items()}
+            for future in as_completed(futures):
+                i = futures[future]
+                result = results[i]
+                try:
+                    answer, llm_time = future.result()
+                except Exception as e:
+                    self.logger.error(f"Lỗi khi xử lý câu hỏi (batch): {str(e)}")
+                    fail(i, e)
+                    continue
+                
+                context_key, question_vector, _ = pending[i]
+                self._cache_answer(context_key, result["question"], answer, question_vector)
+                result.update(answer=answer, success=True, llm_time=llm_time, total_time=time.time() - batch_start)
+                self.metrics.log_question(result["question"], retrieval_time + llm_time, success=True)
+        
+        succeeded = sum(result["success"] for result in results)
+        self.logger.success(
+            f"Đã trả lời {succeeded}/{len(questions)} câu hỏi theo lô trong {time.time() - batch_start:.2f}s"
+        )
+        return results
     
     def clear_memory(self):
         """Xóa memory cuộc trò chuyện"""
@@ -0,0 +1,135 @@
+# modules/stream_renderer.py
+
+"""
+Hiển thị câu trả lời streaming theo cửa sổ thời gian thay vì theo từng đoạn:
+các đoạn nhận được được gom lại và UI chỉ vẽ lại tối đa mỗi interval giây
+"""
+
+from typing import Callable, Iterable, Iterator, List, Optional
+import queue
+import threading
+import time
+
+from config import app_config
+from utils.metrics import get_metrics
+from .context_packer import TokenCounter, get_token_counter
+
+
+class ReplayedChunk(str):
+    """Đoạn text phát lại từ answer cache (không phải token model sinh ra, không tính vào metrics streaming)"""
+
+
+class _StreamError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_STREAM_END = object()
+
+
+def _pump(chunks: Iterator[str], out: "queue.Queue", stop: threading.Event) -> None:
+    """Đọc stream ở thread riêng để UI vẫn vẽ được text đang chờ khi model tạm dừng"""
+    try:
+        for chunk in chunks:
+            if stop.is_set():
+                break
+            out.put(chunk)
+    except BaseException as e:
+        out.put(_StreamError(e))
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        out.put(_STREAM_END)
+
+
+class StreamRenderer:
+    """
+    Nhận các đoạn text từ generator và vẽ theo cửa sổ thời gian: đoạn đầu tiên được vẽ ngay,
+    text nhận sau đó được vẽ chậm nhất interval giây sau lần vẽ trước (kể cả khi model đang
+    dừng giữa chừng). Ghi TTFT và tokens/giây vào metrics, trừ câu trả lời phát lại từ cache.
+
+    Không có commit: render(toàn bộ text hiện có) mỗi lần vẽ.
+    Có commit: đoạn văn đã xong (kết thúc bằng dòng trống) được commit() một lần, render()
+    chỉ nhận đoạn đang viết dở, nên UI thêm dần thay vì vẽ lại toàn bộ câu trả lời.
+    """
+
+    def __init__(self, render: Callable[[str], None], interval: Optional[float] = None,
+                 counter: Optional[TokenCounter] = None, commit: Optional[Callable[[str], None]] = None):
+        self.render = render
+        self.commit = commit
+        self.interval = app_config.stream_render_interval if interval is None else interval
+        self.counter = counter or get_token_counter()
+        self.metrics = get_metrics()
+        self._committed = 0
+
+    def _draw(self, text: str) -> None:
+        if self.commit is None:
+            self.render(text)
+            return
+
+        boundary = text.rfind("\n\n")
+        if boundary > self._committed:
+            self.commit(text[self._committed:boundary])
+            self._committed = boundary + 2
+        self.render(text[self._committed:])
+
+    def consume(self, chunks: Iterable[str]) -> str:
+        """Đọc hết stream và trả về toàn bộ câu trả lời"""
+        start = time.perf_counter()
+        parts: List[str] = []
+        first_chunk_at = None
+        last_render = float("-inf")
+        pending = False
+        replayed = False
+
+        received: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+        reader = threading.Thread(target=_pump, args=(iter(chunks), received, stop), daemon=True)
+        reader.start()
+
+        try:
+            while True:
+                # Có text chưa vẽ: chờ chunk tiếp theo tới hạn của cửa sổ rồi vẽ
+                timeout = max(0.0, last_render + self.interval - time.perf_counter()) if pending else None
+                try:
+                    item = received.get(timeout=timeout)
+                except queue.Empty:
+                    self._draw("".join(parts))
+                    last_render = time.perf_counter()
+                    pending = False
+                    continue
+
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, _StreamError):
+                    raise item.error
+                if not item:
+                    continue
+
+                now = time.perf_counter()
+                if first_chunk_at is None:
+                    first_chunk_at = now
+                    replayed = isinstance(item, ReplayedChunk)
+
+                parts.append(item)
+                pending = True
+                if now - last_render >= self.interval:
+                    self._draw("".join(parts))
+                    last_render = now
+                    pending = False
+        finally:
+            stop.set()
+
+        text = "".join(parts)
+        if pending or not parts:
+            self._draw(text)
+
+        if first_chunk_at is not None and not replayed:
+            # TTFT tính từ lúc gửi câu hỏi (gồm cả truy xuất), tốc độ tính từ đoạn đầu tiên
+            self.metrics.log_streaming(
+                first_chunk_at - start,
+                self.counter.count(text),
+                time.perf_counter() - first_chunk_at
+            )
+        return text
@@ -2,21 +2,28 @@
 
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import os
 import tempfile
 
+import numpy as np
+
 from config import app_config
 from utils.logger import get_logger
 from utils.cache import get_cache
+from .embeddings import get_embedding_model
+from .index_catalog import claim_directory
+from .mmr import MMRRetriever
 
 
 class VectorStore:
-    def __init__(self, embedding_model):
-        self.embedding_model = embedding_model
+    def __init__(self, embedding_model=None):
+        self.embedding_model = embedding_model or get_embedding_model()
         self.vector_db = None
         self.logger = get_logger()
         self.cache = get_cache()
+        # Claim thư mục persist để cleanup_orphans (process khác) không xóa khi store còn dùng
+        self._directory_claim = None
         
         self.logger.info("Khởi tạo VectorStore...")
 
@@ -38,25 +45,106 @@ class VectorStore:
                 persist_directory=persist_directory,
                 collection_name=app_config.collection_name
             )
+            self._directory_claim = claim_directory(persist_directory)
             
             self.logger.success(f"Vector store đã được xây dựng thành công tại: {persist_directory}")
             
-            # Tạo retriever với các tham số tối ưu
-            retriever = self.vector_db.as_retriever(
-                search_type="mmr",  # Maximum Marginal Relevance
-                search_kwargs={
-                    "k": 5,  # Số lượng documents trả về
-                    "fetch_k": 20,  # Số lượng documents để tính MMR
-                    "lambda_mult": 0.5  # Diversity vs relevance balance
-                }
-            )
-            
-            return retriever
+            return self.get_retriever()
             
         except Exception as e:
             self.logger.error(f"Lỗi khi xây dựng vector store: {str(e)}")
             raise
     
+    def add_documents(self, documents: List[Document], persist_directory: Optional[str] = None):
+        """Thêm chunks vào store (tạo collection mới nếu chưa có)"""
+        if self.vector_db is None:
+            if persist_directory is None:
+                persist_directory = tempfile.mkdtemp(prefix="chroma_db_")
+            
+            self.vector_db = Chroma(
+                collection_name=app_config.collection_name,
+                embedding_function=self.embedding_model,
+                persist_directory=persist_directory
+            )
+            self._directory_claim = claim_directory(persist_directory)
+            self.logger.info(f"Đã tạo Chroma collection tại: {persist_directory}")
+        
+        self.vector_db.add_documents(documents)
+    
+    def open(self, persist_directory: str):
+        """Mở Chroma collection đã persist (không embed lại)"""
+        self.vector_db = Chroma(
+            collection_name=app_config.collection_name,
+            embedding_function=self.embedding_model,
+            persist_directory=persist_directory
+        )
+        self._directory_claim = claim_directory(persist_directory)
+        self.logger.info(f"Đã mở Chroma collection tại: {persist_directory}")
+        return self.get_retriever()
+    
+    def remove_document(self, doc_id: str) -> int:
+        """Xóa mọi chunk của một tài liệu, trả về số chunk đã xóa"""
+        if not self.vector_db:
+            raise ValueError("Vector store chưa được xây dựng")
+        
+        ids = self.vector_db.get(where={"doc_id": doc_id}).get("ids", [])
+        if ids:
+            self.vector_db.delete(ids=ids)
+        
+        self.logger.info(f"Đã xóa {len(ids)} chunks của tài liệu {doc_id[:12]}")
+        return len(ids)
+    
+    def get_all_documents(self) -> List[Document]:
+        """Lấy toàn bộ chunks trong collection"""
+        if not self.vector_db:
+            raise ValueError("Vector store chưa được xây dựng")
+        
+        data = self.vector_db.get(include=["documents", "metadatas"])
+        return [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data.get("documents", []), data.get("metadatas", []))
+        ]
+    
+    def get_retriever(self, doc_ids: Optional[List[str]] = None, search_type: Optional[str] = None, k: Optional[int] = None):
+        """Tạo retriever (mặc định theo retrieval_search_type), có thể giới hạn trong một số tài liệu"""
+        if not self.vector_db:
+            raise ValueError("Vector store chưa được xây dựng")
+        
+        search_type = search_type or app_config.retrieval_search_type
+        if search_type == "mmr":  # Maximum Marginal Relevance, tính bằng NumPy (modules/mmr.py)
+            return MMRRetriever(
+                store=self,
+                embedding_model=self.embedding_model,
+                k=k or app_config.retrieval_k,
+                fetch_k=app_config.retrieval_fetch_k,
+                lambda_mult=app_config.retrieval_lambda_mult,
+                doc_ids=list(doc_ids) if doc_ids else None
+            )
+        
+        search_kwargs = {"k": k or app_config.retrieval_k}  # Số lượng documents trả về
+        if doc_ids:
+            search_kwargs["filter"] = {"doc_id": {"$in": list(doc_ids)}}
+        
+        return self.vector_db.as_retriever(
+            search_type=search_type,
+            search_kwargs=search_kwargs
+        )
+    
+    def mmr_candidates(self, query_vector: List[float], fetch_k: int, doc_ids: Optional[List[str]] = None) -> Tuple[List[Document], np.ndarray]:
+        """fetch_k chunks gần nhất kèm embeddings (một lần query Chroma, không embed lại)"""
+        result = self.vector_db._collection.query(
+            query_embeddings=[np.asarray(query_vector, dtype=np.float32).tolist()],
+            n_results=fetch_k,
+            where={"doc_id": {"$in": list(doc_ids)}} if doc_ids else None,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(result["documents"][0], result["metadatas"][0])
+        ]
+        return documents, np.asarray(result["embeddings"][0], dtype=np.float32)
+    
     def get_similarity_search(self, query: str, k: int = 5) -> List[Document]:
         """Tìm kiếm similarity trực tiếp"""
         if not self.vector_db:
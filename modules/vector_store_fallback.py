@@ -4,25 +4,79 @@
 Fallback vector store implementation using FAISS for Streamlit Cloud compatibility
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator, NamedTuple, Tuple
 import numpy as np
 import pickle
+import shutil
 import tempfile
 import os
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from langchain_community.vectorstores import FAISS
 from langchain_core.vectorstores import VectorStoreRetriever
 
 from config import app_config
 from utils.logger import get_logger
+from .embeddings import get_embedding_model
+from .pdf_processor import ChunkBatch
+from .index_catalog import get_index_catalog
+from .bm25 import BM25Index
+from .hybrid_retriever import create_hybrid_retriever
+from .embedding_store import EmbeddingMatrixStore, MatrixRetriever, write_embedding_store
+from .vector_store_numpy import NumpyVectorStore
+from .mmr import MMRRetriever
+from .ann_index import (
+    INDEX_FLAT, INDEX_IVF, QUANT_NONE,
+    build_index, choose_index_type, index_type_of, quantization_of, read_index, write_index
+)
+
+
+class IngestProgress(NamedTuple):
+    """Tiến độ index tài liệu"""
+    pages_done: int
+    total_pages: int
+    chunks_indexed: int
+
+
+class FallbackRetriever(BaseRetriever):
+    """
+    Retriever của FallbackVectorStore: chọn retriever memmap hoặc FAISS lúc truy vấn, vì store
+    chuyển từ memmap sang FAISS trong RAM (_materialize) khi thêm/xóa chunks sau khi tạo retriever
+    """
+
+    store: Any
+    embedding_model: Any
+    k: int = 5
+    doc_ids: Optional[List[str]] = None
+    search_type: Optional[str] = None
+
+    def _backend(self):
+        return self.store._backend_retriever(self.doc_ids, self.search_type, self.k)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._backend().invoke(query, config={"callbacks": run_manager.get_child()})
+
+    def retrieve_batch(self, queries: List[str], query_vectors: np.ndarray) -> List[List[Document]]:
+        """Truy xuất theo lô nếu retriever hiện tại hỗ trợ, nếu không thì từng câu"""
+        backend = self._backend()
+        if hasattr(backend, "retrieve_batch"):
+            return backend.retrieve_batch(queries, query_vectors)
+        return [backend.invoke(query) for query in queries]
 
 
 class FallbackVectorStore:
     """Fallback vector store using FAISS when ChromaDB is not available"""
     
-    def __init__(self, embedding_model):
-        self.embedding_model = embedding_model
+    def __init__(self, embedding_model=None):
+        self.embedding_model = embedding_model or get_embedding_model()
         self.vector_store = None
+        # Index đã lưu được mở bằng memmap (chỉ đọc); chuyển sang FAISS khi cần sửa
+        self.matrix_store: Optional[EmbeddingMatrixStore] = None
+        # Số vector lúc dựng index ANN gần nhất (IVF được train lại khi collection tăng gấp đôi)
+        self._ann_built_size = 0
         self.logger = get_logger()
         
         self.logger.info("Khởi tạo Fallback VectorStore với FAISS...")
@@ -39,34 +93,269 @@ class FallbackVectorStore:
                 documents=documents,
                 embedding=self.embedding_model
             )
+            self._sync_index_type()
             
             # Save to disk nếu có persist_directory
             if persist_directory:
-                os.makedirs(persist_directory, exist_ok=True)
-                self.vector_store.save_local(persist_directory)
-                self.logger.info(f"FAISS vector store saved to: {persist_directory}")
+                self.save(persist_directory)
             
             self.logger.success("FAISS vector store đã được xây dựng thành công")
             
-            # Tạo retriever
-            retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 5}
-            )
-            
-            return retriever
+            return self.get_retriever()
             
         except Exception as e:
             self.logger.error(f"Lỗi khi xây dựng FAISS vector store: {str(e)}")
             raise
     
+    @property
+    def is_built(self) -> bool:
+        return self.vector_store is not None or self.matrix_store is not None
+    
+    def _require_built(self):
+        if not self.is_built:
+            raise ValueError("Vector store chưa được xây dựng")
+    
+    def _materialize(self):
+        """Dựng FAISS index trong RAM từ store memmap (dùng lại vector đã lưu, không embed lại)"""
+        if self.matrix_store is None:
+            return
+        
+        store = self.matrix_store
+        documents = store.get_all_documents()
+        vectors = np.asarray(store.vectors, dtype=np.float32)
+        self.vector_store = FAISS.from_embeddings(
+            text_embeddings=list(zip([d.page_content for d in documents], vectors.tolist())),
+            embedding=self.embedding_model,
+            metadatas=[d.metadata for d in documents]
+        )
+        self.matrix_store = None
+        self._sync_index_type()
+    
+    def _sync_index_type(self):
+        """Đổi loại index FAISS (flat/HNSW/IVF) theo kích thước collection, dùng lại vector đã có"""
+        index = self.vector_store.index
+        desired = choose_index_type(index.ntotal)
+        current = index_type_of(index)
+        
+        needs_retrain = current == INDEX_IVF and index.ntotal >= 2 * self._ann_built_size
+        if desired == current and not needs_retrain:
+            return
+        
+        self.vector_store.index = build_index(index.reconstruct_n(0, index.ntotal), desired)
+        self._ann_built_size = index.ntotal
+        self.logger.info(f"Đã dựng FAISS index {desired} cho {index.ntotal} chunks")
+    
+    def add_documents(self, documents: List[Document], persist_directory: Optional[str] = None):
+        """Thêm chunks vào FAISS index (tạo index mới nếu chưa có)"""
+        self._materialize()
+        if self.vector_store is None:
+            self.vector_store = FAISS.from_documents(
+                documents=documents,
+                embedding=self.embedding_model
+            )
+        else:
+            self.vector_store.add_documents(documents)
+        self._sync_index_type()
+    
+    def save(self, persist_directory: str):
+        """
+        Lưu index xuống đĩa: mặc định là ma trận embeddings .npy + file chunks
+        (mở lại bằng memmap), hoặc định dạng FAISS gốc nếu tắt enable_memmap_store.
+        Nếu bật faiss_quantization, index lượng tử hóa được lưu kèm và store chuyển sang
+        phục vụ từ bản đã lưu (vector gốc chỉ nằm trên đĩa/page cache để tính lại điểm).
+        """
+        self._require_built()
+        
+        os.makedirs(persist_directory, exist_ok=True)
+        if not app_config.enable_memmap_store:
+            self._materialize()
+            self.vector_store.save_local(persist_directory)
+            self.logger.info(f"FAISS vector store saved to: {persist_directory}")
+            return
+        
+        if self.matrix_store is not None:
+            vectors, documents = self.matrix_store.vectors, self.matrix_store.get_all_documents()
+        else:
+            # Thứ tự vector trong index khớp với index_to_docstore_id
+            index = self.vector_store.index
+            vectors = index.reconstruct_n(0, index.ntotal)
+            documents = [
+                self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[i])
+                for i in range(index.ntotal)
+            ]
+        
+        write_embedding_store(persist_directory, vectors, documents, app_config.embedding_store_dtype)
+        
+        # Index ANN (và/hoặc lượng tử hóa) lưu kèm để lần mở sau không phải dựng lại
+        quantization = app_config.faiss_quantization
+        if self.matrix_store is not None:
+            ann_index = self.matrix_store.ann_index
+        else:
+            ann_index = self.vector_store.index
+            if quantization != QUANT_NONE:
+                ann_index = build_index(vectors, index_type_of(ann_index), quantization)
+        
+        if ann_index is not None and (index_type_of(ann_index) != INDEX_FLAT or quantization != QUANT_NONE):
+            write_index(ann_index, persist_directory)
+        
+        self.logger.info(f"Embedding store ({app_config.embedding_store_dtype}) saved to: {persist_directory}")
+        
+        if quantization != QUANT_NONE and self.vector_store is not None:
+            self.load(persist_directory)
+    
+    def load(self, persist_directory: str):
+        """Mở index đã lưu (do chính ứng dụng ghi ra): memmap nếu có, không thì FAISS"""
+        if EmbeddingMatrixStore.exists(persist_directory):
+            self.matrix_store = EmbeddingMatrixStore.open(persist_directory)
+            self.matrix_store.ann_index = read_index(persist_directory)
+            self.vector_store = None
+            self.logger.info(f"Đã mở embedding store (memmap) từ: {persist_directory}")
+            return self.get_retriever()
+        
+        self.vector_store = FAISS.load_local(
+            persist_directory,
+            self.embedding_model,
+            allow_dangerous_deserialization=True
+        )
+        self.matrix_store = None
+        self.logger.info(f"Đã nạp FAISS vector store từ: {persist_directory}")
+        return self.get_retriever()
+    
+    def remove_document(self, doc_id: str) -> int:
+        """Xóa mọi chunk của một tài liệu, trả về số chunk đã xóa"""
+        self._require_built()
+        self._materialize()
+        
+        # HNSW/IVF không xóa vector tại chỗ được: chuyển về flat, xóa, rồi dựng lại index phù hợp
+        index = self.vector_store.index
+        if index_type_of(index) != INDEX_FLAT:
+            self.vector_store.index = build_index(index.reconstruct_n(0, index.ntotal), INDEX_FLAT)
+        
+        ids = []
+        for docstore_id in self.vector_store.index_to_docstore_id.values():
+            document = self.vector_store.docstore.search(docstore_id)
+            if isinstance(document, Document) and document.metadata.get("doc_id") == doc_id:
+                ids.append(docstore_id)
+        
+        if ids:
+            self.vector_store.delete(ids)
+        if self.vector_store.index.ntotal:
+            self._sync_index_type()
+        
+        self.logger.info(f"Đã xóa {len(ids)} chunks của tài liệu {doc_id[:12]}")
+        return len(ids)
+    
+    def get_all_documents(self) -> List[Document]:
+        """Lấy toàn bộ chunks trong index"""
+        self._require_built()
+        if self.matrix_store is not None:
+            return self.matrix_store.get_all_documents()
+        
+        documents = []
+        for docstore_id in self.vector_store.index_to_docstore_id.values():
+            document = self.vector_store.docstore.search(docstore_id)
+            if isinstance(document, Document):
+                documents.append(document)
+        return documents
+    
+    def get_retriever(self, doc_ids: Optional[List[str]] = None, search_type: Optional[str] = None, k: Optional[int] = None):
+        """Tạo retriever (mặc định theo retrieval_search_type), có thể giới hạn trong một số tài liệu"""
+        self._require_built()
+        
+        return FallbackRetriever(
+            store=self,
+            embedding_model=self.embedding_model,
+            k=k or app_config.retrieval_k,
+            doc_ids=list(doc_ids) if doc_ids else None,
+            search_type=search_type
+        )
+    
+    def _backend_retriever(self, doc_ids: Optional[List[str]], search_type: Optional[str], k: int):
+        """Retriever trên dữ liệu hiện tại: memmap nếu chưa sửa, ngược lại FAISS trong RAM"""
+        search_type = search_type or app_config.retrieval_search_type
+        
+        if self.matrix_store is not None:
+            return MatrixRetriever(
+                store=self.matrix_store,
+                embedding_model=self.embedding_model,
+                k=k,
+                doc_ids=doc_ids,
+                search_type=search_type,
+                fetch_k=app_config.retrieval_fetch_k,
+                lambda_mult=app_config.retrieval_lambda_mult
+            )
+        
+        if search_type == "mmr":
+            return MMRRetriever(
+                store=self,
+                embedding_model=self.embedding_model,
+                k=k,
+                fetch_k=app_config.retrieval_fetch_k,
+                lambda_mult=app_config.retrieval_lambda_mult,
+                doc_ids=doc_ids
+            )
+        
+        search_kwargs = {"k": k}
+        if doc_ids:
+            # FAISS lọc sau khi tìm, nên lấy nhiều ứng viên hơn
+            search_kwargs["filter"] = {"doc_id": {"$in": doc_ids}}
+            search_kwargs["fetch_k"] = 100
+        
+        return self.vector_store.as_retriever(
+            search_type=search_type,
+            search_kwargs=search_kwargs
+        )
+    
+    def mmr_candidates(self, query_vector: List[float], fetch_k: int, doc_ids: Optional[List[str]] = None) -> Tuple[List[Document], np.ndarray]:
+        """
+        fetch_k chunks gần nhất kèm vector lấy lại từ index (reconstruct, không embed lại).
+        Có doc_ids thì lọc sau khi tìm, tăng dần số ứng viên tới khi đủ fetch_k.
+        """
+        index = self.vector_store.index
+        query = np.asarray(query_vector, dtype=np.float32)[None, :]
+        allowed = set(doc_ids) if doc_ids else None
+        
+        # Index rỗng (vd. đã xóa tài liệu cuối cùng): FAISS search với k = 0 sẽ lỗi
+        if index.ntotal == 0 or fetch_k <= 0:
+            return [], np.empty((0, index.d), dtype=np.float32)
+        
+        fetch_k = min(fetch_k, index.ntotal)
+        search_count = fetch_k
+        while True:
+            search_count = min(search_count, index.ntotal)
+            _, ids = index.search(query, search_count)
+            positions, documents = [], []
+            for position in ids[0]:
+                if position < 0:
+                    continue
+                document = self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[int(position)])
+                if not isinstance(document, Document):
+                    continue
+                if allowed is not None and document.metadata.get("doc_id") not in allowed:
+                    continue
+                positions.append(int(position))
+                documents.append(document)
+                if len(documents) == fetch_k:
+                    break
+            
+            if len(documents) >= fetch_k or search_count >= index.ntotal:
+                break
+            search_count *= 4
+        
+        if not documents:
+            return [], np.empty((0, index.d), dtype=np.float32)
+        return documents, np.vstack([index.reconstruct(position) for position in positions])
+    
     def get_similarity_search(self, query: str, k: int = 5) -> List[Document]:
         """Tìm kiếm similarity với FAISS"""
-        if not self.vector_store:
-            raise ValueError("Vector store chưa được xây dựng")
+        self._require_built()
         
         try:
-            results = self.vector_store.similarity_search(query, k=k)
+            if self.matrix_store is not None:
+                hits = self.matrix_store.search(self.embedding_model.embed_query(query), k)
+                results = [self.matrix_store.get_document(i) for i, _ in hits]
+            else:
+                results = self.vector_store.similarity_search(query, k=k)
             self.logger.info(f"Tìm thấy {len(results)} documents liên quan")
             return results
         except Exception as e:
@@ -75,31 +364,168 @@ class FallbackVectorStore:
     
     def get_store_info(self) -> Dict[str, Any]:
         """Lấy thông tin về vector store"""
-        if not self.vector_store:
+        if not self.is_built:
             return {"status": "not_built", "type": "faiss_fallback"}
         
+        if self.matrix_store is not None:
+            return {
+                "status": "active",
+                "type": "faiss_fallback",
+                "storage": "memmap",
+                "dtype": self.matrix_store.dtype,
+                "index_type": index_type_of(self.matrix_store.ann_index) if self.matrix_store.ann_index is not None else "exact",
+                "quantization": quantization_of(self.matrix_store.ann_index) if self.matrix_store.ann_index is not None else QUANT_NONE,
+                "index_size": len(self.matrix_store)
+            }
+        
         return {
             "status": "active",
             "type": "faiss_fallback",
+            "index_type": index_type_of(self.vector_store.index),
             "index_size": self.vector_store.index.ntotal if hasattr(self.vector_store, 'index') else 0
         }
 
 
 class SmartVectorStore:
-    """Smart vector store that tries ChromaDB first, falls back to FAISS"""
+    """Smart vector store: NumPy exact search for small documents, otherwise tries ChromaDB first, falls back to FAISS"""
     
-    def __init__(self, embedding_model):
-        self.embedding_model = embedding_model
+    def __init__(self, embedding_model=None):
+        self.embedding_model = embedding_model or get_embedding_model()
         self.vector_store = None
         self.logger = get_logger()
-        self.using_fallback = False
+        # Backend đang dùng: chromadb | faiss | numpy
+        self.backend: Optional[str] = None
+        self.catalog = get_index_catalog() if app_config.enable_index_catalog else None
+        # Các tài liệu trong collection: doc_id -> số chunks
+        self.documents: Dict[str, int] = {}
+        # Thư mục index của catalog mà store đang dùng trực tiếp (không được ghi thêm)
+        self._catalog_directory: Optional[str] = None
+        # Chế độ hybrid: BM25 index dựng song song với vector store
+        self.keyword_index = BM25Index() if app_config.vector_store_type == "hybrid" else None
         
         self.logger.info("Khởi tạo Smart VectorStore...")
     
-    def build_store(self, documents: List[Document], persist_directory: Optional[str] = None):
+    def open_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Mở index đã persist của tài liệu nếu catalog đã có (thay thế store hiện tại).
+        Trả về entry của catalog (có số chunks), hoặc None nếu phải build mới.
+        """
+        if not self.catalog or not doc_id:
+            return None
+        
+        key = self.catalog.make_key(doc_id)
+        entry = self.catalog.get(key)
+        if not entry:
+            return None
+        
+        try:
+            if entry["store_type"] == "chromadb":
+                from .vector_store import VectorStore
+                store = VectorStore(self.embedding_model)
+                store.open(entry["path"])
+            elif entry["store_type"] == "numpy":
+                store = NumpyVectorStore(self.embedding_model)
+                store.load(entry["path"])
+            else:
+                store = FallbackVectorStore(self.embedding_model)
+                store.load(entry["path"])
+            
+            self.vector_store = store
+            self.backend = entry["store_type"]
+            self.documents = {doc_id: entry.get("chunks", 0)}
+            self._catalog_directory = entry["path"]
+            if self.keyword_index is not None:
+                self.keyword_index.clear()
+                self.keyword_index.add_documents(store.get_all_documents())
+            self.logger.success(f"Dùng lại index đã lưu cho tài liệu {doc_id[:12]} ({entry['store_type']})")
+            return entry
+            
+        except Exception as e:
+            self.logger.warning(f"Không mở được index đã lưu, sẽ build lại: {str(e)}")
+            self.catalog.remove(key)
+            return None
+    
+    def _register_document(self, doc_id: Optional[str], persist_directory: Optional[str], chunk_count: int):
+        """Ghi index vừa build vào catalog"""
+        if not self.catalog or not doc_id or not persist_directory:
+            return
+        
+        try:
+            self.catalog.register(self.catalog.make_key(doc_id), self.backend, persist_directory, chunk_count)
+            self._catalog_directory = persist_directory
+        except Exception as e:
+            self.logger.warning(f"Không thể ghi catalog index: {str(e)}")
+    
+    def _detach_from_catalog(self):
+        """
+        Trước khi thêm/xóa tài liệu, chuyển store sang bản riêng để index của catalog
+        (dùng chung giữa các session) không bị sửa. FAISS/NumPy mở index bằng memmap chỉ đọc
+        và tự copy vào RAM khi sửa nên không cần copy thư mục.
+        """
+        if not self._catalog_directory:
+            return
+        
+        if self.backend == "chromadb":
+            from .vector_store import VectorStore
+            private_directory = tempfile.mkdtemp(prefix="chroma_db_")
+            shutil.copytree(self._catalog_directory, private_directory, dirs_exist_ok=True)
+            # copytree chép cả mtime cũ; chạm lại để bản riêng không bị coi là thư mục mồ côi
+            os.utime(private_directory)
+            
+            store = VectorStore(self.embedding_model)
+            store.open(private_directory)
+            self.vector_store = store
+        
+        self._catalog_directory = None
+    
+    @property
+    def using_fallback(self) -> bool:
+        return self.backend == "faiss"
+    
+    @staticmethod
+    def _prefers_numpy(chunk_count: float) -> bool:
+        """Tài liệu ít chunks: NumPy nhanh hơn và không tốn thời gian khởi động Chroma/FAISS"""
+        return 0 < chunk_count <= app_config.numpy_max_chunks
+    
+    def _catalog_path(self, doc_id: Optional[str], persist_directory: Optional[str]) -> Optional[str]:
+        """Thư mục lưu index: ưu tiên thư mục được truyền vào, sau đó là thư mục của catalog"""
+        if persist_directory or not self.catalog or not doc_id:
+            return persist_directory
+        return self.catalog.new_path(self.catalog.make_key(doc_id))
+    
+    def build_store(
+        self,
+        documents: List[Document],
+        persist_directory: Optional[str] = None,
+        doc_id: Optional[str] = None
+    ):
         """
-        Thử ChromaDB trước, nếu không được thì dùng FAISS
+        Tài liệu nhỏ dùng NumPy; còn lại thử ChromaDB trước, nếu không được thì dùng FAISS.
+        Tài liệu đã có trong catalog được mở lại thay vì embed lại.
         """
+        if doc_id is None and documents:
+            doc_id = documents[0].metadata.get("doc_id")
+        
+        if self.open_document(doc_id):
+            return self.get_retriever()
+        
+        persist_directory = self._catalog_path(doc_id, persist_directory)
+        if self.keyword_index is not None:
+            self.keyword_index.clear()
+            self.keyword_index.add_documents(documents)
+        
+        if self._prefers_numpy(len(documents)):
+            numpy_store = NumpyVectorStore(self.embedding_model)
+            retriever = numpy_store.build_store(documents, persist_directory)
+            
+            self.vector_store = numpy_store
+            self.backend = "numpy"
+            self.logger.success(f"Sử dụng NumPy cho {len(documents)} chunks")
+            
+            self._count_documents(documents, reset=True)
+            self._register_document(doc_id, persist_directory, len(documents))
+            return retriever
+        
         try:
             # Thử ChromaDB trước
             self.logger.info("Đang thử ChromaDB...")
@@ -109,9 +535,11 @@ class SmartVectorStore:
             retriever = chroma_store.build_store(documents, persist_directory)
             
             self.vector_store = chroma_store
-            self.using_fallback = False
+            self.backend = "chromadb"
             self.logger.success("Sử dụng ChromaDB thành công")
             
+            self._count_documents(documents, reset=True)
+            self._register_document(doc_id, persist_directory, len(documents))
             return retriever
             
         except Exception as e:
@@ -124,15 +552,161 @@ class SmartVectorStore:
                 retriever = fallback_store.build_store(documents, persist_directory)
                 
                 self.vector_store = fallback_store
-                self.using_fallback = True
+                self.backend = "faiss"
                 self.logger.success("Sử dụng FAISS fallback thành công")
                 
+                self._count_documents(documents, reset=True)
+                self._register_document(doc_id, persist_directory, len(documents))
                 return retriever
                 
             except Exception as fallback_error:
                 self.logger.error(f"Cả ChromaDB và FAISS đều thất bại: {str(fallback_error)}")
                 raise
     
+    def ingest(
+        self,
+        batches: Iterable[ChunkBatch],
+        persist_directory: Optional[str] = None,
+        doc_id: Optional[str] = None
+    ) -> Iterator[IngestProgress]:
+        """
+        Index dần từng batch chunks (ví dụ từ PDFProcessor.iter_chunk_batches).
+        Mỗi batch được embed và thêm vào store theo nhóm embedding_batch_size,
+        sau mỗi nhóm yield tiến độ để UI cập nhật. Gọi get_retriever() sau khi chạy hết.
+        Store rỗng: build mới và lưu vào catalog; nên gọi open_document() trước để bỏ qua
+        hoàn toàn tài liệu đã có index. Store đã có dữ liệu: thêm tài liệu vào collection.
+        Backend của store mới được chọn theo số chunks ước lượng từ batch đầu tiên.
+        """
+        batch_size = max(1, app_config.embedding_batch_size)
+        chunks_indexed = 0
+        
+        is_new_store = self.vector_store is None
+        if is_new_store:
+            self.documents = {}
+            if self.keyword_index is not None:
+                self.keyword_index.clear()
+            persist_directory = self._catalog_path(doc_id, persist_directory)
+        else:
+            self._detach_from_catalog()
+        
+        for batch in batches:
+            # Ước lượng tổng số chunks theo tỉ lệ chunks/trang của các trang đã đọc
+            expected_chunks = (chunks_indexed + len(batch.chunks)) * batch.total_pages / max(batch.pages_done, 1)
+            for start in range(0, len(batch.chunks), batch_size):
+                group = batch.chunks[start:start + batch_size]
+                self._add_to_store(group, persist_directory, expected_chunks)
+                self._count_documents(group)
+                chunks_indexed += len(group)
+                yield IngestProgress(batch.pages_done, batch.total_pages, chunks_indexed)
+            
+            # Cửa sổ không có chunk nào vẫn cần báo tiến độ đọc trang
+            if not batch.chunks:
+                yield IngestProgress(batch.pages_done, batch.total_pages, chunks_indexed)
+        
+        if self.vector_store is None:
+            raise ValueError("Không có chunk nào để xây dựng vector store")
+        
+        if is_new_store:
+            if self.backend != "chromadb" and persist_directory:
+                self.vector_store.save(persist_directory)
+            self._register_document(doc_id, persist_directory, chunks_indexed)
+        
+        self.logger.success(f"Đã index {chunks_indexed} chunks vào {self.get_store_info().get('store_type')}")
+    
+    def _add_to_store(
+        self,
+        documents: List[Document],
+        persist_directory: Optional[str] = None,
+        expected_chunks: Optional[float] = None
+    ):
+        """
+        Thêm chunks vào store hiện tại. Lần đầu: NumPy nếu số chunks dự kiến nhỏ,
+        không thì thử ChromaDB rồi mới dùng FAISS.
+        """
+        if self.keyword_index is not None:
+            self.keyword_index.add_documents(documents)
+        
+        if self.vector_store is not None:
+            self.vector_store.add_documents(documents)
+            return
+        
+        if self._prefers_numpy(expected_chunks or len(documents)):
+            numpy_store = NumpyVectorStore(self.embedding_model)
+            numpy_store.add_documents(documents)
+            
+            self.vector_store = numpy_store
+            self.backend = "numpy"
+            self.logger.success("Sử dụng NumPy vector store")
+            return
+        
+        try:
+            self.logger.info("Đang thử ChromaDB...")
+            from .vector_store import VectorStore
+            
+            chroma_store = VectorStore(self.embedding_model)
+            chroma_store.add_documents(documents, persist_directory)
+            
+            self.vector_store = chroma_store
+            self.backend = "chromadb"
+            self.logger.success("Sử dụng ChromaDB thành công")
+            
+        except Exception as e:
+            self.logger.warning(f"ChromaDB không khả dụng: {str(e)}")
+            self.logger.info("Chuyển sang FAISS fallback...")
+            
+            fallback_store = FallbackVectorStore(self.embedding_model)
+            fallback_store.add_documents(documents)
+            
+            self.vector_store = fallback_store
+            self.backend = "faiss"
+            self.logger.success("Sử dụng FAISS fallback thành công")
+    
+    def _count_documents(self, documents: List[Document], reset: bool = False):
+        """Cập nhật số chunks theo từng tài liệu trong collection"""
+        if reset:
+            self.documents = {}
+        for document in documents:
+            doc_id = document.metadata.get("doc_id", "unknown")
+            self.documents[doc_id] = self.documents.get(doc_id, 0) + 1
+    
+    def add_documents(self, documents: List[Document]):
+        """Thêm chunks (của một hay nhiều tài liệu) vào collection hiện tại, không build lại"""
+        self._detach_from_catalog()
+        
+        batch_size = max(1, app_config.embedding_batch_size)
+        for start in range(0, len(documents), batch_size):
+            group = documents[start:start + batch_size]
+            self._add_to_store(group)
+            self._count_documents(group)
+        
+        self.logger.success(f"Đã thêm {len(documents)} chunks vào collection ({len(self.documents)} tài liệu)")
+    
+    def remove_document(self, doc_id: str) -> int:
+        """Xóa một tài liệu khỏi collection, trả về số chunks đã xóa"""
+        if not self.vector_store:
+            raise ValueError("Vector store chưa được xây dựng")
+        
+        self._detach_from_catalog()
+        removed = self.vector_store.remove_document(doc_id)
+        self.documents.pop(doc_id, None)
+        if self.keyword_index is not None:
+            self.keyword_index.remove_document(doc_id)
+        return removed
+    
+    def get_retriever(self, doc_ids: Optional[List[str]] = None):
+        """Lấy retriever của store đang dùng; doc_ids giới hạn tìm kiếm trong các tài liệu đó"""
+        if not self.vector_store:
+            raise ValueError("Vector store chưa được xây dựng")
+        
+        if self.keyword_index is not None:
+            # Nhánh dense dùng similarity thuần để lấy nhiều ứng viên cho bước fusion
+            dense_retriever = self.vector_store.get_retriever(
+                doc_ids, search_type="similarity", k=app_config.hybrid_fetch_k
+            )
+            return create_hybrid_retriever(dense_retriever, self.keyword_index, doc_ids)
+        
+        return self.vector_store.get_retriever(doc_ids)
+    
     def get_similarity_search(self, query: str, k: int = 5) -> List[Document]:
         """Tìm kiếm similarity"""
         if not self.vector_store:
@@ -147,6 +721,8 @@ class SmartVectorStore:
         
         info = self.vector_store.get_store_info()
         info["using_fallback"] = self.using_fallback
-        info["store_type"] = "faiss" if self.using_fallback else "chromadb"
+        info["store_type"] = self.backend
+        info["documents"] = len(self.documents)
+        info["hybrid"] = self.keyword_index is not None
         
         return info
@@ -0,0 +1,136 @@
+# modules/vector_store_numpy.py
+
+"""
+Vector store tìm kiếm chính xác bằng NumPy cho tài liệu nhỏ và vừa
+(không có chi phí khởi động của Chroma/FAISS)
+"""
+
+from typing import List, Optional, Dict, Any
+import numpy as np
+from langchain_core.documents import Document
+
+from config import app_config
+from utils.logger import get_logger
+from .embeddings import get_embedding_model
+from .embedding_store import EmbeddingMatrixStore, InMemoryEmbeddingMatrix, MatrixRetriever, write_embedding_store
+
+
+class NumpyVectorStore:
+    """Embeddings chuẩn hóa trong một ma trận liên tục; top-k bằng một phép nhân ma trận + argpartition"""
+    
+    def __init__(self, embedding_model=None):
+        self.embedding_model = embedding_model or get_embedding_model()
+        # InMemoryEmbeddingMatrix khi build/sửa, EmbeddingMatrixStore (memmap, chỉ đọc) khi mở index đã lưu
+        self.matrix = None
+        self.logger = get_logger()
+        
+        self.logger.info("Khởi tạo NumPy VectorStore...")
+    
+    def _require_built(self):
+        if self.matrix is None:
+            raise ValueError("Vector store chưa được xây dựng")
+    
+    def _writable_matrix(self) -> InMemoryEmbeddingMatrix:
+        """Ma trận sửa được: store memmap được copy vào RAM ở lần sửa đầu tiên"""
+        if self.matrix is None:
+            self.matrix = InMemoryEmbeddingMatrix()
+        elif not isinstance(self.matrix, InMemoryEmbeddingMatrix):
+            self.matrix = InMemoryEmbeddingMatrix.from_matrix(self.matrix)
+        return self.matrix
+    
+    def build_store(self, documents: List[Document], persist_directory: Optional[str] = None):
+        """Embed chunks và xây ma trận tìm kiếm"""
+        try:
+            self.logger.info(f"Đang xây dựng NumPy vector store với {len(documents)} documents...")
+            
+            self.matrix = None
+            self.add_documents(documents)
+            
+            if persist_directory:
+                self.save(persist_directory)
+            
+            self.logger.success("NumPy vector store đã được xây dựng thành công")
+            return self.get_retriever()
+            
+        except Exception as e:
+            self.logger.error(f"Lỗi khi xây dựng NumPy vector store: {str(e)}")
+            raise
+    
+    def add_documents(self, documents: List[Document], persist_directory: Optional[str] = None):
+        """Thêm chunks vào ma trận"""
+        if not documents:
+            return
+        
+        vectors = self.embedding_model.embed_documents([d.page_content for d in documents])
+        self._writable_matrix().add(np.asarray(vectors, dtype=np.float32), documents)
+    
+    def save(self, persist_directory: str):
+        """Lưu ma trận .npy + file chunks (mở lại bằng memmap)"""
+        self._require_built()
+        
+        write_embedding_store(
+            persist_directory,
+            self.matrix.vectors[:len(self.matrix)],
+            self.matrix.get_all_documents(),
+            app_config.embedding_store_dtype
+        )
+        self.logger.info(f"NumPy vector store saved to: {persist_directory}")
+    
+    def load(self, persist_directory: str):
+        """Mở store đã lưu bằng memmap"""
+        self.matrix = EmbeddingMatrixStore.open(persist_directory)
+        self.logger.info(f"Đã mở NumPy vector store (memmap) từ: {persist_directory}")
+        return self.get_retriever()
+    
+    def remove_document(self, doc_id: str) -> int:
+        """Xóa mọi chunk của một tài liệu, trả về số chunk đã xóa"""
+        self._require_built()
+        
+        removed = self._writable_matrix().remove(doc_id)
+        self.logger.info(f"Đã xóa {removed} chunks của tài liệu {doc_id[:12]}")
+        return removed
+    
+    def get_all_documents(self) -> List[Document]:
+        """Lấy toàn bộ chunks trong store"""
+        self._require_built()
+        return self.matrix.get_all_documents()
+    
+    def get_retriever(self, doc_ids: Optional[List[str]] = None, search_type: Optional[str] = None, k: Optional[int] = None):
+        """Tạo retriever (mặc định theo retrieval_search_type), có thể giới hạn trong một số tài liệu"""
+        self._require_built()
+        
+        return MatrixRetriever(
+            store=self,
+            embedding_model=self.embedding_model,
+            k=k or app_config.retrieval_k,
+            doc_ids=list(doc_ids) if doc_ids else None,
+            search_type=search_type or app_config.retrieval_search_type,
+            fetch_k=app_config.retrieval_fetch_k,
+            lambda_mult=app_config.retrieval_lambda_mult
+        )
+    
+    def get_similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        """Tìm kiếm similarity"""
+        self._require_built()
+        
+        try:
+            hits = self.matrix.search(self.embedding_model.embed_query(query), k)
+            results = [self.matrix.get_document(i) for i, _ in hits]
+            self.logger.info(f"Tìm thấy {len(results)} documents liên quan")
+            return results
+        except Exception as e:
+            self.logger.error(f"Lỗi khi tìm kiếm: {str(e)}")
+            return []
+    
+    def get_store_info(self) -> Dict[str, Any]:
+        """Lấy thông tin về vector store"""
+        if self.matrix is None:
+            return {"status": "not_built", "type": "numpy"}
+        
+        return {
+            "status": "active",
+            "type": "numpy",
+            "storage": "memory" if isinstance(self.matrix, InMemoryEmbeddingMatrix) else "memmap",
+            "dtype": self.matrix.dtype,
+            "index_size": len(self.matrix)
+        }
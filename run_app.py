@@ -148,6 +148,60 @@ def run_tests():
         print(f"❌ Test failed: {e}")
         return False
 
+def load_questions(path):
+    """Đọc câu hỏi từ file: mỗi dòng một câu, bỏ dòng trống và dòng bắt đầu bằng #"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def run_batch(pdf_path, questions_path, output_path=None, concurrency=None):
+    """Trả lời các câu hỏi trong file theo lô trên một tài liệu PDF"""
+    import json
+    
+    print("📦 Chạy hỏi đáp theo lô...")
+    
+    for path in (pdf_path, questions_path):
+        if not path or not os.path.exists(path):
+            print(f"❌ Không tìm thấy file: {path}")
+            return False
+    
+    questions = load_questions(questions_path)
+    if not questions:
+        print("❌ File câu hỏi không có câu hỏi nào")
+        return False
+    
+    try:
+        from modules.pdf_processor import PDFProcessor
+        from modules.vector_store_fallback import SmartVectorStore
+        from modules.llm_wrapper import LLMWrapper
+        from modules.rag_pipeline import RAGPipeline
+        
+        processor = PDFProcessor()
+        chunks = processor.load_and_chunk(pdf_path)
+        retriever = SmartVectorStore(processor.embedding_model).build_store(chunks)
+        pipeline = RAGPipeline(retriever, LLMWrapper().get_llm(), processor.embedding_model)
+        
+        results = pipeline.ask_batch(questions, max_concurrency=concurrency)
+    except Exception as e:
+        print(f"❌ Lỗi khi chạy batch: {e}")
+        return False
+    
+    for i, result in enumerate(results, 1):
+        status = "✅" if result["success"] else "❌"
+        source = " (cache)" if result["cached"] else ""
+        print(f"\n{status} [{i}] {result['question']}")
+        print(f"   ⏱️ retrieval {result['retrieval_time']:.2f}s | llm {result['llm_time']:.2f}s | total {result['total_time']:.2f}s{source}")
+        print(f"   🤖 {result['answer']}")
+    
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"\n💾 Đã ghi kết quả vào {output_path}")
+    
+    succeeded = sum(result["success"] for result in results)
+    print(f"\n📊 {succeeded}/{len(results)} câu hỏi trả lời thành công")
+    return succeeded == len(results)
+
 def setup_environment():
     """Setup môi trường phát triển"""
     print("🔧 Setup môi trường phát triển...")
@@ -174,6 +228,7 @@ Examples:
   python run_app.py --mode app --port 8502     # Chạy trên port khác
   python run_app.py --mode basic               # Chạy ứng dụng cơ bản
   python run_app.py --mode demo                # Chạy demo tương tác
+  python run_app.py --mode batch --pdf doc.pdf --questions questions.txt --output answers.jsonl
   python run_app.py --mode test                # Chạy tests
   python run_app.py --mode setup               # Setup môi trường
   python run_app.py --mode check               # Kiểm tra dependencies
@@ -182,7 +237,7 @@ Examples:
     
     parser.add_argument(
         "--mode",
-        choices=["app", "basic", "demo", "test", "setup", "check"],
+        choices=["app", "basic", "demo", "batch", "test", "setup", "check"],
         default="app",
         help="Chế độ chạy (default: app)"
     )
@@ -206,6 +261,15 @@ Examples:
         help="Bật debug mode"
     )
     
+    parser.add_argument("--pdf", help="File PDF cho mode batch")
+    parser.add_argument("--questions", help="File câu hỏi cho mode batch (mỗi dòng một câu)")
+    parser.add_argument("--output", help="Ghi kết quả mode batch ra file JSON Lines")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Số request LLM song song cho mode batch (default: BATCH_MAX_CONCURRENCY)"
+    )
+    
     args = parser.parse_args()
     
     print("🚀 RAG Chatbot Pro - Enhanced Runner")
@@ -222,7 +286,7 @@ Examples:
         if not check_requirements():
             sys.exit(1)
     
-    if args.mode in ["app", "basic", "demo"]:
+    if args.mode in ["app", "basic", "demo", "batch"]:
         if not check_env():
             sys.exit(1)
     
@@ -244,6 +308,8 @@ Examples:
         run_streamlit("app.py", args.port, args.host, args.debug)
     elif args.mode == "demo":
         success = run_demo()
+    elif args.mode == "batch":
+        success = run_batch(args.pdf, args.questions, args.output, args.concurrency)
     elif args.mode == "test":
         success = run_tests()
     elif args.mode == "setup":
@@ -0,0 +1,318 @@
+# run_benchmark.py
+
+"""
+Benchmark hiệu năng các bước xử lý của RAG Chatbot Pro
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Benchmark không gọi LLM nên không cần API key thật
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+
+def benchmark_ingest(pdf_path: str, store_type: str = "faiss", repeat: int = 1):
+    """So sánh thời gian ingest khi embed lại chunk và khi tái sử dụng vector câu"""
+    from modules.embeddings import get_embedding_model
+    from modules.pdf_processor import PDFProcessor
+    from modules.vector_store import VectorStore
+    from modules.vector_store_fallback import FallbackVectorStore
+    from modules.vector_store_numpy import NumpyVectorStore
+    from config import app_config
+    from utils.metrics import get_metrics
+
+    # Tắt cache để mỗi lần chạy đều chunk lại từ đầu
+    app_config.enable_cache = False
+
+    print(f"📄 File: {pdf_path}")
+    print(f"🗄️ Vector store: {store_type}")
+
+    base_model = get_embedding_model()
+    base_model.embed_query("khởi động model")
+
+    results = {}
+    for reuse in (False, True):
+        app_config.reuse_sentence_embeddings = reuse
+        label = "reuse" if reuse else "baseline"
+        timings = []
+
+        for _ in range(repeat):
+            processor = PDFProcessor(embedding_model=base_model)
+            # Số text model thực sự encode (câu khi chunking + chunks khi index)
+            embedded_before = get_metrics().get_metrics()["embedding"]["texts"]
+
+            start = time.perf_counter()
+            chunks = processor.load_and_chunk(pdf_path)
+            chunk_time = time.perf_counter() - start
+
+            store_cls = {"chroma": VectorStore, "numpy": NumpyVectorStore}.get(store_type, FallbackVectorStore)
+            store = store_cls(processor.embedding_model)
+
+            start = time.perf_counter()
+            store.build_store(chunks)
+            index_time = time.perf_counter() - start
+
+            embedded = get_metrics().get_metrics()["embedding"]["texts"] - embedded_before
+            timings.append((chunk_time, index_time, embedded))
+
+        chunk_time = min(t[0] for t in timings)
+        index_time = min(t[1] for t in timings)
+        results[label] = (len(chunks), chunk_time, index_time, timings[-1][2])
+
+    print(f"📑 Pages: {processor._count_pages(pdf_path)}")
+    print("\n" + "=" * 82)
+    print(f"{'Mode':<10}{'Chunks':>8}{'Embedded':>12}{'Chunking (s)':>16}{'Indexing (s)':>16}{'Total (s)':>14}")
+    print("-" * 82)
+    for label, (count, chunk_time, index_time, embedded) in results.items():
+        print(f"{label:<10}{count:>8}{embedded:>12}{chunk_time:>16.2f}{index_time:>16.2f}{chunk_time + index_time:>14.2f}")
+    print("=" * 82)
+
+    saved = results["baseline"][3] - results["reuse"][3]
+    print(f"🧮 Embeddings saved: {saved} ({saved / max(results['baseline'][3], 1):.1%} of baseline)")
+    baseline_total = sum(results["baseline"][1:3])
+    reuse_total = sum(results["reuse"][1:3])
+    if reuse_total > 0:
+        print(f"⚡ Speedup: {baseline_total / reuse_total:.2f}x")
+
+
+def benchmark_serialize(pdf_path: str, repeat: int = 1):
+    """So sánh kích thước và thời gian ghi/đọc chunk cache: pickle và chunk_codec"""
+    import pickle
+    from modules.chunk_codec import available_codecs, decode_chunks, encode_chunks
+    from modules.pdf_processor import PDFProcessor
+    from config import app_config
+
+    app_config.enable_cache = False
+
+    print(f"📄 File: {pdf_path}")
+    chunks = PDFProcessor().load_and_chunk(pdf_path)
+    print(f"🧩 Chunks: {len(chunks)}")
+
+    formats = {"pickle": (lambda c: pickle.dumps(c, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads)}
+    for codec in available_codecs():
+        formats[f"codec-{codec}"] = (lambda c, codec=codec: encode_chunks(c, codec), decode_chunks)
+
+    results = {}
+    for label, (dump, load) in formats.items():
+        dump_times, load_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = dump(chunks)
+            dump_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            loaded = load(data)
+            load_times.append(time.perf_counter() - start)
+
+        assert [d.page_content for d in loaded] == [d.page_content for d in chunks]
+        results[label] = (len(data), min(dump_times), min(load_times))
+
+    print("\n" + "=" * 70)
+    print(f"{'Format':<16}{'Size (KB)':>14}{'Dump (ms)':>14}{'Load (ms)':>14}{'Size %':>10}")
+    print("-" * 70)
+    pickle_size = results["pickle"][0]
+    for label, (size, dump_time, load_time) in results.items():
+        print(f"{label:<16}{size / 1024:>14.1f}{dump_time * 1000:>14.2f}{load_time * 1000:>14.2f}{size / pickle_size:>10.0%}")
+    print("=" * 70)
+
+
+def _synthetic_vectors(size: int, dim: int, seed: int = 0):
+    """Vector chuẩn hóa có cấu trúc cụm (giống embeddings thật hơn dữ liệu ngẫu nhiên đều)"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, size // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def benchmark_ann(size: int, dim: int, queries: int, k: int):
+    """So sánh recall@k và độ trễ của HNSW/IVF với flat (tìm chính xác) trên dữ liệu tổng hợp"""
+    import numpy as np
+    from modules.ann_index import INDEX_FLAT, INDEX_HNSW, INDEX_IVF, build_index
+
+    print(f"🧮 Vectors: {size} x {dim}, queries: {queries}, k: {k}")
+    vectors = _synthetic_vectors(size + queries, dim)
+    base, query_vectors = vectors[:size], vectors[size:]
+
+    results = {}
+    ground_truth = None
+    for index_type in (INDEX_FLAT, INDEX_HNSW, INDEX_IVF):
+        start = time.perf_counter()
+        index = build_index(base, index_type)
+        build_time = time.perf_counter() - start
+
+        latencies = []
+        found = []
+        for query in query_vectors:
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], k)
+            latencies.append(time.perf_counter() - start)
+            found.append(ids[0])
+
+        if ground_truth is None:
+            ground_truth = found
+        recall = np.mean([len(set(f) & set(g)) / k for f, g in zip(found, ground_truth)])
+        results[index_type] = (build_time, np.mean(latencies) * 1000, np.percentile(latencies, 95) * 1000, recall)
+
+    print("\n" + "=" * 70)
+    print(f"{'Index':<10}{'Build (s)':>12}{'Mean (ms)':>14}{'p95 (ms)':>14}{f'Recall@{k}':>14}")
+    print("-" * 70)
+    for index_type, (build_time, mean_ms, p95_ms, recall) in results.items():
+        print(f"{index_type:<10}{build_time:>12.2f}{mean_ms:>14.3f}{p95_ms:>14.3f}{recall:>14.3f}")
+    print("=" * 70)
+
+
+def benchmark_quantization(size: int, dim: int, queries: int, k: int, index_type: str = "flat"):
+    """Bộ nhớ mỗi 100k chunks và recall@k (trước/sau khi tính lại điểm bằng vector gốc) của từng mức lượng tử hóa"""
+    import numpy as np
+    from config import app_config
+    from modules.ann_index import QUANT_FP16, QUANT_NONE, QUANT_PQ, QUANT_SQ8, PQ_MIN_TRAIN, build_index, index_memory_bytes, resolve_quantization
+
+    print(f"🧮 Vectors: {size} x {dim}, queries: {queries}, k: {k}, index: {index_type}")
+    vectors = _synthetic_vectors(size + queries, dim)
+    base, query_vectors = vectors[:size], vectors[size:]
+
+    # Kết quả chính xác để tính recall
+    exact = [np.argsort(-(base @ q))[:k] for q in query_vectors]
+    candidate_count = k * max(1, app_config.ann_candidate_factor)
+
+    results = {}
+    for quantization in (QUANT_NONE, QUANT_FP16, QUANT_SQ8, QUANT_PQ):
+        label = resolve_quantization(quantization, size)
+        if label != quantization:
+            print(f"⚠️ {quantization}: cần >= {PQ_MIN_TRAIN} vectors để train, bỏ qua")
+            continue
+
+        index = build_index(base, index_type, quantization)
+        memory_per_100k = index_memory_bytes(index) / size * 100000 / (1024 * 1024)
+
+        raw_recall, rescored_recall, latencies = [], [], []
+        for query, truth in zip(query_vectors, exact):
+            start = time.perf_counter()
+            _, ids = index.search(query[None, :], candidate_count)
+            ids = ids[0][ids[0] >= 0]
+            rescored = ids[np.argsort(-(base[ids] @ query))[:k]]
+            latencies.append(time.perf_counter() - start)
+
+            raw_recall.append(len(set(ids[:k]) & set(truth)) / k)
+            rescored_recall.append(len(set(rescored) & set(truth)) / k)
+
+        results[quantization] = (memory_per_100k, np.mean(latencies) * 1000, np.mean(raw_recall), np.mean(rescored_recall))
+
+    print("\n" + "=" * 78)
+    print(f"{'Quantization':<14}{'MB / 100k':>12}{'Mean (ms)':>12}{f'Recall@{k}':>14}{'Rescored':>14}")
+    print("-" * 78)
+    for quantization, (memory, mean_ms, raw, rescored) in results.items():
+        print(f"{quantization:<14}{memory:>12.1f}{mean_ms:>12.3f}{raw:>14.3f}{rescored:>14.3f}")
+    print("=" * 78)
+    print("Rescored: lấy k * ann_candidate_factor ứng viên rồi tính lại cosine bằng vector float32")
+
+
+def benchmark_mmr(dim: int, queries: int, k: int):
+    """Độ trễ MMR của modules/mmr.py so với bản của LangChain theo fetch_k"""
+    import numpy as np
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance as langchain_mmr
+    from modules.mmr import maximal_marginal_relevance
+
+    print(f"🧮 Dim: {dim}, queries: {queries}, k: {k}")
+    results = {}
+    for fetch_k in (20, 100, 500, 2000):
+        vectors = _synthetic_vectors(fetch_k + queries, dim)
+        candidates, query_vectors = vectors[:fetch_k], vectors[fetch_k:]
+
+        timings = []
+        for select in (maximal_marginal_relevance, langchain_mmr):
+            start = time.perf_counter()
+            for query in query_vectors:
+                select(query, candidates, k=k)
+            timings.append((time.perf_counter() - start) / queries * 1000)
+        results[fetch_k] = timings
+
+    print("\n" + "=" * 50)
+    print(f"{'fetch_k':<10}{'NumPy (ms)':>14}{'LangChain (ms)':>16}{'Speedup':>10}")
+    print("-" * 50)
+    for fetch_k, (ours, langchain) in results.items():
+        print(f"{fetch_k:<10}{ours:>14.3f}{langchain:>16.3f}{langchain / ours:>9.1f}x")
+    print("=" * 50)
+
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(
+        description="RAG Chatbot Pro - Benchmark",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python run_benchmark.py --mode ingest --pdf large.pdf
+  python run_benchmark.py --mode ingest --pdf large.pdf --store chroma --repeat 3
+  python run_benchmark.py --mode serialize --pdf large.pdf --repeat 5
+  python run_benchmark.py --mode ann --size 200000 --queries 500
+  python run_benchmark.py --mode quantization --size 100000 --index hnsw
+  python run_benchmark.py --mode mmr --queries 50
+        """
+    )
+
+    parser.add_argument(
+        "--mode",
+        choices=["ingest", "serialize", "ann", "quantization", "mmr"],
+        default="ingest",
+        help="Loại benchmark (default: ingest)"
+    )
+
+    parser.add_argument("--pdf", help="Đường dẫn file PDF dùng để benchmark")
+
+    parser.add_argument(
+        "--store",
+        choices=["faiss", "chroma", "numpy"],
+        default="faiss",
+        help="Vector store dùng khi benchmark ingest (default: faiss)"
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Số lần lặp, lấy kết quả tốt nhất (default: 1)"
+    )
+
+    parser.add_argument("--size", type=int, default=100000, help="Số vector tổng hợp cho benchmark ann (default: 100000)")
+    parser.add_argument("--dim", type=int, default=768, help="Số chiều vector (default: 768, như BKAI bi-encoder)")
+    parser.add_argument("--queries", type=int, default=200, help="Số câu truy vấn (default: 200)")
+    parser.add_argument("--k", type=int, default=10, help="k khi đo recall@k (default: 10)")
+    parser.add_argument(
+        "--index",
+        choices=["flat", "hnsw", "ivf"],
+        default="flat",
+        help="Loại index khi benchmark quantization (default: flat)"
+    )
+
+    args = parser.parse_args()
+
+    if args.mode == "ann":
+        benchmark_ann(args.size, args.dim, args.queries, args.k)
+        return
+    if args.mode == "quantization":
+        benchmark_quantization(args.size, args.dim, args.queries, args.k, args.index)
+        return
+    if args.mode == "mmr":
+        benchmark_mmr(args.dim, args.queries, args.k)
+        return
+
+    if not args.pdf or not os.path.exists(args.pdf):
+        print("❌ Cần truyền --pdf tới một file PDF tồn tại")
+        sys.exit(1)
+
+    if args.mode == "ingest":
+        benchmark_ingest(args.pdf, args.store, args.repeat)
+    elif args.mode == "serialize":
+        benchmark_serialize(args.pdf, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
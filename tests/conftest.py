@@ -0,0 +1,54 @@
+# tests/conftest.py
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _workdir(tmp_path_factory):
+    """Metrics, cache và index ghi theo đường dẫn tương đối: chạy trong thư mục tạm"""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("workdir"))
+    yield
+    os.chdir(previous)
+
+
+class CountingEmbeddings(Embeddings):
+    """Embedding giả (vector theo hash của text), đếm số lần gọi encoder"""
+
+    model_name = "counting-embeddings"
+
+    def __init__(self, dimension: int = 16):
+        self.dimension = dimension
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.blake2b(text.encode(), digest_size=self.dimension).digest()
+        return [byte / 255.0 + 0.01 for byte in digest]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def reset(self):
+        self.calls = 0
+        self.texts = 0
+
+
+@pytest.fixture
+def counting_embeddings() -> CountingEmbeddings:
+    return CountingEmbeddings()
@@ -0,0 +1,38 @@
+# tests/test_ann_index.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from config import app_config
+from modules.ann_index import (
+    INDEX_FLAT, INDEX_HNSW, INDEX_IVF, PQ_MIN_TRAIN, QUANT_PQ, QUANT_SQ8,
+    build_index, quantization_of, resolve_quantization
+)
+
+
+def _vectors(count, dimension=16):
+    vectors = np.random.default_rng(0).normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("index_type", [INDEX_FLAT, INDEX_HNSW, INDEX_IVF])
+def test_pq_falls_back_to_sq8_below_min_train(index_type):
+    vectors = _vectors(200)
+
+    index = build_index(vectors, index_type, QUANT_PQ)
+
+    assert resolve_quantization(QUANT_PQ, len(vectors)) == QUANT_SQ8
+    assert quantization_of(index) == QUANT_SQ8
+    assert index.ntotal == len(vectors)
+    _, ids = index.search(vectors[:1], 1)
+    assert ids[0][0] == 0
+
+
+def test_pq_used_with_enough_training_points(monkeypatch):
+    monkeypatch.setattr(app_config, "faiss_pq_m", 4)
+
+    index = build_index(_vectors(PQ_MIN_TRAIN), INDEX_FLAT, QUANT_PQ)
+
+    assert quantization_of(index) == QUANT_PQ
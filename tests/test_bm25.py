@@ -0,0 +1,67 @@
+# tests/test_bm25.py
+
+import unicodedata
+
+import pytest
+from langchain_core.documents import Document
+
+from modules.bm25 import BM25Index, fold_diacritics, tokenize_vietnamese
+
+
+def _doc(text, doc_id="doc"):
+    return Document(page_content=text, metadata={"doc_id": doc_id})
+
+
+def test_fold_diacritics():
+    assert fold_diacritics("Điều khoản đặc biệt") == "dieu khoan dac biet"
+    # Dạng NFD (dấu tách rời) cho cùng kết quả với NFC
+    assert fold_diacritics("Nghị định") == fold_diacritics("Nghị định") == "nghi dinh"
+
+
+def test_legal_codes_kept_as_whole_tokens():
+    tokens = tokenize_vietnamese("Theo Nghị định 10/2023/NĐ-CP, mục 4.2")
+
+    assert "10/2023/nd-cp" in tokens
+    assert "4.2" in tokens
+    assert {"nghi", "dinh", "10", "2023", "nd", "cp"} <= set(tokens)
+
+
+def test_search_matches_without_diacritics():
+    index = BM25Index()
+    index.add_documents([_doc("Điều 5 quy định về thuế"), _doc("Nghị định 10/2023/NĐ-CP về hóa đơn")])
+
+    results = index.search("nghi dinh 10/2023/nd-cp")
+
+    assert results[0][0].page_content.startswith("Nghị định")
+
+
+def test_add_rebuilds_only_changed_tokens():
+    index = BM25Index()
+    index.add_documents([_doc("thuế giá trị gia tăng"), _doc("hóa đơn điện tử")])
+    index.search("thuế")
+    untouched = index._arrays["hoa"]
+
+    index.add_documents([_doc("thuế thu nhập")])
+    results = index.search("thuế")
+
+    assert index._arrays["hoa"] is untouched
+    assert len(results) == 2
+
+
+@pytest.mark.parametrize("removed_ids", [["doc1"], ["doc0", "doc1", "doc2"]])
+def test_remove_matches_fresh_index(removed_ids):
+    documents = [_doc(f"chủ đề {i % 3} nội dung số {i}", doc_id=f"doc{i % 4}") for i in range(20)]
+    index = BM25Index()
+    index.add_documents(documents)
+    index.search("chủ đề")
+
+    # Xóa 3/4 số chunk thì các slot trống được dồn lại
+    assert sum(index.remove_document(doc_id) for doc_id in removed_ids) == 5 * len(removed_ids)
+    fresh = BM25Index()
+    fresh.add_documents([d for d in documents if d.metadata["doc_id"] not in removed_ids])
+
+    assert len(index) == len(fresh) == 20 - 5 * len(removed_ids)
+    for query in ["chủ đề 1", "nội dung số 7", "số 5"]:
+        expected = {d.page_content: s for d, s in fresh.search(query)}
+        assert {d.page_content: s for d, s in index.search(query)} == pytest.approx(expected)
+    assert all(d.metadata["doc_id"] not in removed_ids for d, _ in index.search("nội dung", k=20))
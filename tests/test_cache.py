@@ -0,0 +1,101 @@
+# tests/test_cache.py
+
+import time
+
+import pytest
+
+from utils.cache import DiskCache, MemoryCache, SQLiteCache, TieredCache
+
+
+@pytest.fixture(params=["disk", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "disk":
+        return DiskCache(str(tmp_path / "disk"), max_bytes=1024, sweep_interval=0)
+    return SQLiteCache(str(tmp_path / "cache.db"), max_bytes=1024, sweep_interval=0)
+
+
+def test_oversize_set_drops_previous_value(backend):
+    backend.set("key", "cũ")
+    assert backend.get("key") == "cũ"
+
+    assert backend.set_entry("key", "x" * 4096) is None
+    assert backend.get("key") is None
+
+
+def test_tiered_oversize_set_drops_previous_value(backend):
+    cache = TieredCache(backend, memory_max_bytes=1024)
+    cache.set("key", "cũ")
+    assert cache.get("key") == "cũ"
+
+    cache.set("key", "x" * 4096)
+    assert cache.get("key") is None
+
+
+def test_memory_oversize_set_drops_previous_value():
+    cache = MemoryCache(max_bytes=100)
+    cache.set("key", "cũ", 10, float("inf"))
+    cache.set("key", "mới", 1000, float("inf"))
+
+    assert cache.get("key") is None
+    assert cache.get_stats()["size_bytes"] == 0
+
+
+def test_disk_cache_migrates_legacy_flat_files(tmp_path, caplog):
+    cache_dir = tmp_path / "disk"
+    cache_dir.mkdir()
+    (cache_dir / "old.cache").write_bytes(b"legacy")
+
+    cache = DiskCache(str(cache_dir), sweep_interval=0)
+
+    assert not (cache_dir / "old.cache").exists()
+    assert "removed 1 legacy entries" in caplog.text
+    cache.set("key", "mới")
+    assert cache.get("key") == "mới"
+
+
+def test_tiered_promotes_backend_hit_to_memory(backend):
+    # Giá trị do process khác ghi: chỉ có ở tầng persistent
+    backend.set("key", {"chunks": [1, 2, 3]})
+    cache = TieredCache(backend, memory_max_bytes=1024)
+
+    assert cache.get("key") == {"chunks": [1, 2, 3]}
+    assert cache.get("key") == {"chunks": [1, 2, 3]}
+
+    stats = cache.get_stats()
+    assert stats["disk"]["hits"] == 1
+    assert stats["memory"]["hits"] == 1
+    assert stats["memory"]["entries"] == 1
+
+
+def test_sqlite_evicts_least_recently_used_over_size(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), max_bytes=1024, sweep_interval=0)
+    for key in ["a", "b", "c"]:
+        cache.set(key, key * 400)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "b" * 400
+    assert cache.get("c") == "c" * 400
+
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] <= 1024
+
+    # Process khác mở cùng file thấy cùng dữ liệu và cùng dung lượng
+    other = SQLiteCache(str(tmp_path / "cache.db"), max_bytes=1024, sweep_interval=0)
+    assert other.get("c") == "c" * 400
+    assert other.get_stats()["size_bytes"] == stats["size_bytes"]
+
+
+def test_sqlite_sweep_removes_expired_entries(tmp_path, monkeypatch):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=60, sweep_interval=0)
+    cache.set("a", "giá trị")
+    cache.set("b", "giá trị")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("a") is None
+    assert cache.sweep() == 2
+    stats = cache.get_stats()
+    assert stats["entries"] == 0
+    assert stats["size_bytes"] == 0
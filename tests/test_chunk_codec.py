@@ -0,0 +1,46 @@
+# tests/test_chunk_codec.py
+
+import pytest
+from langchain_core.documents import Document
+
+from modules.chunk_codec import (
+    ChunkArchive, available_codecs, decode_chunks, encode_chunks, is_chunk_archive
+)
+
+
+@pytest.fixture
+def chunks():
+    return [
+        Document(page_content="Điều 1. Phạm vi điều chỉnh", metadata={"doc_id": "doc", "page": 0, "start_index": 0}),
+        Document(page_content="", metadata={"doc_id": "doc", "page": 0}),
+        Document(page_content="Nghị định 10/2023/NĐ-CP 🙂", metadata={"doc_id": "doc", "page": 2, "page_label": "iii"}),
+        Document(page_content="Chunk không có metadata", metadata={}),
+    ]
+
+
+@pytest.mark.parametrize("compression", available_codecs() + ["auto"])
+def test_round_trip_with_sparse_metadata(chunks, compression):
+    data = encode_chunks(chunks, compression)
+
+    assert is_chunk_archive(data)
+    decoded = decode_chunks(data)
+    assert [(d.page_content, d.metadata) for d in decoded] == [(d.page_content, d.metadata) for d in chunks]
+
+
+def test_archive_random_access_matches_documents(chunks):
+    archive = ChunkArchive(encode_chunks(chunks, "none"))
+
+    assert len(archive) == len(chunks)
+    for index, chunk in enumerate(chunks):
+        assert archive[index].page_content == chunk.page_content
+        assert archive[index].metadata == chunk.metadata
+    assert archive[-1].page_content == chunks[-1].page_content
+    with pytest.raises(IndexError):
+        archive[len(chunks)]
+
+
+def test_empty_list_and_invalid_data():
+    assert decode_chunks(encode_chunks([], "zlib")) == []
+    assert not is_chunk_archive(b"not an archive")
+    with pytest.raises(ValueError):
+        ChunkArchive(b"RCHK\x63\x00")
@@ -0,0 +1,89 @@
+# tests/test_context_packer.py
+
+from langchain_core.documents import Document
+
+from config import app_config
+from modules.context_packer import (
+    DOCUMENT_HEADER_TOKENS, ContextPacker, TokenCounter, deduplicate_chunks
+)
+
+# Cùng độ dài với system prompt của RAGPipeline (~750 ký tự)
+SYSTEM_PROMPT = "Bạn là một trợ lý AI, chỉ trả lời dựa trên tài liệu được cung cấp. " * 11
+
+
+def _doc(text, score=None, page=0):
+    metadata = {"doc_id": "doc", "page": page}
+    if score is not None:
+        metadata["score"] = score
+    return Document(page_content=text, metadata=metadata)
+
+
+def _chunk(i, length=400):
+    return (f"Chunk {i}: " + "nội dung tài liệu " * length)[:length]
+
+
+def test_small_context_model_keeps_document_context():
+    # DialoGPT có cửa sổ 1024 token bằng MAX_TOKENS mặc định
+    packer = ContextPacker(model_name="microsoft/DialoGPT-medium", max_tokens=1024)
+    packer.reserve(SYSTEM_PROMPT)
+
+    docs = [_doc(_chunk(i, 1000), page=i) for i in range(5)]
+    packed = packer.pack(docs, packer.document_budget("Câu hỏi về tài liệu?"))
+
+    assert packer.answer_reserve == 512
+    assert len(packed) >= 1
+    assert packed[0].page_content
+
+
+def test_pack_drops_lowest_scores_first():
+    counter = TokenCounter()
+    packer = ContextPacker(counter=counter)
+    docs = [_doc(_chunk(i), score, page=i) for i, score in enumerate([0.9, 0.2, 0.8, 0.5])]
+    costs = [counter.count(doc.page_content) + DOCUMENT_HEADER_TOKENS for doc in docs]
+
+    packed = packer.pack(docs, costs[0] + costs[2] + costs[3] - 1)
+    assert [doc.metadata["score"] for doc in packed] == [0.9, 0.8]  # giữ thứ tự truy xuất
+
+    packed = packer.pack(docs, sum(costs))
+    assert [doc.metadata["score"] for doc in packed] == [0.9, 0.2, 0.8, 0.5]
+
+
+def test_pack_truncates_top_chunk_over_budget():
+    counter = TokenCounter()
+    packer = ContextPacker(counter=counter)
+    docs = [_doc(_chunk(0, 2000), 0.9), _doc(_chunk(1, 2000), 0.1, page=1)]
+
+    packed = packer.pack(docs, 100)
+
+    assert len(packed) == 1
+    assert docs[0].page_content.startswith(packed[0].page_content)
+    assert 0 < counter.count(packed[0].page_content) <= 100 - DOCUMENT_HEADER_TOKENS
+
+
+def test_budgets_split_between_history_and_documents():
+    packer = ContextPacker(model_name="google/gemma-7b-it", max_tokens=1024)
+    packer.reserve(SYSTEM_PROMPT)
+    question, history = "Câu hỏi?", "Câu hỏi: trước đó\nTrả lời: đã trả lời"
+
+    assert packer.prompt_budget == 8192 - 1024 - packer.counter.count(SYSTEM_PROMPT) - 64
+    assert packer.history_budget() == int(packer.prompt_budget * app_config.context_history_ratio)
+    assert packer.document_budget(question, history) == (
+        packer.prompt_budget - packer.counter.count(question) - packer.counter.count(history)
+    )
+
+
+def test_token_counter_truncate():
+    counter = TokenCounter(cache_size=2)
+    text = "nội dung tài liệu " * 200
+
+    assert counter.count(text) == counter.count(text) > 0
+    assert counter.count("") == 0
+    assert counter.truncate(text, 10) and counter.count(counter.truncate(text, 10)) <= 10
+    assert counter.truncate(text, 0) == ""
+    assert counter.truncate("ngắn", 10) == "ngắn"
+
+
+def test_deduplicate_drops_repeated_and_contained_chunks():
+    docs = [_doc("Điều 1. Phạm vi điều chỉnh"), _doc("Điều 1. Phạm vi điều chỉnh"), _doc("Phạm vi"), _doc("  "), _doc("Điều 2")]
+
+    assert [doc.page_content for doc in deduplicate_chunks(docs)] == ["Điều 1. Phạm vi điều chỉnh", "Điều 2"]
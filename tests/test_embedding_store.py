@@ -0,0 +1,49 @@
+# tests/test_embedding_store.py
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from modules.embedding_store import (
+    EMBEDDINGS_FILE, EmbeddingMatrixStore, InMemoryEmbeddingMatrix, normalize_rows, write_embedding_store
+)
+
+
+def _documents(count):
+    return [
+        Document(page_content=f"Đoạn {i}", metadata={"doc_id": f"doc{i % 2}", "page": i})
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_save_and_open_round_trip(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(12, 8)).astype(np.float32)
+    documents = _documents(12)
+
+    write_embedding_store(str(tmp_path), vectors, documents, dtype=dtype)
+    assert EmbeddingMatrixStore.exists(str(tmp_path))
+    store = EmbeddingMatrixStore.open(str(tmp_path))
+
+    assert isinstance(store.vectors, np.memmap)
+    assert store.dtype == dtype
+    assert len(store) == 12
+    np.testing.assert_allclose(store.vectors, normalize_rows(vectors), atol=1e-3)
+    assert [(d.page_content, d.metadata) for d in store.get_all_documents()] == \
+        [(d.page_content, d.metadata) for d in documents]
+
+    # Cùng kết quả với ma trận trong RAM, kể cả khi lọc theo doc_ids
+    in_memory = InMemoryEmbeddingMatrix()
+    in_memory.add(vectors, documents)
+    query = rng.normal(size=8)
+    for doc_ids in [None, ["doc1"]]:
+        assert [i for i, _ in store.search(query, 4, doc_ids)] == [i for i, _ in in_memory.search(query, 4, doc_ids)]
+
+
+def test_open_rejects_mismatched_files(tmp_path):
+    write_embedding_store(str(tmp_path), np.ones((3, 4)), _documents(3))
+    np.save(tmp_path / EMBEDDINGS_FILE, np.ones((2, 4), dtype=np.float32))
+
+    with pytest.raises(ValueError):
+        EmbeddingMatrixStore.open(str(tmp_path))
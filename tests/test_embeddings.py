@@ -0,0 +1,62 @@
+# tests/test_embeddings.py
+
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+
+from modules.embeddings import BatchedEmbeddings, ReusableEmbeddings, get_query_cache
+
+
+@pytest.fixture(autouse=True)
+def _clear_query_cache():
+    get_query_cache().clear()
+    yield
+    get_query_cache().clear()
+
+
+def test_embed_queries_batches_and_fills_query_cache(counting_embeddings):
+    model = BatchedEmbeddings(counting_embeddings)
+
+    vectors = model.embed_queries(["Câu hỏi một", "câu hỏi  MỘT", "Câu hỏi hai"])
+
+    assert counting_embeddings.calls == 1
+    assert counting_embeddings.texts == 2
+    assert vectors[0] == vectors[1]
+
+    counting_embeddings.reset()
+    assert model.embed_query("Câu hỏi hai") == vectors[2]
+    assert counting_embeddings.calls == 0
+
+
+def test_reusable_embeddings_delegates_embed_queries(counting_embeddings):
+    model = ReusableEmbeddings(BatchedEmbeddings(counting_embeddings))
+
+    model.embed_queries([f"câu hỏi {i}" for i in range(8)])
+    assert counting_embeddings.calls == 1
+    assert counting_embeddings.texts == 8
+
+    counting_embeddings.reset()
+    model.embed_query("câu hỏi 3")
+    assert counting_embeddings.calls == 0
+
+
+def test_schedule_respects_token_budget(counting_embeddings):
+    model = BatchedEmbeddings(counting_embeddings, max_batch_size=4, max_batch_tokens=100)
+    lengths = [5, 40, 12, 30, 8, 50, 20, 3, 25, 10]
+
+    batches = model._schedule(lengths)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        # Text dài nhất đứng đầu, tổng token sau padding không vượt ngân sách
+        assert lengths[batch[0]] == max(lengths[i] for i in batch)
+        assert len(batch) <= 4
+        assert len(batch) == 1 or lengths[batch[0]] * len(batch) <= 100
+
+
+def test_embed_documents_restores_input_order(counting_embeddings):
+    model = BatchedEmbeddings(counting_embeddings, max_batch_size=2)
+    texts = [" ".join(["từ"] * n) + f" {n}" for n in [3, 12, 1, 7, 9]]
+
+    assert model.embed_documents(texts) == counting_embeddings.embed_documents(texts)
+    assert counting_embeddings.calls == 4  # 3 batch + lần gọi tham chiếu
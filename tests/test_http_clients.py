@@ -0,0 +1,78 @@
+# tests/test_http_clients.py
+
+import asyncio
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from modules import http_clients
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    """Trả lời {"ok": true}; setup() chạy một lần cho mỗi kết nối TCP được accept"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CountingHandler)
+    server.connections = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_client_reuses_one_connection(stub_server):
+    client = http_clients.get_http_client()
+    url = f"http://127.0.0.1:{stub_server.server_address[1]}/v1/models"
+
+    for _ in range(10):
+        response = client.get(url)
+        assert response.status_code == 200
+
+    assert stub_server.connections == 1
+    assert http_clients.get_http_client() is client
+
+
+def test_async_client_is_per_event_loop(monkeypatch):
+    # openai giả: chỉ cần AsyncOpenAI(...).chat.completions
+    class AsyncOpenAI:
+        def __init__(self, http_client, **kwargs):
+            self.chat = types.SimpleNamespace(completions=object())
+
+    monkeypatch.setitem(sys.modules, "openai", types.SimpleNamespace(AsyncOpenAI=AsyncOpenAI))
+    async_completions = http_clients.LoopLocalAsyncCompletions({"api_key": "test"})
+
+    async def client_pair():
+        return async_completions.for_running_loop(), async_completions.for_running_loop()
+
+    first, same_loop = asyncio.run(client_pair())
+    second, _ = asyncio.run(client_pair())
+
+    assert first is same_loop
+    assert first is not second
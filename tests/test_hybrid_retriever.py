@@ -0,0 +1,51 @@
+# tests/test_hybrid_retriever.py
+
+from typing import List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from modules.bm25 import BM25Index
+from modules.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+
+
+class FixedRetriever(BaseRetriever):
+    documents: List[Document]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.documents
+
+
+def _doc(text, page):
+    return Document(page_content=text, metadata={"doc_id": "doc", "page": page})
+
+
+def test_rrf_orders_by_summed_reciprocal_rank():
+    a, b, c = _doc("a", 0), _doc("b", 1), _doc("c", 2)
+
+    fused = reciprocal_rank_fusion([[a, b, c], [b, c]], rrf_k=60)
+
+    # b: 1/62 + 1/61 > c: 1/63 + 1/62 > a: 1/61
+    assert [doc.page_content for doc, _ in fused] == ["b", "c", "a"]
+
+
+def test_hybrid_retriever_fuses_dense_and_keyword_results():
+    documents = [
+        _doc("Nghị định 10/2023/NĐ-CP về hóa đơn", 0),
+        _doc("Thông tư hướng dẫn thuế", 1),
+        _doc("Quy định chung", 2),
+    ]
+    keyword_index = BM25Index()
+    keyword_index.add_documents(documents)
+    dense = FixedRetriever(documents=[documents[2], documents[0]])
+
+    retriever = HybridRetriever(dense_retriever=dense, keyword_index=keyword_index, k=2)
+    results = retriever.invoke("10/2023/nđ-cp")
+
+    # Chỉ chunk 0 khớp BM25: có mặt ở cả hai nguồn nên vượt chunk 2 dù dense xếp sau, điểm RRF nằm trong metadata
+    assert [doc.metadata["page"] for doc in results] == [0, 2]
+    assert results[0].metadata["score"] > results[1].metadata["score"]
+    assert "score" not in documents[0].metadata
@@ -0,0 +1,57 @@
+# tests/test_index_catalog.py
+
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from modules.index_catalog import IndexCatalog, claim_directory
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    # chroma_db_* tạm được tìm trong tempfile.gettempdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    os.makedirs(tempfile.tempdir)
+    return IndexCatalog(str(tmp_path / "indexes"))
+
+
+def _age(path, seconds=7200):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_cleanup_skips_claimed_directory(catalog):
+    directory = tempfile.mkdtemp(prefix="chroma_db_")
+    claim = claim_directory(directory)
+    _age(directory)
+
+    assert catalog.cleanup_orphans(max_age=60) == 0
+    assert os.path.isdir(directory)
+
+    claim.close()
+    assert catalog.cleanup_orphans(max_age=60) == 1
+    assert not os.path.exists(directory)
+
+
+def test_detached_copy_is_not_orphaned(catalog):
+    # Bản riêng của SmartVectorStore._detach_from_catalog: copytree rồi chạm lại mtime
+    source = catalog.new_path(catalog.make_key("doc"))
+    _age(source)
+    private_directory = tempfile.mkdtemp(prefix="chroma_db_")
+    shutil.copytree(source, private_directory, dirs_exist_ok=True)
+    os.utime(private_directory)
+
+    assert catalog.cleanup_orphans(max_age=60) == 1  # chỉ thư mục nguồn không được tham chiếu
+    assert os.path.isdir(private_directory)
+
+
+def test_register_keeps_concurrent_entries(catalog):
+    other = IndexCatalog(str(catalog.root_dir))
+    catalog.register("a", "numpy", catalog.new_path("a"), 1)
+    other.register("b", "numpy", other.new_path("b"), 2)
+
+    assert catalog.get("a") is not None
+    assert catalog.get("b")["chunks"] == 2
@@ -0,0 +1,24 @@
+# tests/test_llm_wrapper.py
+
+import pytest
+
+pytest.importorskip("openai")
+chat_models = pytest.importorskip("langchain_community.chat_models")
+if not hasattr(chat_models, "ChatOpenAI"):
+    pytest.skip("langchain_community không còn ChatOpenAI", allow_module_level=True)
+
+from modules import llm_wrapper
+
+
+def test_chat_models_are_shared():
+    llm = llm_wrapper.get_chat_model("test/model", 0.2, 256)
+
+    assert llm_wrapper.get_chat_model("test/model", 0.2, 256) is llm
+    assert llm_wrapper.get_chat_model("test/model", 0.5, 256) is not llm
+
+
+def test_llm_wrappers_share_llm():
+    first = llm_wrapper.LLMWrapper("test/model")
+    second = llm_wrapper.LLMWrapper("test/model")
+
+    assert first.llm is second.llm
@@ -0,0 +1,62 @@
+# tests/test_metrics.py
+
+import json
+import threading
+
+from utils.metrics import MetricsCollector
+
+
+def test_events_are_counted_in_memory_and_saved_on_throttle(tmp_path):
+    metrics_file = tmp_path / "metrics.json"
+    metrics = MetricsCollector(str(metrics_file), save_every=10, save_interval=3600)
+
+    for _ in range(9):
+        metrics.log_query_cache(hit=True)
+    assert not metrics_file.exists()
+
+    metrics.log_query_cache(hit=False)
+    assert json.loads(metrics_file.read_text(encoding="utf-8"))["query_cache"]["misses"] == 1
+
+
+def test_flush_saves_pending_events(tmp_path):
+    metrics_file = tmp_path / "metrics.json"
+    metrics = MetricsCollector(str(metrics_file), save_every=1000, save_interval=3600)
+    metrics.log_answer_cache(hit=True)
+
+    metrics.flush()
+    assert json.loads(metrics_file.read_text(encoding="utf-8"))["answer_cache"]["hits"] == 1
+
+
+def test_concurrent_events_are_not_lost(tmp_path):
+    metrics_file = tmp_path / "metrics.json"
+    metrics = MetricsCollector(str(metrics_file), save_every=7, save_interval=3600)
+
+    def log_many():
+        for _ in range(500):
+            metrics.log_embedding(2, 10, 0.001)
+
+    threads = [threading.Thread(target=log_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.flush()
+
+    assert metrics.get_metrics()["embedding"]["texts"] == 8 * 500 * 2
+    assert json.loads(metrics_file.read_text(encoding="utf-8"))["embedding"]["texts"] == 8 * 500 * 2
+
+
+def test_flush_uses_absolute_path_after_chdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    metrics = MetricsCollector("logs/metrics.json", save_every=1000, save_interval=3600)
+    metrics.log_question("Câu hỏi?", 0.5)
+
+    # Thư mục làm việc đổi và logs/ bị xóa trước khi flush (như lúc thoát interpreter)
+    other = tmp_path / "other"
+    other.mkdir()
+    monkeypatch.chdir(other)
+    (tmp_path / "logs").rmdir()
+    metrics.flush()
+
+    saved = json.loads((tmp_path / "logs" / "metrics.json").read_text(encoding="utf-8"))
+    assert saved["questions_asked"] == 1
@@ -0,0 +1,26 @@
+# tests/test_mmr.py
+
+import numpy as np
+import pytest
+from langchain_core.vectorstores.utils import maximal_marginal_relevance as reference_mmr
+
+from modules.mmr import maximal_marginal_relevance
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.25, 0.5, 0.9, 1.0])
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_matches_langchain_core(lambda_mult, k):
+    rng = np.random.default_rng(k)
+    query = rng.normal(size=32).astype(np.float32)
+    candidates = rng.normal(size=(20, 32)).astype(np.float32)
+
+    expected = reference_mmr(query, list(candidates), lambda_mult=lambda_mult, k=k)
+
+    assert maximal_marginal_relevance(query, candidates, k, lambda_mult) == expected
+
+
+def test_k_larger_than_candidates_and_empty():
+    candidates = np.eye(3, dtype=np.float32)
+
+    assert sorted(maximal_marginal_relevance(np.ones(3), candidates, 10)) == [0, 1, 2]
+    assert maximal_marginal_relevance(np.ones(3), np.empty((0, 3)), 5) == []
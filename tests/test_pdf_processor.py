@@ -0,0 +1,74 @@
+# tests/test_pdf_processor.py
+
+import shutil
+
+import pytest
+from langchain_community.document_loaders import PyPDFLoader
+
+pytest.importorskip("langchain_huggingface")
+
+from config import app_config
+from modules.pdf_processor import PDFProcessor
+
+
+def write_pdf(path, page_texts):
+    """PDF tối giản: mỗi trang một dòng text (Helvetica), có Info dict"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, điền sau khi biết id các trang
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Producer (test-producer) /Title (  Test document  ) /CreationDate (D:20240102030405+07'00') >>",
+    ]
+    page_ids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    xref += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    trailer = b"trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(body))
+    path.write_bytes(body + xref + trailer)
+    return str(path)
+
+
+def test_parallel_pages_match_pypdf_loader(counting_embeddings, tmp_path):
+    file_path = write_pdf(tmp_path / "doc.pdf", [f"Page {i} content" for i in range(12)])
+    processor = PDFProcessor(counting_embeddings)
+
+    expected = list(PyPDFLoader(file_path).lazy_load())
+    pages = list(processor._iter_pages_parallel(file_path, len(expected), workers=2))
+
+    assert [page.page_content for page in pages] == [page.page_content for page in expected]
+    assert [page.metadata for page in pages] == [page.metadata for page in expected]
+    assert pages[0].metadata["producer"] == "test-producer"
+
+
+def test_cached_chunks_take_current_source(counting_embeddings, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config, "enable_cache", True)
+    first = write_pdf(tmp_path / "upload_1.pdf", ["Cache source test page one", "Cache source test page two"])
+    second = str(tmp_path / "upload_2.pdf")
+    shutil.copy(first, second)
+    processor = PDFProcessor(counting_embeddings)
+
+    fresh = processor.load_and_chunk(first)
+    counting_embeddings.reset()
+    cached = processor.load_and_chunk(second)
+    batches = list(processor.iter_chunk_batches(second))
+
+    # Lần hai lấy từ cache (cùng nội dung) nhưng source là đường dẫn hiện tại
+    assert counting_embeddings.calls == 0
+    assert {chunk.metadata["source"] for chunk in fresh} == {first}
+    assert {chunk.metadata["source"] for chunk in cached} == {second}
+    assert {chunk.metadata["source"] for batch in batches for chunk in batch.chunks} == {second}
+    assert [chunk.page_content for chunk in cached] == [chunk.page_content for chunk in fresh]
@@ -0,0 +1,195 @@
+# tests/test_rag_pipeline.py
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+pytest.importorskip("langchain")
+
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from modules.embeddings import BatchedEmbeddings, ReusableEmbeddings, get_query_cache
+from modules.rag_pipeline import AnswerCache, RAGPipeline, get_answer_cache
+from modules.stream_renderer import ReplayedChunk
+from modules.vector_store_numpy import NumpyVectorStore
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    get_query_cache().clear()
+    get_answer_cache().clear()
+    yield
+    get_query_cache().clear()
+    get_answer_cache().clear()
+
+
+@pytest.fixture
+def documents():
+    return [
+        Document(page_content=f"Đoạn {i}: nội dung về chủ đề số {i % 5}", metadata={"doc_id": "doc", "page": i})
+        for i in range(30)
+    ]
+
+
+def test_ask_batch_embeds_all_questions_in_one_call(counting_embeddings, documents):
+    # Giống app_pro/run_app: pipeline nhận embedding model của PDFProcessor (ReusableEmbeddings)
+    model = ReusableEmbeddings(BatchedEmbeddings(counting_embeddings))
+    retriever = NumpyVectorStore(embedding_model=model).build_store(documents)
+    pipeline = RAGPipeline(retriever, FakeListChatModel(responses=["Trả lời"] * 8), embedding_model=model)
+
+    counting_embeddings.reset()
+    questions = [f"Câu hỏi số {i} về chủ đề?" for i in range(8)]
+    results = pipeline.ask_batch(questions, max_concurrency=2)
+
+    assert [result["question"] for result in results] == questions
+    assert all(result["success"] for result in results)
+    assert counting_embeddings.calls == 1
+    assert counting_embeddings.texts == len(questions)
+
+
+def _make_pipeline(embedding_model, documents, responses):
+    retriever = NumpyVectorStore(embedding_model=embedding_model).build_store(documents)
+    pipeline = RAGPipeline(retriever, FakeListChatModel(responses=responses), embedding_model=embedding_model)
+
+    # Ghi lại prompt gửi LLM: cùng prompt nghĩa là cùng nguồn (chunks) và cùng lịch sử
+    pipeline.prompts = []
+    prepare = pipeline._prepare_answer
+
+    def recording_prepare(question, docs, chat_history):
+        prepared = prepare(question, docs, chat_history)
+        pipeline.prompts.append((question, [doc.metadata["page"] for doc in docs], prepared[3]))
+        return prepared
+
+    pipeline._prepare_answer = recording_prepare
+    return pipeline
+
+
+def _memory(pipeline):
+    return [(exchange["question"], exchange["answer"]) for exchange in pipeline.get_conversation_history()]
+
+
+QUESTIONS = ["Chủ đề số 1 là gì?", "Còn chủ đề số 3 thì sao?"]
+RESPONSES = ["Chủ đề một là nội dung đầu tiên.", "Chủ đề ba nói về phần tiếp theo."]
+
+
+def test_aask_matches_ask(counting_embeddings, documents):
+    model = BatchedEmbeddings(counting_embeddings)
+    sync_pipeline = _make_pipeline(model, documents, RESPONSES)
+    async_pipeline = _make_pipeline(model, documents, RESPONSES)
+
+    sync_answers = [sync_pipeline.ask(question) for question in QUESTIONS]
+    get_answer_cache().clear()
+
+    async def ask_all():
+        return [await async_pipeline.aask(question) for question in QUESTIONS]
+
+    async_answers = asyncio.run(ask_all())
+
+    assert sync_answers == RESPONSES
+    assert async_answers == sync_answers
+    assert async_pipeline.prompts == sync_pipeline.prompts
+    assert _memory(async_pipeline) == _memory(sync_pipeline)
+
+
+def test_astream_matches_ask_streaming(counting_embeddings, documents):
+    model = BatchedEmbeddings(counting_embeddings)
+    sync_pipeline = _make_pipeline(model, documents, RESPONSES)
+    async_pipeline = _make_pipeline(model, documents, RESPONSES)
+
+    sync_answers = ["".join(sync_pipeline.ask_streaming(question)) for question in QUESTIONS]
+    get_answer_cache().clear()
+
+    async def stream_all():
+        answers = []
+        for question in QUESTIONS:
+            answers.append("".join([chunk async for chunk in async_pipeline.astream(question)]))
+        return answers
+
+    async_answers = asyncio.run(stream_all())
+
+    assert sync_answers == RESPONSES
+    assert async_answers == sync_answers
+    assert async_pipeline.prompts == sync_pipeline.prompts
+    assert _memory(async_pipeline) == _memory(sync_pipeline)
+
+
+def test_streaming_parity_on_answer_cache_hit(counting_embeddings, documents):
+    model = BatchedEmbeddings(counting_embeddings)
+    sync_pipeline = _make_pipeline(model, documents, RESPONSES)
+    async_pipeline = _make_pipeline(model, documents, RESPONSES)
+    question = QUESTIONS[0]
+
+    # Lần hai cùng ngữ cảnh lấy từ answer cache (LLM sẽ trả RESPONSES[1] nếu bị gọi lại)
+    sync_answers = ["".join(sync_pipeline.ask_streaming(question, use_memory=False)) for _ in range(2)]
+    get_answer_cache().clear()
+
+    async def stream_twice():
+        answers = []
+        for _ in range(2):
+            answers.append("".join([chunk async for chunk in async_pipeline.astream(question, use_memory=False)]))
+        return answers
+
+    async_answers = asyncio.run(stream_twice())
+
+    assert sync_answers == [RESPONSES[0], RESPONSES[0]]
+    assert async_answers == sync_answers
+
+
+def test_answer_cache_exact_hit_after_normalization():
+    cache = AnswerCache(max_size=4)
+    cache.set("ctx", "Chủ đề số 1 là gì?", "Trả lời")
+
+    assert cache.get("ctx", "  chủ đề số 1 là gì? ") == "Trả lời"
+    assert cache.get("ctx-khác", "Chủ đề số 1 là gì?") is None
+
+
+def test_answer_cache_near_duplicate_threshold():
+    cache = AnswerCache(max_size=8, similarity_threshold=0.95)
+    cache.set("ctx", "Câu hỏi A", "Trả lời A", [1.0, 0.0, 0.0])
+    cache.set("ctx", "Câu hỏi B", "Trả lời B", [0.0, 1.0, 0.0])
+
+    # cosine ~0.995 với A: trúng; cosine ~0.71 với cả A và B: trượt
+    assert cache.get_similar("ctx", [1.0, 0.1, 0.0]) == "Trả lời A"
+    assert cache.get_similar("ctx", [1.0, 1.0, 0.0]) is None
+    assert cache.get_similar("ctx-khác", [1.0, 0.0, 0.0]) is None
+
+
+def test_answer_cache_eviction_keeps_vectors_in_sync():
+    cache = AnswerCache(max_size=2, similarity_threshold=0.95)
+    for i in range(5):
+        vector = [0.0] * 5
+        vector[i] = 1.0
+        cache.set("ctx", f"Câu hỏi {i}", f"Trả lời {i}", vector)
+
+    assert cache.get_similar("ctx", [1.0, 0.0, 0.0, 0.0, 0.0]) is None
+    assert cache.get_similar("ctx", [0.0, 0.0, 0.0, 1.0, 0.0]) == "Trả lời 3"
+    assert cache.get_similar("ctx", [0.0, 0.0, 0.0, 0.0, 1.0]) == "Trả lời 4"
+
+
+def test_answer_cache_ttl_expiry(monkeypatch):
+    cache = AnswerCache(ttl=60, similarity_threshold=0.95)
+    cache.set("ctx", "Câu hỏi", "Trả lời", [1.0, 0.0])
+    assert cache.get_similar("ctx", [1.0, 0.0]) == "Trả lời"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get_similar("ctx", [1.0, 0.0]) is None
+    assert cache.get("ctx", "Câu hỏi") is None
+
+
+def test_streamed_replay_matches_original(counting_embeddings, documents):
+    answer = "Đoạn một.\n\nĐoạn  hai có   khoảng trắng và nhiều từ hơn bốn từ."
+    pipeline = _make_pipeline(BatchedEmbeddings(counting_embeddings), documents, [answer, "Không được gọi"])
+    question = QUESTIONS[0]
+
+    original = list(pipeline.ask_streaming(question, use_memory=False))
+    replayed = list(pipeline.ask_streaming(question, use_memory=False))
+
+    assert "".join(original) == answer
+    assert "".join(replayed) == answer
+    assert len(replayed) > 1
+    assert all(isinstance(chunk, ReplayedChunk) for chunk in replayed)
@@ -0,0 +1,60 @@
+# tests/test_stream_renderer.py
+
+import time
+
+from modules.context_packer import TokenCounter
+from modules.stream_renderer import ReplayedChunk, StreamRenderer
+
+
+class FakeMetrics:
+    def __init__(self):
+        self.streams = []
+
+    def log_streaming(self, ttft, tokens, duration):
+        self.streams.append((ttft, tokens, duration))
+
+
+def _renderer(render, interval=0.05, commit=None):
+    renderer = StreamRenderer(render, interval=interval, counter=TokenCounter(), commit=commit)
+    renderer.metrics = FakeMetrics()
+    return renderer
+
+
+def test_pending_text_drawn_while_model_pauses():
+    drawn = []
+
+    def chunks():
+        yield "Xin "
+        yield "chào"
+        # Model dừng lâu hơn cửa sổ: "chào" phải được vẽ trước khi stream kết thúc
+        time.sleep(0.5)
+        drawn.append("<end>")
+        yield "!"
+
+    renderer = _renderer(drawn.append, interval=0.1)
+    text = renderer.consume(chunks())
+
+    assert text == "Xin chào!"
+    assert "Xin chào" in drawn[:drawn.index("<end>")]
+    assert drawn[-1] == "Xin chào!"
+
+
+def test_commit_receives_each_paragraph_once():
+    committed, rendered = [], []
+    renderer = _renderer(rendered.append, interval=0, commit=committed.append)
+
+    text = renderer.consume(iter(["Đoạn 1.", "\n\nĐoạn", " 2.\n\n", "Đoạn 3"]))
+
+    assert text == "Đoạn 1.\n\nĐoạn 2.\n\nĐoạn 3"
+    assert committed == ["Đoạn 1.", "Đoạn 2."]
+    assert rendered[-1] == "Đoạn 3"
+    assert all("\n\n" not in part for part in rendered)
+
+
+def test_replayed_answer_not_logged_as_streaming():
+    renderer = _renderer(lambda text: None)
+    renderer.consume(iter([ReplayedChunk("Câu trả lời "), ReplayedChunk("từ cache")]))
+    assert renderer.metrics.streams == []
+
+    renderer.consume(iter(["Câu trả lời ", "từ model"]))
+    assert len(renderer.metrics.streams) == 1
@@ -0,0 +1,100 @@
+# tests/test_vector_store_fallback.py
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_huggingface")
+
+from config import app_config
+from modules.pdf_processor import ChunkBatch
+from modules.vector_store_fallback import FallbackVectorStore, IngestProgress, SmartVectorStore
+
+
+def _documents(doc_id, count):
+    return [
+        Document(page_content=f"Đoạn {i} của tài liệu {doc_id}", metadata={"doc_id": doc_id, "page": i})
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def smart_store(counting_embeddings, monkeypatch):
+    monkeypatch.setattr(app_config, "enable_index_catalog", False)
+    monkeypatch.setattr(app_config, "vector_store_type", "smart")
+    return SmartVectorStore(counting_embeddings)
+
+
+def test_mmr_after_removing_last_document(counting_embeddings):
+    store = FallbackVectorStore(counting_embeddings)
+    store.build_store(_documents("doc", 3))
+    store.remove_document("doc")
+
+    assert store.get_retriever(search_type="mmr").invoke("câu hỏi") == []
+
+
+def test_mmr_fetch_k_larger_than_index(counting_embeddings):
+    store = FallbackVectorStore(counting_embeddings)
+    store.build_store(_documents("a", 2) + _documents("b", 2))
+
+    documents, vectors = store.mmr_candidates(counting_embeddings.embed_query("câu hỏi"), 50, ["b"])
+    assert {document.metadata["doc_id"] for document in documents} == {"b"}
+    assert vectors.shape == (2, counting_embeddings.dimension)
+
+
+@pytest.mark.parametrize("search_type", ["similarity", "mmr"])
+def test_retriever_sees_documents_added_after_reload(counting_embeddings, tmp_path, search_type):
+    FallbackVectorStore(counting_embeddings).build_store(_documents("a", 2), str(tmp_path))
+
+    # Mở lại bằng memmap: lần thêm đầu tiên chuyển store sang FAISS trong RAM (_materialize)
+    store = FallbackVectorStore(counting_embeddings)
+    store.load(str(tmp_path))
+    assert store.matrix_store is not None
+    retriever = store.get_retriever(search_type=search_type, k=10)
+    store.add_documents(_documents("b", 2))
+
+    doc_ids = [document.metadata["doc_id"] for document in retriever.invoke("câu hỏi")]
+    assert sorted(doc_ids) == ["a", "a", "b", "b"]
+
+    store.remove_document("a")
+    assert [document.metadata["doc_id"] for document in retriever.invoke("câu hỏi")] == ["b", "b"]
+
+    query_vectors = np.asarray([counting_embeddings.embed_query("câu hỏi")], dtype=np.float32)
+    assert [[d.metadata["doc_id"] for d in docs] for docs in retriever.retrieve_batch(["câu hỏi"], query_vectors)] == [["b", "b"]]
+
+
+def test_smart_store_ingests_in_bounded_batches(smart_store, counting_embeddings, monkeypatch):
+    monkeypatch.setattr(app_config, "embedding_batch_size", 2)
+    chunks = _documents("doc", 5)
+    batches = [ChunkBatch(chunks[:3], 2, 4), ChunkBatch([], 3, 4), ChunkBatch(chunks[3:], 4, 4)]
+
+    counting_embeddings.reset()
+    progress = list(smart_store.ingest(batches))
+
+    # Mỗi nhóm tối đa embedding_batch_size chunks được embed và index rồi báo tiến độ
+    assert progress == [
+        IngestProgress(2, 4, 2), IngestProgress(2, 4, 3), IngestProgress(3, 4, 3),
+        IngestProgress(4, 4, 5)
+    ]
+    assert counting_embeddings.calls == 3
+    assert counting_embeddings.texts == 5
+    assert smart_store.documents == {"doc": 5}
+    assert len(smart_store.get_retriever().invoke("Đoạn 4")) > 0
+
+
+@pytest.mark.parametrize("vector_store_type", ["smart", "hybrid"])
+def test_smart_store_add_and_remove_documents(counting_embeddings, monkeypatch, vector_store_type):
+    monkeypatch.setattr(app_config, "enable_index_catalog", False)
+    monkeypatch.setattr(app_config, "vector_store_type", vector_store_type)
+    store = SmartVectorStore(counting_embeddings)
+    store.build_store(_documents("a", 3))
+    store.add_documents(_documents("b", 2))
+
+    assert store.documents == {"a": 3, "b": 2}
+    assert {d.metadata["doc_id"] for d in store.get_retriever(["b"]).invoke("tài liệu b")} == {"b"}
+
+    assert store.remove_document("a") == 3
+    assert store.documents == {"b": 2}
+    assert store.get_store_info()["documents"] == 1
+    assert {d.metadata["doc_id"] for d in store.get_retriever().invoke("Đoạn 0 của tài liệu a")} == {"b"}
@@ -0,0 +1,32 @@
+# tests/test_vector_store_numpy.py
+
+import pytest
+from langchain_core.documents import Document
+
+pytest.importorskip("langchain_huggingface")
+
+from modules.vector_store_numpy import NumpyVectorStore
+
+
+def _documents(doc_id, count):
+    return [
+        Document(page_content=f"Đoạn {i} của tài liệu {doc_id}", metadata={"doc_id": doc_id, "page": i})
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("search_type", ["similarity", "mmr"])
+def test_retriever_sees_documents_added_after_reload(counting_embeddings, tmp_path, search_type):
+    NumpyVectorStore(counting_embeddings).build_store(_documents("a", 2), str(tmp_path))
+
+    # Mở lại bằng memmap: lần thêm đầu tiên thay ma trận chỉ đọc bằng bản trong RAM
+    store = NumpyVectorStore(counting_embeddings)
+    store.load(str(tmp_path))
+    retriever = store.get_retriever(search_type=search_type, k=10)
+    store.add_documents(_documents("b", 2))
+
+    doc_ids = [document.metadata["doc_id"] for document in retriever.invoke("câu hỏi")]
+    assert sorted(doc_ids) == ["a", "a", "b", "b"]
+
+    store.remove_document("a")
+    assert [document.metadata["doc_id"] for document in retriever.invoke("câu hỏi")] == ["b", "b"]
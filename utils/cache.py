@@ -3,67 +3,603 @@
 import hashlib
 import pickle
 import os
-from datetime import datetime, timedelta
-from typing import Any, Optional
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 from pathlib import Path
 
-class SimpleCache:
-    """Simple file-based cache system"""
+from .logger import get_logger
+
+# Each cache file starts with the expiry timestamp so TTL checks need no stat()
+_HEADER = struct.Struct(">d")
+
+
+class DiskCache:
+    """
+    Size-bounded file cache.
+    
+    Entries live in sharded subdirectories (cache/ab/abcdef....cache), are written
+    atomically via temp file + rename and are evicted least-recently-used once the
+    total size exceeds max_bytes. A background thread sweeps expired entries.
     
-    def __init__(self, cache_dir: str = "cache", ttl: int = 3600):
+    The index and max_bytes bound are per process: several processes sharing one
+    cache_dir each evict only what they have seen, so the directory can grow past
+    max_bytes. Use SQLiteCache (CACHE_BACKEND=sqlite) for multi-process deployments.
+    """
+    
+    def __init__(self, cache_dir: str = "cache", ttl: int = 3600,
+                 max_bytes: int = 512 * 1024 * 1024, sweep_interval: int = 300):
         self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.ttl = ttl  # Time to live in seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        
+        # path -> (size, expires_at), ordered from least to most recently used
+        self._index: "OrderedDict[Path, Tuple[int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bytes_read": 0, "bytes_written": 0, "evictions": 0, "expired": 0}
+        
+        self._load_index()
+        
+        self._stop_event = threading.Event()
+        self._sweeper = None
+        if sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
     
     def _get_cache_path(self, key: str) -> Path:
-        """Generate cache file path from key"""
-        hash_key = hashlib.md5(key.encode()).hexdigest()
-        return self.cache_dir / f"{hash_key}.cache"
+        """Generate sharded cache file path from key"""
+        hash_key = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return self.cache_dir / hash_key[:2] / f"{hash_key}.cache"
     
-    def _is_expired(self, file_path: Path) -> bool:
-        """Check if cache file is expired"""
-        if not file_path.exists():
-            return True
+    def _load_index(self) -> None:
+        """Rebuild the in-memory index from disk, oldest access first"""
+        # Files from the old flat layout cannot be read anymore
+        legacy_files = list(self.cache_dir.glob("*.cache"))
+        if legacy_files:
+            for legacy_file in legacy_files:
+                self._unlink(legacy_file)
+            get_logger().info(
+                f"Migrated cache layout: removed {len(legacy_files)} legacy entries from {self.cache_dir}"
+            )
+        
+        entries = []
+        for cache_file in self.cache_dir.glob("*/*.cache"):
+            try:
+                stat = cache_file.stat()
+                with open(cache_file, 'rb') as f:
+                    (expires_at,) = _HEADER.unpack(f.read(_HEADER.size))
+                entries.append((stat.st_atime, cache_file, stat.st_size, expires_at))
+            except (OSError, struct.error):
+                self._unlink(cache_file)
         
-        file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-        return datetime.now() - file_time > timedelta(seconds=self.ttl)
+        for _, cache_file, size, expires_at in sorted(entries, key=lambda e: e[0]):
+            self._index[cache_file] = (size, expires_at)
+            self._total_bytes += size
+        
+        self._sweep_expired()
+        self._evict()
+    
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    
+    def _drop(self, path: Path) -> None:
+        """Remove an entry from index and disk (caller holds the lock)"""
+        size, _ = self._index.pop(path, (0, 0.0))
+        self._total_bytes -= size
+        self._unlink(path)
+    
+    def _evict(self) -> None:
+        """Evict least recently used entries until under max_bytes (caller holds the lock)"""
+        while self._total_bytes > self.max_bytes and self._index:
+            path = next(iter(self._index))
+            self._drop(path)
+            self._stats["evictions"] += 1
+    
+    def _sweep_expired(self) -> int:
+        now = time.time()
+        expired = [path for path, (_, expires_at) in self._index.items() if expires_at <= now]
+        for path in expired:
+            self._drop(path)
+        self._stats["expired"] += len(expired)
+        return len(expired)
+    
+    def _sweep_loop(self) -> None:
+        while not self._stop_event.wait(self.sweep_interval):
+            self.sweep()
+    
+    def sweep(self) -> int:
+        """Delete expired entries, returns the number removed"""
+        with self._lock:
+            return self._sweep_expired()
     
     def get(self, key: str) -> Optional[Any]:
         """Get cached value"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+    
+    def get_entry(self, key: str) -> Optional[Tuple[Any, int, float]]:
+        """Get (value, size in bytes, expires_at) of a cached value"""
         cache_path = self._get_cache_path(key)
         
-        if self._is_expired(cache_path):
-            return None
-        
         try:
             with open(cache_path, 'rb') as f:
-                return pickle.load(f)
-        except:
+                data = f.read()
+            (expires_at,) = _HEADER.unpack_from(data)
+            if expires_at <= time.time():
+                with self._lock:
+                    self._drop(cache_path)
+                    self._stats["expired"] += 1
+                    self._stats["misses"] += 1
+                return None
+            value = pickle.loads(data[_HEADER.size:])
+        except FileNotFoundError:
+            with self._lock:
+                # Another process may have evicted the file
+                if cache_path in self._index:
+                    size, _ = self._index.pop(cache_path)
+                    self._total_bytes -= size
+                self._stats["misses"] += 1
+            return None
+        except Exception:
+            with self._lock:
+                self._drop(cache_path)
+                self._stats["misses"] += 1
             return None
+        
+        with self._lock:
+            if cache_path in self._index:
+                self._index.move_to_end(cache_path)
+            else:
+                # Written by another process
+                self._index[cache_path] = (len(data), expires_at)
+                self._total_bytes += len(data)
+            self._stats["hits"] += 1
+            self._stats["bytes_read"] += len(data)
+        return value, len(data), expires_at
     
     def set(self, key: str, value: Any) -> None:
         """Set cached value"""
+        self.set_entry(key, value)
+    
+    def set_entry(self, key: str, value: Any) -> Optional[Tuple[int, float]]:
+        """Set cached value, returns (size in bytes, expires_at) or None if not stored"""
         cache_path = self._get_cache_path(key)
         
         try:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(value, f)
+            expires_at = time.time() + self.ttl
+            data = _HEADER.pack(expires_at) + pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes:
+                # Too large to store: drop the previous value so readers don't get a stale entry
+                self.delete(key)
+                return None
+            
+            cache_path.parent.mkdir(exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, cache_path)
+            except Exception:
+                self._unlink(Path(tmp_path))
+                raise
+            
+            with self._lock:
+                old_size, _ = self._index.pop(cache_path, (0, 0.0))
+                self._index[cache_path] = (len(data), expires_at)
+                self._total_bytes += len(data) - old_size
+                self._stats["bytes_written"] += len(data)
+                self._evict()
+            return len(data), expires_at
         except Exception as e:
             print(f"Cache error: {e}")
+            return None
+    
+    def delete(self, key: str) -> None:
+        """Remove a cached value"""
+        with self._lock:
+            self._drop(self._get_cache_path(key))
     
     def clear(self) -> None:
         """Clear all cache files"""
-        for cache_file in self.cache_dir.glob("*.cache"):
+        with self._lock:
+            for cache_file in list(self.cache_dir.glob("*/*.cache")):
+                self._unlink(cache_file)
+            self._index.clear()
+            self._total_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/byte counters and current usage"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+    
+    def close(self) -> None:
+        """Stop the background sweeper"""
+        self._stop_event.set()
+
+
+class SQLiteCache:
+    """
+    SQLite (WAL) cache shared safely by several processes.
+    
+    Each thread gets its own connection; writers wait on busy_timeout instead of
+    failing. Total size is kept in a one-row table maintained by triggers so the
+    LRU size bound holds across processes without scanning the table.
+    """
+    
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache(expires_at);
+        CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache(accessed_at);
+        CREATE TABLE IF NOT EXISTS cache_usage (id INTEGER PRIMARY KEY CHECK (id = 0), size_bytes INTEGER NOT NULL);
+        INSERT OR IGNORE INTO cache_usage (id, size_bytes) VALUES (0, 0);
+        CREATE TRIGGER IF NOT EXISTS cache_usage_insert AFTER INSERT ON cache BEGIN
+            UPDATE cache_usage SET size_bytes = size_bytes + NEW.size WHERE id = 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS cache_usage_delete AFTER DELETE ON cache BEGIN
+            UPDATE cache_usage SET size_bytes = size_bytes - OLD.size WHERE id = 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS cache_usage_update AFTER UPDATE OF size ON cache BEGIN
+            UPDATE cache_usage SET size_bytes = size_bytes - OLD.size + NEW.size WHERE id = 0;
+        END;
+    """
+    
+    # accessed_at is only rewritten when older than this, so hot reads stay read-only
+    ACCESS_RESOLUTION = 60
+    
+    def __init__(self, db_path: str = "cache/cache.db", ttl: int = 3600,
+                 max_bytes: int = 512 * 1024 * 1024, sweep_interval: int = 300,
+                 busy_timeout: int = 30000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl  # Time to live in seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.busy_timeout = busy_timeout
+        
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bytes_read": 0, "bytes_written": 0, "evictions": 0, "expired": 0}
+        
+        with self._connection() as conn:
+            conn.executescript(self._SCHEMA)
+        self.sweep()
+        
+        self._stop_event = threading.Event()
+        self._sweeper = None
+        if sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections must not be shared across threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += amount
+    
+    def _sweep_loop(self) -> None:
+        while not self._stop_event.wait(self.sweep_interval):
             try:
-                cache_file.unlink()
-            except:
-                pass
+                self.sweep()
+            except sqlite3.Error as e:
+                print(f"Cache sweep error: {e}")
+    
+    def sweep(self) -> int:
+        """Bulk-delete expired entries, returns the number removed"""
+        with self._connection() as conn:
+            removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        self._count("expired", removed)
+        return removed
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently accessed rows until under max_bytes"""
+        (size_bytes,) = conn.execute("SELECT size_bytes FROM cache_usage WHERE id = 0").fetchone()
+        excess = size_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        
+        evicted = conn.execute(
+            """
+            DELETE FROM cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, size, SUM(size) OVER (ORDER BY accessed_at, key ROWS UNBOUNDED PRECEDING) AS running
+                    FROM cache
+                ) WHERE running - size < ?
+            )
+            """,
+            (excess,)
+        ).rowcount
+        self._count("evictions", evicted)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached value"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+    
+    def get_entry(self, key: str) -> Optional[Tuple[Any, int, float]]:
+        """Get (value, size in bytes, expires_at) of a cached value"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            
+            data, expires_at, accessed_at = row
+            value = pickle.loads(data)
+            
+            if now - accessed_at > self.ACCESS_RESOLUTION:
+                with conn:
+                    conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except Exception as e:
+            print(f"Cache error: {e}")
+            self._count("misses")
+            return None
+        
+        self._count("hits")
+        self._count("bytes_read", len(data))
+        return value, len(data), expires_at
+    
+    def set(self, key: str, value: Any) -> None:
+        """Set cached value"""
+        self.set_entry(key, value)
+    
+    def set_entry(self, key: str, value: Any) -> Optional[Tuple[int, float]]:
+        """Set cached value, returns (size in bytes, expires_at) or None if not stored"""
+        try:
+            now = time.time()
+            expires_at = now + self.ttl
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes:
+                # Too large to store: drop the previous value so readers don't get a stale entry
+                self.delete(key)
+                return None
+            
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT INTO cache (key, value, expires_at, size, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+                    "size = excluded.size, accessed_at = excluded.accessed_at",
+                    (key, sqlite3.Binary(data), expires_at, len(data), now)
+                )
+                self._evict(conn)
+            
+            self._count("bytes_written", len(data))
+            return len(data), expires_at
+        except Exception as e:
+            print(f"Cache error: {e}")
+            return None
+    
+    def delete(self, key: str) -> None:
+        """Remove a cached value"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+    
+    def clear(self) -> None:
+        """Clear all cache entries"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/byte counters (this process) and current usage (shared)"""
+        conn = self._connection()
+        (entries,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        (size_bytes,) = conn.execute("SELECT size_bytes FROM cache_usage WHERE id = 0").fetchone()
+        with self._stats_lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": entries,
+                "size_bytes": size_bytes,
+                "max_bytes": self.max_bytes
+            }
+    
+    def close(self) -> None:
+        """Stop the background sweeper and close this thread's connection"""
+        self._stop_event.set()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class MemoryCache:
+    """
+    In-process LRU bounded by the (pickled) size of its values.
+    
+    Values are shared, not copied: callers must not mutate what they get back.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        # key -> (value, size, expires_at), ordered from least to most recently used
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            
+            value, size, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._total_bytes -= size
+                self._stats["misses"] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+    
+    def set(self, key: str, value: Any, size: int, expires_at: float) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, expires_at)
+            self._total_bytes += size
+            
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self._stats["evictions"] += 1
+    
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+class TieredCache:
+    """
+    Memory tier in front of a persistent tier.
+    
+    Reads check memory first and promote hits from the persistent tier; writes go
+    through to both, so hot values are served without I/O or unpickling.
+    """
+    
+    def __init__(self, backend, memory_max_bytes: int = 64 * 1024 * 1024):
+        self.backend = backend
+        self.memory = MemoryCache(memory_max_bytes)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached value"""
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        
+        entry = self.backend.get_entry(key)
+        if entry is None:
+            return None
+        
+        value, size, expires_at = entry
+        self.memory.set(key, value, size, expires_at)
+        return value
+    
+    def set(self, key: str, value: Any) -> None:
+        """Set cached value"""
+        stored = self.backend.set_entry(key, value)
+        if stored is None:
+            self.memory.delete(key)
+            return
+        
+        size, expires_at = stored
+        self.memory.set(key, value, size, expires_at)
+    
+    def delete(self, key: str) -> None:
+        """Remove a cached value"""
+        self.memory.delete(key)
+        self.backend.delete(key)
+    
+    def clear(self) -> None:
+        """Clear both tiers"""
+        self.memory.clear()
+        self.backend.clear()
+    
+    def sweep(self) -> int:
+        return self.backend.sweep()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters of both tiers; hits include memory hits"""
+        memory_stats = self.memory.get_stats()
+        backend_stats = self.backend.get_stats()
+        hits = memory_stats["hits"] + backend_stats["hits"]
+        lookups = hits + backend_stats["misses"]
+        return {
+            "hits": hits,
+            "misses": backend_stats["misses"],
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory": memory_stats,
+            "disk": backend_stats
+        }
+    
+    def close(self) -> None:
+        self.backend.close()
+
+
+# Backward compatible name
+SimpleCache = DiskCache
 
 # Singleton cache
 _cache_instance = None
 
-def get_cache() -> SimpleCache:
+def get_cache():
     global _cache_instance
     if _cache_instance is None:
-        _cache_instance = SimpleCache()
+        from config import app_config
+        if app_config.cache_backend == "sqlite":
+            cache = SQLiteCache(
+                db_path=os.path.join(app_config.cache_dir, "cache.db"),
+                ttl=app_config.cache_ttl,
+                max_bytes=app_config.cache_max_bytes,
+                sweep_interval=app_config.cache_sweep_interval
+            )
+        else:
+            cache = DiskCache(
+                cache_dir=app_config.cache_dir,
+                ttl=app_config.cache_ttl,
+                max_bytes=app_config.cache_max_bytes,
+                sweep_interval=app_config.cache_sweep_interval
+            )
+        if app_config.memory_cache_max_bytes > 0:
+            cache = TieredCache(cache, memory_max_bytes=app_config.memory_cache_max_bytes)
+        _cache_instance = cache
     return _cache_instance
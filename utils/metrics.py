@@ -2,16 +2,33 @@
 
 import time
 import json
+import os
+import atexit
+import copy
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+# metrics.json is rewritten at most every SAVE_EVERY_EVENTS events or SAVE_INTERVAL seconds
+SAVE_EVERY_EVENTS = 50
+SAVE_INTERVAL = 5.0
+
 class MetricsCollector:
     """Collect and store application metrics"""
     
-    def __init__(self, metrics_file: str = "logs/metrics.json"):
-        self.metrics_file = Path(metrics_file)
-        self.metrics_file.parent.mkdir(exist_ok=True)
+    def __init__(self, metrics_file: str = "logs/metrics.json",
+                 save_every: int = SAVE_EVERY_EVENTS, save_interval: float = SAVE_INTERVAL):
+        # Absolute path: the exit-time flush may run after the working directory changed
+        self.metrics_file = Path(metrics_file).resolve()
+        self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        self.save_every = max(1, save_every)
+        self.save_interval = save_interval
+        # Counters are updated in memory under _lock; _save_lock serializes file writes
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._pending_events = 0
+        self._last_save = time.monotonic()
         self.session_metrics = {
             "start_time": datetime.now().isoformat(),
             "questions_asked": 0,
@@ -19,40 +36,136 @@ class MetricsCollector:
             "total_chunks": 0,
             "average_response_time": 0.0,
             "response_times": [],
-            "errors": 0
+            "errors": 0,
+            "embedding": {
+                "texts": 0,
+                "tokens": 0,
+                "seconds": 0.0,
+                "texts_per_sec": 0.0,
+                "tokens_per_sec": 0.0
+            },
+            "query_cache": {
+                "hits": 0,
+                "misses": 0,
+                "hit_rate": 0.0
+            },
+            "answer_cache": {
+                "hits": 0,
+                "misses": 0,
+                "hit_rate": 0.0
+            },
+            "streaming": {
+                "responses": 0,
+                "tokens": 0,
+                "seconds": 0.0,
+                "last_ttft": 0.0,
+                "average_ttft": 0.0,
+                "last_tokens_per_sec": 0.0,
+                "tokens_per_sec": 0.0
+            }
         }
     
     def log_question(self, question: str, response_time: float, success: bool = True):
         """Log a question and response time"""
-        self.session_metrics["questions_asked"] += 1
-        self.session_metrics["response_times"].append(response_time)
-        
-        if success:
-            # Calculate average response time
-            times = self.session_metrics["response_times"]
-            self.session_metrics["average_response_time"] = sum(times) / len(times)
-        else:
-            self.session_metrics["errors"] += 1
-        
-        self._save_metrics()
+        with self._lock:
+            self.session_metrics["questions_asked"] += 1
+            self.session_metrics["response_times"].append(response_time)
+            
+            if success:
+                # Calculate average response time
+                times = self.session_metrics["response_times"]
+                self.session_metrics["average_response_time"] = sum(times) / len(times)
+            else:
+                self.session_metrics["errors"] += 1
+        self._record_event()
     
     def log_document_processed(self, filename: str, chunk_count: int):
         """Log document processing"""
-        self.session_metrics["documents_processed"] += 1
-        self.session_metrics["total_chunks"] += chunk_count
-        self._save_metrics()
+        with self._lock:
+            self.session_metrics["documents_processed"] += 1
+            self.session_metrics["total_chunks"] += chunk_count
+        self._record_event()
+    
+    def log_embedding(self, text_count: int, token_count: int, duration: float):
+        """Log embedding throughput"""
+        with self._lock:
+            embedding = self.session_metrics["embedding"]
+            embedding["texts"] += text_count
+            embedding["tokens"] += token_count
+            embedding["seconds"] += duration
+            
+            if embedding["seconds"] > 0:
+                embedding["texts_per_sec"] = embedding["texts"] / embedding["seconds"]
+                embedding["tokens_per_sec"] = embedding["tokens"] / embedding["seconds"]
+        self._record_event()
+    
+    def log_query_cache(self, hit: bool):
+        """Log query embedding cache lookup"""
+        with self._lock:
+            query_cache = self.session_metrics["query_cache"]
+            query_cache["hits" if hit else "misses"] += 1
+            query_cache["hit_rate"] = query_cache["hits"] / (query_cache["hits"] + query_cache["misses"])
+        self._record_event()
+    
+    def log_answer_cache(self, hit: bool):
+        """Log answer cache lookup"""
+        with self._lock:
+            answer_cache = self.session_metrics["answer_cache"]
+            answer_cache["hits" if hit else "misses"] += 1
+            answer_cache["hit_rate"] = answer_cache["hits"] / (answer_cache["hits"] + answer_cache["misses"])
+        self._record_event()
+    
+    def log_streaming(self, ttft: float, token_count: int, duration: float):
+        """Log time-to-first-token and generation speed of a streamed answer"""
+        with self._lock:
+            streaming = self.session_metrics["streaming"]
+            streaming["responses"] += 1
+            streaming["tokens"] += token_count
+            streaming["seconds"] += duration
+            
+            streaming["last_ttft"] = ttft
+            streaming["average_ttft"] += (ttft - streaming["average_ttft"]) / streaming["responses"]
+            streaming["last_tokens_per_sec"] = token_count / duration if duration > 0 else 0.0
+            if streaming["seconds"] > 0:
+                streaming["tokens_per_sec"] = streaming["tokens"] / streaming["seconds"]
+        self._record_event()
+    
+    def _record_event(self):
+        """Count an event and save if the throttle allows"""
+        with self._lock:
+            self._pending_events += 1
+            due = (self._pending_events >= self.save_every
+                   or time.monotonic() - self._last_save >= self.save_interval)
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Save pending metrics now (get_metrics() registers this for interpreter exit)"""
+        # Snapshot and write under _save_lock so an older snapshot never overwrites a newer one
+        with self._save_lock:
+            with self._lock:
+                if not self._pending_events:
+                    return
+                data = json.dumps(self.session_metrics, indent=2, ensure_ascii=False)
+                self._pending_events = 0
+                self._last_save = time.monotonic()
+            self._save_metrics(data)
     
-    def _save_metrics(self):
-        """Save metrics to file"""
+    def _save_metrics(self, data: str):
+        """Save metrics to file (write to a temp file, then rename)"""
+        tmp_path = self.metrics_file.with_suffix(".json.tmp")
         try:
-            with open(self.metrics_file, 'w', encoding='utf-8') as f:
-                json.dump(self.session_metrics, f, indent=2, ensure_ascii=False)
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.metrics_file)
         except Exception as e:
             print(f"Metrics save error: {e}")
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
-        return self.session_metrics.copy()
+        with self._lock:
+            return copy.deepcopy(self.session_metrics)
 
 # Singleton metrics
 _metrics_instance = None
@@ -61,4 +174,5 @@ def get_metrics() -> MetricsCollector:
     global _metrics_instance
     if _metrics_instance is None:
         _metrics_instance = MetricsCollector()
+        atexit.register(_metrics_instance.flush)
     return _metrics_instance